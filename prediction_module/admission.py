@@ -0,0 +1,156 @@
+"""
+Cost-aware admission control for prediction requests.
+
+Each request declares an estimated cost (in model windows, see
+``prediction._estimate_*_cost``) before any heavy work starts. Requests run
+while the total cost of admitted work stays within ``budget``; the rest
+wait in a bounded FIFO queue. When the queue is full, or a request has
+waited ``max_queue_wait_s``, it is rejected with ``AdmissionRejected`` so
+the API can answer 503 with a ``Retry-After`` hint instead of letting every
+request time out together.
+
+A request costing more than the whole budget is charged the full budget: it
+runs alone rather than never.
+
+The controller is used from a single event loop and is not thread-safe.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; ``retry_after`` is in seconds."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Weighted FIFO admission against a compute budget."""
+
+    def __init__(
+        self,
+        budget: float,
+        max_queue: int = 64,
+        max_queue_wait_s: float = 10.0,
+        max_retry_after_s: int = 60,
+    ) -> None:
+        if budget <= 0:
+            raise ValueError("budget must be positive")
+        self.budget = budget
+        self.max_queue = max_queue
+        self.max_queue_wait_s = max_queue_wait_s
+        self.max_retry_after_s = max_retry_after_s
+
+        self.in_use = 0.0
+        # Each waiter is [cost, future]; futures resolve once the cost is granted.
+        self._waiters: Deque[List[Any]] = deque()
+        # Moving average of seconds a unit of cost stays admitted, for Retry-After.
+        self._seconds_per_unit = 0.05
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    async def acquire(self, cost: float, bounded: bool = True) -> float:
+        """
+        Wait until ``cost`` fits in the budget and return the amount charged.
+
+        ``bounded=False`` skips the queue-length and wait limits; it is meant
+        for work whose caller already bounds its own concurrency (batch
+        documents).
+        """
+        cost = min(max(cost, 0.0), self.budget)
+        if not self._waiters and self.in_use + cost <= self.budget:
+            self.in_use += cost
+            self.admitted += 1
+            return cost
+
+        if bounded and len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("Admission queue is full", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = [cost, future]
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            timeout = self.max_queue_wait_s if bounded and self.max_queue_wait_s > 0 else None
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if future.done() and not future.cancelled():
+                # Granted just as the wait ended; hand the budget back.
+                self._release_units(cost)
+            else:
+                self._remove_waiter(waiter)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise AdmissionRejected("Timed out waiting for capacity", self.retry_after()) from None
+        self.admitted += 1
+        return cost
+
+    def release(self, cost: float, held_s: float = 0.0) -> None:
+        """Return ``cost`` to the budget; ``held_s`` feeds the Retry-After estimate."""
+        if cost > 0 and held_s > 0:
+            self._seconds_per_unit += 0.1 * (held_s / cost - self._seconds_per_unit)
+        self._release_units(cost)
+
+    @asynccontextmanager
+    async def admit(self, cost: float, bounded: bool = True) -> AsyncIterator[None]:
+        charged = await self.acquire(cost, bounded=bounded)
+        began = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(charged, time.monotonic() - began)
+
+    def retry_after(self) -> int:
+        """Rough seconds until the current backlog drains."""
+        backlog = self.in_use + sum(cost for cost, _ in self._waiters)
+        seconds = backlog * self._seconds_per_unit * max(backlog / self.budget, 1.0)
+        return int(min(max(math.ceil(seconds), 1), self.max_retry_after_s))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "in_use": round(self.in_use, 3),
+            "queue_length": len(self._waiters),
+            "queued_cost": round(sum(cost for cost, _ in self._waiters), 3),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    # ---------------------------
+    # Internals
+    # ---------------------------
+    def _release_units(self, cost: float) -> None:
+        self.in_use = max(self.in_use - cost, 0.0)
+        self._wake()
+
+    def _remove_waiter(self, waiter: List[Any]) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        # A large request leaving the head of the queue may unblock smaller ones.
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_use + self._waiters[0][0] <= self.budget:
+            cost, future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.in_use += cost
+            future.set_result(None)
@@ -0,0 +1,205 @@
+"""
+Asynchronous, batched writer for the prediction audit log (JSONL).
+
+Request handlers hand records to ``AuditLogSink.submit``, which only enqueues
+them; a background thread serialises and appends them in batches. Features:
+
+    - flush interval: records are written at most ``flush_interval_s`` after
+      the first one of a batch arrives (or sooner once ``max_batch`` is hit)
+    - fsync policy: ``none`` (leave it to the OS) or ``batch`` (fsync after
+      every batch write)
+    - size-based rotation: when the file exceeds ``max_bytes`` it is renamed
+      with a timestamp suffix and gzip-compressed; only ``backup_count``
+      compressed files are kept
+    - bounded queue: when ``max_queue`` records are pending, new records are
+      dropped (``overflow="drop"``, the default, counted in ``dropped``) or
+      the caller waits (``overflow="block"``) for at most ``block_timeout_s``
+      before the record is dropped and counted the same way; ``submit`` is
+      called on the event loop, so it must never wait indefinitely
+"""
+
+import atexit
+import datetime
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+LOGGER = logging.getLogger("prediction_service")
+
+FSYNC_POLICIES = ("none", "batch")
+OVERFLOW_POLICIES = ("drop", "block")
+
+_STOP = object()
+
+
+class AuditLogSink:
+    """Background JSONL appender with batching, rotation and backpressure."""
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval_s: float = 1.0,
+        max_batch: int = 512,
+        max_queue: int = 10_000,
+        fsync: str = "none",
+        overflow: str = "drop",
+        block_timeout_s: float = 0.1,
+        max_bytes: int = 100 * 1024 * 1024,
+        backup_count: int = 10,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        self.path = path
+        self.flush_interval_s = flush_interval_s
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.overflow = overflow
+        self.block_timeout_s = block_timeout_s
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.rotations = 0
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="audit-log-writer", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.close)
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Enqueue a record; returns False if it was dropped because the queue is full."""
+        self.start()
+        try:
+            if self.overflow == "block":
+                self._queue.put(record, timeout=self.block_timeout_s)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Flush pending records and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "rotations": self.rotations,
+            }
+
+    # ---------------------------
+    # Writer thread
+    # ---------------------------
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            stopping = first is _STOP
+            batch: List[Dict[str, Any]] = [] if stopping else [first]
+
+            deadline = time.monotonic() + self.flush_interval_s
+            while not stopping and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            if stopping:
+                # Drain whatever is still queued so shutdown loses nothing.
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+
+            if batch:
+                self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            payload = "".join(json.dumps(record) + "\n" for record in batch)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                if self.fsync == "batch":
+                    os.fsync(f.fileno())
+                size = f.tell()
+        except Exception as exc:  # pragma: no cover - logging must not break API
+            LOGGER.error("Failed to write %d prediction log record(s): %s", len(batch), exc)
+            with self._lock:
+                self.failed += len(batch)
+            return
+
+        with self._lock:
+            self.written += len(batch)
+        if self.max_bytes > 0 and size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        rotated = f"{self.path}.{stamp}"
+        try:
+            os.replace(self.path, rotated)
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        except Exception as exc:  # pragma: no cover - logging must not break API
+            LOGGER.error("Failed to rotate prediction log %s: %s", self.path, exc)
+            return
+
+        with self._lock:
+            self.rotations += 1
+        backups = sorted(glob.glob(f"{glob.escape(self.path)}.*.gz"))
+        for old in backups[: max(len(backups) - self.backup_count, 0)]:
+            try:
+                os.remove(old)
+            except OSError as exc:  # pragma: no cover
+                LOGGER.warning("Failed to remove old prediction log %s: %s", old, exc)
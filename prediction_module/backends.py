@@ -0,0 +1,295 @@
+"""
+Pluggable inference engines for the InLegalBERT classifier.
+
+Every backend takes a padded batch of token windows as int64 numpy arrays
+(``input_ids``, ``attention_mask``) and returns class probabilities as a
+float32 array of shape ``(batch, num_labels)``.
+
+Available backends (``INFERENCE_BACKEND``):
+    torch        eager PyTorch ``AutoModelForSequenceClassification`` (default)
+    torchscript  TorchScript graph loaded from ``model.torchscript.pt``
+                 (traced on the fly if the file has not been exported)
+    compile      eager model wrapped in ``torch.compile(dynamic=True)``;
+                 with dynamic padding, batches are padded up to a few fixed
+                 lengths (``PADDING_BUCKETS``) so it does not recompile for
+                 every new batch length
+    int8         eager model with dynamically quantized (int8) Linear layers;
+                 CPU only, roughly halves weight memory -- check the accuracy
+                 impact first with ``python parity.py quantization``
+    onnx         ONNX Runtime session over ``model.onnx``; requires the
+                 optional ``onnxruntime`` package
+
+Export the graph-based formats once per model with:
+    python backends.py export --format onnx
+    python backends.py export --format torchscript
+"""
+
+import argparse
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification
+
+
+LOGGER = logging.getLogger("prediction_service")
+
+BACKENDS = ("torch", "torchscript", "compile", "onnx", "int8")
+ONNX_FILENAME = "model.onnx"
+TORCHSCRIPT_FILENAME = "model.torchscript.pt"
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def _example_inputs(batch: int = 2, length: int = 16) -> "tuple[torch.Tensor, torch.Tensor]":
+    input_ids = torch.ones((batch, length), dtype=torch.long)
+    attention_mask = torch.ones((batch, length), dtype=torch.long)
+    return input_ids, attention_mask
+
+
+def load_torch_model(model_path: str, device: str, **kwargs) -> torch.nn.Module:
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_path,
+        use_safetensors=True,
+        **kwargs,
+    ).to(device)
+    model.eval()
+    return model
+
+
+class InferenceBackend:
+    """Base class: subclasses implement ``predict_probs``."""
+
+    name = "base"
+    device = "cpu"
+    # Pad dynamic batches up to fixed bucket lengths (backends that compile per shape).
+    pad_to_buckets = False
+
+    def __init__(self, num_labels: int) -> None:
+        self.num_labels = num_labels
+
+    def predict_probs(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchBackend(InferenceBackend):
+    """Eager PyTorch execution of the Hugging Face model."""
+
+    name = "torch"
+
+    def __init__(self, model: torch.nn.Module, device: str) -> None:
+        super().__init__(model.config.num_labels)
+        self.model = model
+        self.device = device
+
+    @torch.no_grad()
+    def predict_probs(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        outputs = self.model(
+            input_ids=torch.from_numpy(input_ids).to(self.device),
+            attention_mask=torch.from_numpy(attention_mask).to(self.device),
+        )
+        return torch.softmax(outputs.logits, dim=1).float().cpu().numpy()
+
+
+class CompiledTorchBackend(TorchBackend):
+    """Eager model wrapped in ``torch.compile`` with dynamic shapes."""
+
+    name = "compile"
+    pad_to_buckets = True
+
+    def __init__(self, model: torch.nn.Module, device: str) -> None:
+        super().__init__(model, device)
+        self.model = torch.compile(model, dynamic=True)
+
+
+def quantize_dynamic_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Return a copy of ``model`` whose Linear layers use int8 weights and dynamic activation scaling."""
+    quantized = torch.ao.quantization.quantize_dynamic(
+        model.cpu(), {torch.nn.Linear}, dtype=torch.qint8, inplace=False
+    )
+    quantized.eval()
+    return quantized
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """Eager execution of the int8 dynamically quantized model (CPU only)."""
+
+    name = "int8"
+
+    def __init__(self, model: torch.nn.Module) -> None:
+        super().__init__(quantize_dynamic_int8(model), "cpu")
+
+
+class TorchScriptBackend(InferenceBackend):
+    """TorchScript module returning ``(logits,)``."""
+
+    name = "torchscript"
+
+    def __init__(self, module: torch.jit.ScriptModule, num_labels: int, device: str) -> None:
+        super().__init__(num_labels)
+        self.module = module
+        self.device = device
+
+    @torch.no_grad()
+    def predict_probs(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        logits = self.module(
+            torch.from_numpy(input_ids).to(self.device),
+            torch.from_numpy(attention_mask).to(self.device),
+        )[0]
+        return torch.softmax(logits, dim=1).float().cpu().numpy()
+
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime CPU session over an exported graph."""
+
+    name = "onnx"
+
+    def __init__(self, onnx_path: str, num_labels: int, intra_op_threads: int = 0) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise RuntimeError(
+                "INFERENCE_BACKEND=onnx requires the 'onnxruntime' package "
+                "(pip install onnxruntime)."
+            ) from exc
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"ONNX graph not found at {onnx_path}. "
+                "Run 'python backends.py export --format onnx' first."
+            )
+
+        super().__init__(num_labels)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def predict_probs(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        (logits,) = self.session.run(
+            ["logits"],
+            {"input_ids": input_ids, "attention_mask": attention_mask},
+        )
+        return _softmax(logits)
+
+
+# -------------------------------
+# Export
+# -------------------------------
+class _LogitsOnly(torch.nn.Module):
+    """Wrap the HF model so traced/exported graphs take positional inputs and return a tuple."""
+
+    def __init__(self, model: torch.nn.Module) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor):
+        return (self.model(input_ids=input_ids, attention_mask=attention_mask).logits,)
+
+
+def trace_torchscript(model: torch.nn.Module) -> torch.jit.ScriptModule:
+    with torch.no_grad():
+        traced = torch.jit.trace(
+            _LogitsOnly(model).eval(), _example_inputs(), strict=False, check_trace=False
+        )
+    return torch.jit.freeze(traced)
+
+
+def export_onnx(model: torch.nn.Module, output_path: str, opset: int = 17) -> str:
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model.cpu()).eval(),
+            _example_inputs(),
+            output_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": dynamic,
+                "attention_mask": dynamic,
+                "logits": {0: "batch"},
+            },
+            opset_version=opset,
+            dynamo=False,
+        )
+    return output_path
+
+
+def export_torchscript(model: torch.nn.Module, output_path: str) -> str:
+    torch.jit.save(trace_torchscript(model.cpu()), output_path)
+    return output_path
+
+
+# -------------------------------
+# Factory
+# -------------------------------
+def load_backend(
+    name: str,
+    model_path: str,
+    device: str = "cpu",
+    onnx_path: Optional[str] = None,
+    torchscript_path: Optional[str] = None,
+    intra_op_threads: int = 0,
+) -> InferenceBackend:
+    """Build the configured backend for the model stored at ``model_path``."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+
+    if name == "onnx":
+        num_labels = AutoConfig.from_pretrained(model_path).num_labels
+        return OnnxBackend(
+            onnx_path or os.path.join(model_path, ONNX_FILENAME),
+            num_labels,
+            intra_op_threads=intra_op_threads,
+        )
+
+    if name == "torchscript":
+        num_labels = AutoConfig.from_pretrained(model_path).num_labels
+        path = torchscript_path or os.path.join(model_path, TORCHSCRIPT_FILENAME)
+        if os.path.exists(path):
+            module = torch.jit.load(path, map_location=device)
+        else:
+            LOGGER.warning("TorchScript graph not found at %s; tracing the model at startup.", path)
+            module = trace_torchscript(load_torch_model(model_path, device))
+        return TorchScriptBackend(module, num_labels, device)
+
+    if name == "int8":
+        if device != "cpu":
+            LOGGER.warning("The int8 backend runs on CPU only; ignoring device '%s'.", device)
+        return QuantizedTorchBackend(load_torch_model(model_path, "cpu"))
+
+    model = load_torch_model(model_path, device)
+    if name == "compile":
+        return CompiledTorchBackend(model, device)
+    return TorchBackend(model, device)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export InLegalBERT to graph formats.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export the model for the onnx/torchscript backends.")
+    export.add_argument("--format", choices=["onnx", "torchscript"], required=True)
+    export.add_argument("--model-path", default="inlegalbert_final")
+    export.add_argument("--output", default="", help="Defaults to a file inside --model-path.")
+    export.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    model = load_torch_model(args.model_path, "cpu")
+    if args.format == "onnx":
+        path = export_onnx(model, args.output or os.path.join(args.model_path, ONNX_FILENAME), args.opset)
+    else:
+        path = export_torchscript(model, args.output or os.path.join(args.model_path, TORCHSCRIPT_FILENAME))
+    print(f"Exported {args.format} graph to {path}")
+    print("Verify it with: python parity.py backend --backend", args.format, "<text files>")
+
+
+if __name__ == "__main__":
+    main()
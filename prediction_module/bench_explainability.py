@@ -0,0 +1,148 @@
+"""
+Micro-benchmark for the sentence explainer in explainability.py.
+
+Times ``generate_explanation`` (document-wide keyword scan + heap top-k)
+against the reference implementation it replaced (one substring scan per
+keyword per sentence, full sort of every sentence) on the same documents,
+and checks that both score every sentence identically and select the same
+sentences.
+
+Usage (from prediction_module/):
+    python bench_explainability.py                     # synthetic judgment, 5000 sentences
+    python bench_explainability.py --sentences 20000 --repeat 5
+    python bench_explainability.py judgment1.txt judgment2.txt
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from typing import Callable, List
+
+from explainability import (
+    KEYWORD_WEIGHTS,
+    _score_sentence,
+    _split_into_sentences,
+    generate_explanation,
+)
+
+
+def _reference_split_into_sentences(text: str) -> List[str]:
+    normalized = re.sub(r"\s+", " ", text.strip())
+    if not normalized:
+        return []
+    parts = re.split(r"([.!?])\s+", normalized)
+    sentences: List[str] = []
+    for i in range(0, len(parts), 2):
+        chunk = parts[i].strip()
+        if not chunk:
+            continue
+        end = parts[i + 1] if i + 1 < len(parts) else ""
+        sentence = (chunk + end).strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def _reference_score_sentence(sentence: str) -> float:
+    s = sentence.lower()
+    score = 0.0
+    for keywords, weight in KEYWORD_WEIGHTS:
+        for kw in keywords:
+            if kw in s:
+                score += weight
+    length = len(sentence.split())
+    if length < 5:
+        score *= 0.3
+    elif length < 10:
+        score *= 0.6
+    elif length > 60:
+        score *= 0.7
+    score += min(max(length / 40.0, 0.0), 0.5)
+    return score
+
+
+def _reference_explanation(text: str, top_k: int = 3) -> List[str]:
+    sentences = _reference_split_into_sentences(text)
+    scored = [(s, _reference_score_sentence(s)) for s in sentences]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    seen = set()
+    top_sentences: List[str] = []
+    for sentence, _ in scored:
+        normalized = sentence.strip()
+        if not normalized or normalized.lower() in seen:
+            continue
+        seen.add(normalized.lower())
+        top_sentences.append(normalized)
+        if len(top_sentences) >= top_k:
+            break
+    return top_sentences
+
+
+def synthetic_judgment(num_sentences: int, seed: int = 0) -> str:
+    """Judgment-like text: mostly filler sentences with keywords sprinkled in."""
+    rng = random.Random(seed)
+    filler = (
+        "the learned counsel for the appellant submitted that the order of the high court "
+        "was passed after considering the material placed on record by both parties"
+    ).split()
+    keywords = [kw for keywords, _ in KEYWORD_WEIGHTS for kw in keywords]
+    sentences = []
+    for _ in range(num_sentences):
+        words = rng.sample(filler, rng.randint(4, len(filler)))
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def _time(fn: Callable[[str], List[str]], texts: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        began = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - began)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the sentence explainer.")
+    parser.add_argument("files", nargs="*", help="Text files to explain (default: synthetic judgment).")
+    parser.add_argument("--sentences", type=int, default=5000, help="Sentences in the synthetic judgment.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation; the best is reported.")
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.files:
+        texts = []
+        for path in args.files:
+            with open(path, encoding="utf-8") as f:
+                texts.append(f.read())
+    else:
+        texts = [synthetic_judgment(args.sentences)]
+
+    mismatches = 0
+    for text in texts:
+        sentences = _split_into_sentences(text)
+        identical = (
+            generate_explanation(text, args.top_k) == _reference_explanation(text, args.top_k)
+            and sentences == _reference_split_into_sentences(text)
+            and all(_score_sentence(s) == _reference_score_sentence(s) for s in sentences)
+        )
+        mismatches += not identical
+
+    num_sentences = sum(len(_split_into_sentences(text)) for text in texts)
+    reference = _time(lambda t: _reference_explanation(t, args.top_k), texts, args.repeat)
+    optimised = _time(lambda t: generate_explanation(t, args.top_k), texts, args.repeat)
+
+    print(f"documents: {len(texts)}  sentences: {num_sentences}")
+    print(f"reference: {reference * 1000:9.2f} ms")
+    print(f"optimised: {optimised * 1000:9.2f} ms  ({reference / optimised:.2f}x)")
+    print("outputs identical" if mismatches == 0 else f"MISMATCH in {mismatches} document(s)")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
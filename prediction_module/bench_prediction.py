@@ -0,0 +1,332 @@
+"""
+Latency/throughput benchmark for the prediction hot path.
+
+Times ``chunk_predict``, ``generate_explanation`` and ``extract_pdf_text``
+on deterministic synthetic judgments in three length buckets, then sweeps
+``chunk_predict`` over batch size, torch thread count and window stride on
+one bucket. Each case reports p50/p95/p99 latency and documents per second;
+the results are written as JSON and can be compared against a stored
+baseline, which exits non-zero when a case got slower than the tolerance.
+
+``--tiny-model`` builds a small randomly initialised BERT (and a word-level
+vocabulary for the synthetic texts) in a temporary directory and points
+MODEL_PATH at it, so the suite runs on any CPU box without the InLegalBERT
+weights. Its absolute numbers only compare against baselines taken with the
+same flag.
+
+Usage (from prediction_module/):
+    python bench_prediction.py run --tiny-model --output bench.json
+    python bench_prediction.py run --output bench.json --baseline bench_baseline.json
+    python bench_prediction.py compare bench.json bench_baseline.json --tolerance 0.2
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import string
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from bench_explainability import synthetic_judgment
+from explainability import KEYWORD_WEIGHTS
+
+
+# Sentences per synthetic judgment (about 13 words each): ~1, ~8 and ~35 windows.
+LENGTH_BUCKETS = {"short": 20, "medium": 150, "long": 600}
+PDF_CHARS_PER_PAGE = 3000
+PDF_LINE_CHARS = 90
+
+
+# -------------------------------
+# Synthetic inputs
+# -------------------------------
+def synthetic_corpus(docs_per_bucket: int, buckets: Sequence[str]) -> Dict[str, List[str]]:
+    """The same judgments on every run: seeds depend only on bucket and position."""
+    return {
+        bucket: [
+            synthetic_judgment(LENGTH_BUCKETS[bucket], seed=1000 * index + doc)
+            for doc in range(docs_per_bucket)
+        ]
+        for index, bucket in enumerate(buckets)
+    }
+
+
+def synthetic_pdf(text: str, chars_per_page: int = PDF_CHARS_PER_PAGE) -> bytes:
+    """A minimal text PDF (Helvetica, one content stream per page) holding ``text``."""
+    pages = [text[i : i + chars_per_page] for i in range(0, len(text), chars_per_page)] or [""]
+    objects: List[bytes] = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_id = 2 + 2 * len(pages)
+    page_ids = []
+    for page in pages:
+        lines = [page[i : i + PDF_LINE_CHARS] for i in range(0, len(page), PDF_LINE_CHARS)]
+        escaped = (
+            line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace")
+            for line in lines
+        )
+        stream = b"BT /F1 9 Tf 36 806 Td 11 TL " + b" ".join(b"(" + line + b") '" for line in escaped) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 1 0 R >> >> >>" % (pages_id, len(objects))
+        )
+        page_ids.append(len(objects))
+    objects.append(
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+    )
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    return out
+
+
+def build_tiny_model(path: str, seed: int = 0) -> None:
+    """Save a 2-layer random BERT classifier plus a vocabulary covering the synthetic texts."""
+    import torch
+    from tokenizers import BertWordPieceTokenizer
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    words = set(synthetic_judgment(200, seed=seed).lower().replace(".", " ").split())
+    words.update(word for keywords, _ in KEYWORD_WEIGHTS for keyword in keywords for word in keyword.split())
+    characters = string.ascii_lowercase + string.digits
+    vocab = (
+        ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+        + list(characters + string.punctuation)
+        + [f"##{c}" for c in characters]
+        + sorted(words - set(characters))
+    )
+    os.makedirs(path, exist_ok=True)
+    vocab_path = os.path.join(path, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab) + "\n")
+    # transformers 5 ignores ``vocab_file`` here and leaves only the special
+    # tokens, so the WordPiece model is built by ``tokenizers`` and passed in.
+    word_piece = BertWordPieceTokenizer(vocab_path, lowercase=True)
+    tokenizer = BertTokenizerFast(
+        tokenizer_object=word_piece._tokenizer,
+        do_lower_case=True,
+        unk_token="[UNK]",
+        sep_token="[SEP]",
+        pad_token="[PAD]",
+        cls_token="[CLS]",
+        mask_token="[MASK]",
+    )
+    if len(tokenizer) != len(vocab):
+        raise RuntimeError(f"Tiny tokenizer has {len(tokenizer)} tokens, expected {len(vocab)}")
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=128,
+        max_position_embeddings=512,
+        num_labels=2,
+    )
+    BertForSequenceClassification(config).eval().save_pretrained(path)
+
+
+# -------------------------------
+# Measurement
+# -------------------------------
+def measure(fn: Callable[[Any], Any], inputs: Sequence[Any], repeat: int) -> Dict[str, float]:
+    """Latency percentiles and throughput of ``fn`` over ``repeat`` passes of ``inputs``."""
+    fn(inputs[0])  # warm-up: lazy loading, allocator and thread-pool start-up
+    latencies = []
+    began = time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - start)
+    total = time.perf_counter() - began
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "calls": len(latencies),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3),
+        "docs_per_s": round(len(latencies) / total, 3),
+    }
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    import torch
+
+    import prediction
+
+    prediction.MODEL_LIFECYCLE.ensure_loaded()
+    corpus = synthetic_corpus(args.docs, args.buckets)
+    pdfs = {bucket: [synthetic_pdf(text) for text in texts] for bucket, texts in corpus.items()}
+    default_threads = torch.get_num_threads()
+    results: List[Dict[str, Any]] = []
+
+    def record(benchmark: str, bucket: str, params: Dict[str, Any], fn: Callable[[Any], Any], inputs: Sequence[Any]) -> None:
+        stats = measure(fn, inputs, args.repeat)
+        name = "/".join([benchmark, bucket] + [f"{key}={value}" for key, value in params.items()])
+        results.append({"name": name, "benchmark": benchmark, "bucket": bucket, "params": params, **stats})
+        print(f"{name:<48} p50 {stats['p50_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms  "
+              f"p99 {stats['p99_ms']:9.2f} ms  {stats['docs_per_s']:8.2f} docs/s")
+
+    def predict(stride: int = 256, batch_size: int = prediction.INFERENCE_BATCH_SIZE) -> Callable[[str], Any]:
+        # Let the batch-size sweep reach its size even with 512-token windows.
+        max_batch_tokens = max(prediction.INFERENCE_MAX_BATCH_TOKENS, batch_size * prediction.MAX_WINDOW_TOKENS)
+        return lambda text: prediction.chunk_predict(
+            text, stride=stride, batch_size=batch_size, max_batch_tokens=max_batch_tokens, use_window_cache=False
+        )
+
+    for bucket in args.buckets:
+        record("chunk_predict", bucket, {}, predict(), corpus[bucket])
+        record("generate_explanation", bucket, {}, prediction.generate_explanation_sentences, corpus[bucket])
+        record("extract_pdf_text", bucket, {}, prediction.extract_pdf_text, pdfs[bucket])
+
+    texts = corpus[args.sweep_bucket]
+    for batch_size in args.batch_sizes:
+        record("chunk_predict", args.sweep_bucket, {"batch_size": batch_size}, predict(batch_size=batch_size), texts)
+    for stride in args.strides:
+        record("chunk_predict", args.sweep_bucket, {"stride": stride}, predict(stride=stride), texts)
+    try:
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            record("chunk_predict", args.sweep_bucket, {"threads": threads}, predict(), texts)
+    finally:
+        torch.set_num_threads(default_threads)
+
+    return {
+        "meta": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "model": "tiny-random-bert" if args.tiny_model else prediction.MODEL_ID,
+            "backend": type(prediction.backend).__name__,
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count(),
+            "torch_threads": default_threads,
+            "docs_per_bucket": args.docs,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+# -------------------------------
+# Baseline comparison
+# -------------------------------
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Names of cases whose p50/p95 latency rose, or throughput fell, by more than ``tolerance``."""
+    for key in ("model", "backend", "cpu_count"):
+        if current["meta"].get(key) != baseline["meta"].get(key):
+            print(f"warning: {key} differs from the baseline "
+                  f"({current['meta'].get(key)} vs {baseline['meta'].get(key)})")
+
+    previous = {case["name"]: case for case in baseline["results"]}
+    regressions = []
+    print(f"{'case':<48} {'p50 ms':>19} {'p95 ms':>19} {'docs/s':>17}")
+    for case in current["results"]:
+        old = previous.get(case["name"])
+        if old is None:
+            print(f"{case['name']:<48} (not in baseline)")
+            continue
+        slower = (
+            case["p50_ms"] > old["p50_ms"] * (1 + tolerance)
+            or case["p95_ms"] > old["p95_ms"] * (1 + tolerance)
+            or case["docs_per_s"] < old["docs_per_s"] / (1 + tolerance)
+        )
+        if slower:
+            regressions.append(case["name"])
+        print(
+            f"{case['name']:<48} {old['p50_ms']:8.2f} -> {case['p50_ms']:8.2f} "
+            f"{old['p95_ms']:8.2f} -> {case['p95_ms']:8.2f} "
+            f"{old['docs_per_s']:7.2f} -> {case['docs_per_s']:7.2f}"
+            + ("  REGRESSION" if slower else "")
+        )
+    return regressions
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _report(regressions: List[str], tolerance: float) -> int:
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed by more than {tolerance:.0%}")
+        return 1
+    print(f"no regressions beyond {tolerance:.0%}")
+    return 0
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the prediction hot path.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Run the suite and write JSON results.")
+    run.add_argument("--output", default="bench_results.json")
+    run.add_argument("--baseline", default="", help="Compare against this results file afterwards.")
+    run.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before a case is flagged.")
+    run.add_argument("--tiny-model", action="store_true", help="Use a small random BERT instead of MODEL_PATH.")
+    run.add_argument("--docs", type=int, default=4, help="Synthetic documents per length bucket.")
+    run.add_argument("--repeat", type=int, default=3, help="Passes over each bucket per case.")
+    run.add_argument("--buckets", type=lambda v: v.split(","), default=list(LENGTH_BUCKETS),
+                     help=f"Comma-separated subset of: {', '.join(LENGTH_BUCKETS)}.")
+    run.add_argument("--sweep-bucket", default="medium", choices=list(LENGTH_BUCKETS))
+    run.add_argument("--batch-sizes", type=_int_list, default=[1, 8, 16, 32])
+    run.add_argument("--threads", type=_int_list, default=sorted({1, 2, os.cpu_count() or 1}))
+    run.add_argument("--strides", type=_int_list, default=[128, 256, 384])
+    cmp = sub.add_parser("compare", help="Compare two results files.")
+    cmp.add_argument("current")
+    cmp.add_argument("baseline")
+    cmp.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        return _report(compare(_load(args.current), _load(args.baseline), args.tolerance), args.tolerance)
+
+    unknown = set(args.buckets) - set(LENGTH_BUCKETS)
+    if unknown:
+        parser.error(f"unknown bucket(s): {', '.join(sorted(unknown))}")
+
+    tiny_dir: Optional[tempfile.TemporaryDirectory] = None
+    if args.tiny_model:
+        # prediction.py reads MODEL_PATH at import time, so this must come first.
+        tiny_dir = tempfile.TemporaryDirectory(prefix="tiny-bert-")
+        build_tiny_model(tiny_dir.name)
+        os.environ["MODEL_PATH"] = tiny_dir.name
+        for name in ("ONNX_MODEL_PATH", "TORCHSCRIPT_MODEL_PATH"):
+            os.environ.pop(name, None)
+
+    try:
+        report = run_suite(args)
+    finally:
+        if tiny_dir is not None:
+            tiny_dir.cleanup()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        return _report(compare(report, _load(args.baseline), args.tolerance), args.tolerance)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
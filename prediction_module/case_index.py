@@ -0,0 +1,375 @@
+"""
+On-disk index of case embeddings for similar-case retrieval.
+
+An index is a directory holding
+    manifest.json       dimension, row count, storage dtype, model id, IVF size
+    embeddings.npy      (rows, dim) unit-length document embeddings, stored as
+                        float16, or int8 with a per-row scale (scales.npy)
+    cases.jsonl         one metadata object per row ({"id": ..., ...})
+    case_offsets.npy    byte offset of each row's line in cases.jsonl
+    ivf_centroids.npy   (lists, dim) k-means centroids          } optional
+    ivf_offsets.npy     (lists + 1,) first row of each list     }
+
+Every array is memory-mapped when the index is opened, so start-up is
+instant, workers forked by serve.py share one copy through the page cache,
+and only the rows a query touches are read.
+
+Search is cosine similarity (a dot product of unit vectors). Without IVF it
+scans the matrix in blocks and keeps a running top-k; with IVF the rows are
+stored grouped by their nearest centroid and a query scans only the
+``nprobe`` lists whose centroids are closest, which keeps latency in
+milliseconds for corpora of millions of cases.
+
+Build an index (embeds with the service's InLegalBERT model, in batches):
+    python case_index.py build --csv cases.csv --output case_index --ivf-lists 1024
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+
+LOGGER = logging.getLogger("prediction_service")
+
+DTYPES = ("float16", "int8")
+MANIFEST = "manifest.json"
+SEARCH_BLOCK_ROWS = 16384  # rows converted to float32 at a time during a scan
+
+
+def quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: returns ``(codes, scales)``."""
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(embeddings / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[keep], rows[keep]
+    return scores, rows
+
+
+def _blocks(ranges: List[Tuple[int, int]], block_rows: int) -> Iterator[List[Tuple[int, int]]]:
+    """Regroup row ranges into pieces of at most ``block_rows`` rows in total."""
+    pieces: List[Tuple[int, int]] = []
+    size = 0
+    for start, stop in ranges:
+        while start < stop:
+            take = min(stop - start, block_rows - size)
+            pieces.append((start, start + take))
+            size += take
+            start += take
+            if size == block_rows:
+                yield pieces
+                pieces, size = [], 0
+    if pieces:
+        yield pieces
+
+
+# -------------------------------
+# Reading and search
+# -------------------------------
+class CaseIndex:
+    """Memory-mapped embedding matrix with exact or IVF top-k search."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        self.dim = int(self.manifest["dim"])
+        self.dtype = self.manifest["dtype"]
+        self.model_id = self.manifest.get("model_id", "")
+
+        self.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        self.scales = (
+            np.load(os.path.join(path, "scales.npy"), mmap_mode="r") if self.dtype == "int8" else None
+        )
+        self._offsets = np.load(os.path.join(path, "case_offsets.npy"), mmap_mode="r")
+        self._cases_file = open(os.path.join(path, "cases.jsonl"), "rb")
+        self._cases = (
+            mmap.mmap(self._cases_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.path.getsize(self._cases_file.name)
+            else b""
+        )
+
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        if self.manifest.get("ivf_lists"):
+            self.centroids = np.load(os.path.join(path, "ivf_centroids.npy"))
+            self.list_offsets = np.load(os.path.join(path, "ivf_offsets.npy"))
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def close(self) -> None:
+        if isinstance(self._cases, mmap.mmap):
+            self._cases.close()
+        self._cases_file.close()
+
+    def case(self, row: int) -> Dict[str, Any]:
+        """Metadata stored for ``row``; read from the mapped file on demand."""
+        start = int(self._offsets[row])
+        end = self._cases.find(b"\n", start)
+        return json.loads(self._cases[start : end if end != -1 else len(self._cases)])
+
+    def _scan(self, ranges: List[Tuple[int, int]], query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k over the rows in ``ranges``, scored ``SEARCH_BLOCK_ROWS`` rows at a time."""
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        query_t = torch.from_numpy(query)
+        for pieces in _blocks(ranges, SEARCH_BLOCK_ROWS):
+            # torch widens float16/int8 to float32 several times faster than numpy.
+            block = torch.from_numpy(np.concatenate([self.embeddings[a:b] for a, b in pieces]))
+            scores = (block.float() @ query_t).numpy()
+            if self.scales is not None:
+                scores *= np.concatenate([self.scales[a:b] for a, b in pieces])
+            rows = np.concatenate([np.arange(a, b) for a, b in pieces])
+            best_scores, best_rows = _top_k(
+                np.concatenate([best_scores, scores]), np.concatenate([best_rows, rows]), k
+            )
+        return best_scores, best_rows
+
+    def search(
+        self, query: np.ndarray, k: int = 10, nprobe: int = 0
+    ) -> List[Tuple[int, float]]:
+        """
+        Rows of the ``k`` most similar cases as ``(row, cosine similarity)``,
+        best first. ``nprobe`` lists are scanned on an IVF index (0 scans
+        every row, i.e. exact search).
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Query has dimension {query.shape[0]}, index expects {self.dim}")
+        norm = float(np.linalg.norm(query))
+        if norm == 0 or k <= 0 or len(self) == 0:
+            return []
+        query = query / norm
+
+        if self.centroids is not None and 0 < nprobe < len(self.centroids):
+            nearest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            ranges = [
+                (int(self.list_offsets[i]), int(self.list_offsets[i + 1]))
+                for i in sorted(nearest)
+            ]
+        else:
+            ranges = [(0, len(self))]
+
+        scores, rows = self._scan(ranges, query, k)
+        order = np.argsort(-scores, kind="stable")
+        # int8 rounding can push a near-duplicate just past 1.
+        return [(int(rows[i]), min(float(scores[i]), 1.0)) for i in order]
+
+
+# -------------------------------
+# Building
+# -------------------------------
+class CaseIndexWriter:
+    """Write an index row batch by row batch, then optionally group it into IVF lists."""
+
+    def __init__(self, path: str, num_rows: int, dim: int, dtype: str = "float16", model_id: str = "") -> None:
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown index dtype '{dtype}'. Choose one of: {', '.join(DTYPES)}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.num_rows = num_rows
+        self.dim = dim
+        self.dtype = dtype
+        self.model_id = model_id
+        self.rows_written = 0
+
+        self._embeddings = np.lib.format.open_memmap(
+            self._file("embeddings.npy"), mode="w+", dtype=np.dtype(dtype), shape=(num_rows, dim)
+        )
+        self._scales = (
+            np.lib.format.open_memmap(self._file("scales.npy"), mode="w+", dtype=np.float32, shape=(num_rows,))
+            if dtype == "int8"
+            else None
+        )
+        self._offsets = np.zeros(num_rows, dtype=np.int64)
+        self._cases = open(self._file("cases.jsonl"), "wb")
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def add(self, embeddings: np.ndarray, cases: List[Dict[str, Any]]) -> None:
+        """Append unit-length ``embeddings`` and their metadata, in order."""
+        start, stop = self.rows_written, self.rows_written + len(embeddings)
+        if stop > self.num_rows:
+            raise ValueError(f"Index was sized for {self.num_rows} rows")
+        if self._scales is not None:
+            self._embeddings[start:stop], self._scales[start:stop] = quantize_int8(embeddings)
+        else:
+            self._embeddings[start:stop] = embeddings.astype(np.float16)
+        for row, case in zip(range(start, stop), cases):
+            self._offsets[row] = self._cases.tell()
+            self._cases.write(json.dumps(case, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.rows_written = stop
+
+    def close(self, ivf_lists: int = 0, kmeans_iterations: int = 10, seed: int = 0) -> None:
+        """Flush everything and write the manifest; ``ivf_lists`` > 0 also builds the IVF lists."""
+        if self.rows_written != self.num_rows:
+            raise ValueError(f"Wrote {self.rows_written} of {self.num_rows} rows")
+        self._cases.close()
+        self._embeddings.flush()
+        if self._scales is not None:
+            self._scales.flush()
+
+        ivf_lists = min(ivf_lists, self.num_rows)
+        if ivf_lists > 0:
+            self._build_ivf(ivf_lists, kmeans_iterations, seed)
+        np.save(self._file("case_offsets.npy"), self._offsets)
+
+        manifest = {
+            "dim": self.dim,
+            "rows": self.num_rows,
+            "dtype": self.dtype,
+            "model_id": self.model_id,
+            "ivf_lists": ivf_lists,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with open(self._file(MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    def _rows_float32(self, rows: Any) -> np.ndarray:
+        """Dequantized rows for a slice or an array of row numbers."""
+        block = np.asarray(self._embeddings[rows], dtype=np.float32)
+        if self._scales is not None:
+            block *= np.asarray(self._scales[rows])[:, None]
+        return block
+
+    def _build_ivf(self, lists: int, iterations: int, seed: int) -> None:
+        """Spherical k-means on a sample, then store the rows grouped by list."""
+        rng = np.random.default_rng(seed)
+        sample_size = min(self.num_rows, max(lists * 64, 10000))
+        sample = self._rows_float32(np.sort(rng.choice(self.num_rows, sample_size, replace=False)))
+
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(lists):
+                members = sample[assignment == i]
+                if len(members):
+                    centroids[i] = members.sum(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        assignment = np.empty(self.num_rows, dtype=np.int64)
+        for start in range(0, self.num_rows, SEARCH_BLOCK_ROWS):
+            stop = min(start + SEARCH_BLOCK_ROWS, self.num_rows)
+            assignment[start:stop] = np.argmax(self._rows_float32(slice(start, stop)) @ centroids.T, axis=1)
+
+        order = np.argsort(assignment, kind="stable")
+        self._reorder(order)
+        self._offsets = self._offsets[order]
+        list_offsets = np.zeros(lists + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignment, minlength=lists))
+        np.save(self._file("ivf_centroids.npy"), centroids.astype(np.float32))
+        np.save(self._file("ivf_offsets.npy"), list_offsets)
+
+    def _reorder(self, order: np.ndarray) -> None:
+        for name, array in (("embeddings.npy", self._embeddings), ("scales.npy", self._scales)):
+            if array is None:
+                continue
+            tmp_path = self._file(name + ".tmp")
+            out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=array.dtype, shape=array.shape)
+            for start in range(0, len(order), SEARCH_BLOCK_ROWS):
+                rows = order[start : start + SEARCH_BLOCK_ROWS]
+                out[start : start + len(rows)] = array[rows]
+            out.flush()
+            del out
+            os.replace(tmp_path, self._file(name))
+        self._embeddings = np.load(self._file("embeddings.npy"), mmap_mode="r")
+        if self._scales is not None:
+            self._scales = np.load(self._file("scales.npy"), mmap_mode="r")
+
+
+# -------------------------------
+# Offline indexer
+# -------------------------------
+def _iter_corpus(
+    csv_path: str, text_column: str, id_column: str, metadata_columns: List[str], chunk_rows: int
+) -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+    import pandas as pd
+
+    columns = [text_column] + ([id_column] if id_column else []) + metadata_columns
+    for frame in pd.read_csv(csv_path, usecols=columns, chunksize=chunk_rows):
+        frame = frame.dropna(subset=[text_column])
+        texts = frame[text_column].astype(str).tolist()
+        cases = []
+        # The chunk index continues across chunks, so it is the CSV row number
+        # even after rows without text have been dropped.
+        for row, record in zip(frame.index, frame.to_dict("records")):
+            case = {"id": str(record[id_column]) if id_column else str(row)}
+            # Missing cells would otherwise be written as NaN, which is not JSON.
+            case.update(
+                {column: None if pd.isna(record[column]) else record[column] for column in metadata_columns}
+            )
+            cases.append(case)
+        yield texts, cases
+
+
+def _count_rows(csv_path: str, text_column: str, limit: int = 0, chunk_rows: int = 10_000) -> int:
+    """Rows with text, read in chunks like ``_iter_corpus`` so the corpus never sits in memory."""
+    import pandas as pd
+
+    count = 0
+    for frame in pd.read_csv(csv_path, usecols=[text_column], chunksize=chunk_rows):
+        count += int(frame[text_column].notna().sum())
+        if limit and count >= limit:
+            return limit
+    return count
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the similar-case index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Embed a CSV corpus and write an index directory.")
+    build.add_argument("--csv", required=True, help="Corpus with one case per row.")
+    build.add_argument("--output", required=True, help="Index directory to create.")
+    build.add_argument("--text-column", default="text")
+    build.add_argument("--id-column", default="", help="Defaults to the row number.")
+    build.add_argument("--metadata-columns", default="", help="Comma-separated columns returned with results.")
+    build.add_argument("--dtype", choices=DTYPES, default="float16")
+    build.add_argument("--ivf-lists", type=int, default=0,
+                       help="IVF lists for approximate search (about 4*sqrt(rows)); 0 builds an exact index.")
+    build.add_argument("--batch-size", type=int, default=64, help="Documents embedded per batch.")
+    build.add_argument("--limit", type=int, default=0, help="Index only the first N cases.")
+    args = parser.parse_args()
+
+    import prediction
+
+    prediction.MODEL_LIFECYCLE.ensure_loaded()
+    metadata_columns = [c for c in args.metadata_columns.split(",") if c]
+    num_rows = _count_rows(args.csv, args.text_column, args.limit)
+
+    writer = CaseIndexWriter(
+        args.output, num_rows, prediction.embedding_dim(), args.dtype, model_id=prediction.MODEL_ID
+    )
+    began = time.perf_counter()
+    for texts, cases in _iter_corpus(
+        args.csv, args.text_column, args.id_column, metadata_columns, args.batch_size
+    ):
+        remaining = num_rows - writer.rows_written
+        if remaining <= 0:
+            break
+        texts, cases = texts[:remaining], cases[:remaining]
+        writer.add(prediction.embed_documents(texts), cases)
+        rate = writer.rows_written / (time.perf_counter() - began)
+        print(f"\rEmbedded {writer.rows_written}/{num_rows} cases ({rate:.1f}/s)", end="", flush=True)
+    print()
+    writer.close(ivf_lists=args.ivf_lists)
+    print(f"Wrote {num_rows} cases to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
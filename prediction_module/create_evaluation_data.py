@@ -1,53 +1,313 @@
-import pandas as pd
-import torch
+"""
+Offline evaluation runner: scores a labelled dataset with the prediction
+model and writes the inputs of evaluation.py.
+
+The sampled documents are sorted by length and cut into batches of
+``--batch-docs`` documents; all windows of a batch go through one
+``_predict_windows`` call, so micro-batches hold windows of similar length
+from several documents instead of one short document at a time. Batches are
+dealt round-robin to ``--workers`` processes, each pinned to its own cores
+(see serve.core_groups) with a matching torch thread pool. Where processes
+are forked, the parent loads the model first so the workers share its weight
+pages, as serve.py does.
+
+Every finished batch is checkpointed to ``<output-dir>/evaluation_checkpoint/``
+(written atomically), so an interrupted run picks up where it stopped when
+started again with the same arguments. When all batches are done the
+checkpoint is merged into:
+
+    evaluation_data.csv            epoch, y_true, y_pred, y_prob, response_time_ms, doc_length, model_version
+    evaluation_documents.parquet   per-document P(ACCEPT) and metadata
+    evaluation_windows.parquet     per-window P(ACCEPT)
+
+``response_time_ms`` is the document's share of its batch's wall time
+(proportional to its window count); use ``--batch-docs 1 --workers 1`` to
+measure true per-document latency instead.
+
+Usage (from prediction_module/):
+    python create_evaluation_data.py --dataset test.csv
+    python create_evaluation_data.py --dataset test.csv --sample 0 --workers 4 --epoch 3
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import sys
 import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
 from tqdm import tqdm
-from prediction import chunk_predict
-
-def predict_document(text):
-    result = chunk_predict(text)
-    return {
-        "prediction": result["prediction"],
-        "confidence": result["confidence"]
-    }
-
-# Load test dataset
-df_test = pd.read_csv("E:\\final year project\\justifi-legal-ai\\datasets\\binary_test\\CJPE_ext_SCI_HCs_Tribunals_daily_orders_test.csv")
-df_test = df_test.sample(2000, random_state=42)
-df_test = df_test[['text', 'label']].dropna()
-
-results = []
-
-for _, row in tqdm(df_test.iterrows(), total=len(df_test)):
-    text = str(row["text"])
-    y_true = int(row["label"])
-    doc_length = len(text)
-
-    start_time = time.time()
-    result = predict_document(text)
-    end_time = time.time()
-
-    response_time_ms = (end_time - start_time) * 1000
-
-    y_pred = 1 if result["prediction"] == "ACCEPT" else 0
-    y_prob = result["confidence"]
-
-    results.append([
-        y_true,
-        y_pred,
-        y_prob,
-        response_time_ms,
-        doc_length
-    ])
-
-eval_df = pd.DataFrame(results, columns=[
-    "y_true",
-    "y_pred",
-    "y_prob",
-    "response_time_ms",
-    "doc_length"
-])
-
-eval_df.to_csv("evaluation_data.csv", index=False)
-
-print("evaluation_data.csv created successfully")
\ No newline at end of file
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_DIRNAME = "evaluation_checkpoint"
+
+# Settings that change which documents land in which batch, or their scores;
+# a checkpoint written under different values cannot be resumed.
+RUN_KEYS = ("dataset", "text_column", "label_column", "sample", "seed", "batch_docs", "stride", "epoch", "model_version")
+
+
+# -------------------------------
+# Dataset and batching
+# -------------------------------
+def load_dataset(path: str, text_column: str, label_column: str, sample: int, seed: int) -> pd.DataFrame:
+    """Labelled documents to evaluate, with ``doc_id`` and ``source_row`` columns."""
+    df = pd.read_csv(path, usecols=[text_column, label_column])
+    df = df.dropna(subset=[text_column, label_column])
+    if 0 < sample < len(df):
+        df = df.sample(sample, random_state=seed)
+    return pd.DataFrame(
+        {
+            "doc_id": np.arange(len(df), dtype=np.int32),
+            "source_row": df.index.to_numpy(),
+            "text": df[text_column].astype(str).to_numpy(),
+            "y_true": df[label_column].astype(int).to_numpy(),
+        }
+    )
+
+
+def length_sorted_batches(lengths: np.ndarray, batch_docs: int) -> List[np.ndarray]:
+    """Document positions grouped ``batch_docs`` at a time, longest documents first."""
+    order = np.argsort(-lengths, kind="stable")
+    return [order[i : i + batch_docs] for i in range(0, len(order), batch_docs)]
+
+
+def default_epoch(model_path: str) -> int:
+    """Training epoch recorded by the Hugging Face Trainer next to the weights, else 0."""
+    state_path = os.path.join(model_path, "trainer_state.json")
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            return int(round(float(json.load(f).get("epoch") or 0)))
+    except (OSError, ValueError):
+        return 0
+
+
+# -------------------------------
+# Checkpoint
+# -------------------------------
+def _batch_path(checkpoint_dir: str, index: int, table: str) -> str:
+    return os.path.join(checkpoint_dir, f"batch-{index:06d}.{table}.parquet")
+
+
+def _write_atomic(df: pd.DataFrame, path: str) -> None:
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def completed_batches(checkpoint_dir: str) -> List[int]:
+    """Batches whose documents table exists; it is written after the windows table."""
+    pattern = os.path.join(checkpoint_dir, "batch-*.documents.parquet")
+    return sorted(int(os.path.basename(p).split(".")[0].split("-")[1]) for p in glob.glob(pattern))
+
+
+def open_checkpoint(checkpoint_dir: str, run: Dict[str, Any], fresh: bool) -> None:
+    """Create the checkpoint, or check that an existing one belongs to this run."""
+    manifest_path = os.path.join(checkpoint_dir, "run.json")
+    if fresh and os.path.isdir(checkpoint_dir):
+        for path in glob.glob(os.path.join(checkpoint_dir, "*")):
+            os.remove(path)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            previous = json.load(f)
+        changed = [key for key in RUN_KEYS if previous.get(key) != run[key]]
+        if changed:
+            raise SystemExit(
+                f"{checkpoint_dir} holds a run with different {', '.join(changed)}; "
+                "pass --fresh to discard it."
+            )
+        return
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+
+
+def merge_checkpoint(checkpoint_dir: str, output_dir: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Combine all batch tables into the evaluation.py inputs in output_dir."""
+    indices = completed_batches(checkpoint_dir)
+    documents = pd.concat(
+        [pd.read_parquet(_batch_path(checkpoint_dir, i, "documents")) for i in indices], ignore_index=True
+    ).sort_values("doc_id", ignore_index=True)
+    windows = pd.concat(
+        [pd.read_parquet(_batch_path(checkpoint_dir, i, "windows")) for i in indices], ignore_index=True
+    ).sort_values(["doc_id", "window"], ignore_index=True)
+
+    documents.to_parquet(os.path.join(output_dir, "evaluation_documents.parquet"), index=False)
+    windows.to_parquet(os.path.join(output_dir, "evaluation_windows.parquet"), index=False)
+    documents.assign(
+        y_pred=(documents["prediction"] == "ACCEPT").astype(int),
+        y_prob=documents["prob_accept"],
+    )[
+        ["epoch", "y_true", "y_pred", "y_prob", "response_time_ms", "doc_length", "model_version"]
+    ].to_csv(os.path.join(output_dir, "evaluation_data.csv"), index=False)
+    return documents, windows
+
+
+# -------------------------------
+# Scoring
+# -------------------------------
+def score_batch(batch: pd.DataFrame, stride: int, epoch: int, model_version: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Score every document of a batch with one _predict_windows call."""
+    from prediction import _aggregate_chunk_probs, _encode_windows, _predict_windows
+
+    began = time.perf_counter()
+    doc_windows = [_encode_windows(text, stride=stride) for text in batch["text"]]
+    probs = _predict_windows([ids for windows in doc_windows for ids in windows])
+    elapsed_ms = (time.perf_counter() - began) * 1000
+
+    counts = np.array([len(windows) for windows in doc_windows])
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    predictions = [
+        _aggregate_chunk_probs(probs[bounds[i] : bounds[i + 1]])["prediction"] for i in range(len(counts))
+    ]
+    prob_accept = probs[:, 1]
+    doc_ids = batch["doc_id"].to_numpy()
+
+    documents = pd.DataFrame(
+        {
+            "doc_id": doc_ids,
+            "source_row": batch["source_row"].to_numpy(),
+            "y_true": batch["y_true"].to_numpy(),
+            "prediction": predictions,
+            "prob_accept": np.add.reduceat(prob_accept, bounds[:-1]) / counts,
+            "num_windows": counts.astype(np.int32),
+            "response_time_ms": elapsed_ms * counts / counts.sum(),
+            "doc_length": batch["text"].str.len().to_numpy(),
+            "epoch": epoch,
+            "model_version": model_version,
+        }
+    )
+    windows = pd.DataFrame(
+        {
+            "doc_id": np.repeat(doc_ids, counts).astype(np.int32),
+            "window": np.concatenate([np.arange(n) for n in counts]).astype(np.int32),
+            "prob_accept": prob_accept.astype(np.float32),
+        }
+    )
+    return documents, windows
+
+
+def run_shard(
+    shard: int,
+    cores: Optional[List[int]],
+    batches: List[Tuple[int, pd.DataFrame]],
+    checkpoint_dir: str,
+    args: argparse.Namespace,
+    progress: Optional[Callable[[int], Any]] = None,
+) -> None:
+    """Score and checkpoint the given batches; ``progress`` is called with each batch's size."""
+    if cores is not None:
+        import torch
+
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        torch.set_num_threads(max(len(cores), 1))
+
+    for index, batch in batches:
+        documents, windows = score_batch(batch, args.stride, args.epoch, args.model_version)
+        _write_atomic(windows, _batch_path(checkpoint_dir, index, "windows"))
+        _write_atomic(documents, _batch_path(checkpoint_dir, index, "documents"))
+        if progress is not None:
+            progress(len(batch))
+
+
+def _run_parallel(
+    shards: List[List[Tuple[int, pd.DataFrame]]], checkpoint_dir: str, args: argparse.Namespace, bar: tqdm
+) -> bool:
+    from serve import core_groups
+
+    context = multiprocessing.get_context()
+    if context.get_start_method() == "fork":
+        import prediction
+
+        prediction.MODEL_LIFECYCLE.ensure_loaded()
+    progress = context.Queue()
+    processes = [
+        context.Process(
+            target=run_shard,
+            args=(shard, cores, batches, checkpoint_dir, args, progress.put),
+            name=f"evaluation-shard-{shard}",
+        )
+        for shard, (cores, batches) in enumerate(zip(core_groups(len(shards)), shards))
+    ]
+    for process in processes:
+        process.start()
+    try:
+        while any(process.is_alive() for process in processes) or not progress.empty():
+            try:
+                bar.update(progress.get(timeout=0.5))
+            except queue.Empty:
+                pass
+    finally:
+        for process in processes:
+            process.join()
+    return all(process.exitcode == 0 for process in processes)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Score a labelled dataset for evaluation.py.")
+    parser.add_argument("--dataset", required=True, help="CSV file with the documents and labels.")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--label-column", default="label", help="1 = ACCEPT, 0 = REJECT.")
+    parser.add_argument("--sample", type=int, default=2000, help="Documents to sample (0 = all).")
+    parser.add_argument("--seed", type=int, default=42, help="Sampling seed.")
+    parser.add_argument("--workers", type=int, default=1, help="Scoring processes.")
+    parser.add_argument("--batch-docs", type=int, default=16, help="Documents scored together per batch.")
+    parser.add_argument("--stride", type=int, default=256)
+    parser.add_argument("--epoch", type=int, default=None,
+                        help="Training epoch of the model (default: from trainer_state.json, else 0).")
+    parser.add_argument("--output-dir", default=BASE_DIR)
+    parser.add_argument("--fresh", action="store_true", help="Discard an existing checkpoint.")
+    args = parser.parse_args()
+
+    if args.workers < 1 or args.batch_docs < 1:
+        parser.error("--workers and --batch-docs must be at least 1")
+
+    import prediction
+
+    args.dataset = os.path.abspath(args.dataset)
+    args.model_version = prediction.MODEL_ID
+    if args.epoch is None:
+        args.epoch = default_epoch(prediction.MODEL_PATH)
+
+    df = load_dataset(args.dataset, args.text_column, args.label_column, args.sample, args.seed)
+    checkpoint_dir = os.path.join(args.output_dir, CHECKPOINT_DIRNAME)
+    open_checkpoint(checkpoint_dir, {key: getattr(args, key) for key in RUN_KEYS}, args.fresh)
+
+    done = set(completed_batches(checkpoint_dir))
+    pending = [
+        (index, df.iloc[positions])
+        for index, positions in enumerate(length_sorted_batches(df["text"].str.len().to_numpy(), args.batch_docs))
+        if index not in done
+    ]
+    print(
+        f"{len(df)} documents in {len(pending) + len(done)} batches; "
+        f"{len(done)} already checkpointed, {len(pending)} to score "
+        f"(epoch {args.epoch}, model {args.model_version})"
+    )
+
+    workers = min(args.workers, len(pending)) or 1
+    with tqdm(total=sum(len(batch) for _, batch in pending), unit="doc") as bar:
+        if workers == 1:
+            run_shard(0, None, pending, checkpoint_dir, args, progress=bar.update)
+        else:
+            shards = [pending[shard::workers] for shard in range(workers)]
+            if not _run_parallel(shards, checkpoint_dir, args, bar):
+                print("A worker failed; run the same command again to resume from the checkpoint.")
+                return 1
+
+    documents, _ = merge_checkpoint(checkpoint_dir, args.output_dir)
+    accuracy = float(((documents["prediction"] == "ACCEPT").astype(int) == documents["y_true"]).mean())
+    print(f"Scored {len(documents)} documents (accuracy {accuracy:.4f})")
+    print(f"evaluation_data.csv, evaluation_documents.parquet and evaluation_windows.parquet written to {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Per-request deadlines and cancellation for window scoring.
+
+A ``Deadline`` is created when a request arrives, from the time budget the
+caller sends (header or body field), and is checked by the scoring loop
+between rounds of windows (see ``prediction._predict_windows_progressive``).
+The loop stops before a round that would not finish in time, so the caller
+receives a partial aggregate over the windows scored so far, or -- with
+``on_expiry="cancel"`` -- ``DeadlineExceeded``.
+
+``cancel`` marks the deadline as abandoned (e.g. the client disconnected);
+the loop then raises ``RequestCancelled`` at its next check, and callbacks
+registered with ``add_cancel_callback`` run at once (used to withdraw queued
+scheduler jobs). Scoring runs on executor threads while cancellation comes
+from the event loop, so the state is kept in a ``threading.Event``.
+"""
+
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+ON_EXPIRY_MODES = ("partial", "cancel")
+
+
+class DeadlineExceeded(Exception):
+    """The deadline passed before a usable result was produced."""
+
+
+class RequestCancelled(Exception):
+    """The request was abandoned (client disconnected) while it was being scored."""
+
+
+class Deadline:
+    """Time budget of one request plus a cancellation flag."""
+
+    def __init__(
+        self,
+        budget_s: Optional[float] = None,
+        safety_s: float = 0.0,
+        on_expiry: str = "partial",
+    ) -> None:
+        if on_expiry not in ON_EXPIRY_MODES:
+            raise ValueError(f"Unknown on_expiry mode: {on_expiry}")
+        self.budget_s = budget_s
+        self.safety_s = safety_s
+        self.on_expiry = on_expiry
+        self.expires_at = None if budget_s is None else time.monotonic() + budget_s
+        self.cancel_reason: Optional[str] = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], object]] = []
+
+    def remaining(self) -> float:
+        """Seconds left, minus the safety margin kept for aggregation and the response."""
+        if self.expires_at is None:
+            return float("inf")
+        return self.expires_at - time.monotonic() - self.safety_s
+
+    def expired(self, upcoming_s: float = 0.0) -> bool:
+        """Whether work expected to take ``upcoming_s`` would overrun the deadline."""
+        return self.remaining() < upcoming_s
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.cancel_reason = reason
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_cancel_callback(self, callback: Callable[[], object]) -> None:
+        """Call ``callback()`` on ``cancel``, or right away if already cancelled."""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self) -> None:
+        """Raise ``RequestCancelled`` if the request has been abandoned."""
+        if self._cancelled.is_set():
+            raise RequestCancelled(self.cancel_reason or "cancelled")
+
+    def check_time_left(self) -> None:
+        """``check``, then raise ``DeadlineExceeded`` if the budget is already spent."""
+        self.check()
+        if self.expired():
+            raise DeadlineExceeded("deadline reached before scoring started")
@@ -12,6 +12,17 @@ Required columns:
     - response_time_ms   : float, end-to-end prediction time in milliseconds
     - doc_length         : int, document length (e.g. number of characters or tokens)
 
+Optional raw probabilities (written by create_evaluation_data.py):
+    prediction_module/evaluation_documents.parquet
+        - doc_id, y_true, prob_accept (mean over windows), num_windows, ...
+    prediction_module/evaluation_windows.parquet
+        - doc_id, window, prob_accept (one row per 512-token window)
+
+When both exist, every operating point is evaluated from the stored
+probabilities without re-running the model: accuracy, precision, recall and
+F1 for a whole grid of ACCEPT thresholds, under each chunk-aggregation rule
+(mean -- what the API uses --, max, trimmed mean).
+
 Outputs (PNG files):
     prediction_module/results/
         accuracy_vs_epoch.png
@@ -19,10 +30,12 @@ Outputs (PNG files):
         confusion_matrix.png
         confidence_distribution.png
         response_time_vs_doc_length.png
+        threshold_sweep.png         (with raw probabilities)
+        threshold_metrics.csv       (with raw probabilities)
 """
 
 import os
-from typing import Tuple
+from typing import Iterable, Optional, Sequence, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -33,6 +46,8 @@ from sklearn import metrics
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "evaluation_data.csv")
+DOCUMENTS_PATH = os.path.join(BASE_DIR, "evaluation_documents.parquet")
+WINDOWS_PATH = os.path.join(BASE_DIR, "evaluation_windows.parquet")
 RESULTS_DIR = os.path.join(BASE_DIR, "results")
 
 
@@ -72,6 +87,134 @@ def _to_binary(labels: pd.Series) -> np.ndarray:
     return labels.astype(int).to_numpy()
 
 
+# -------------------------------
+# Threshold / aggregation sweep over raw probabilities
+# -------------------------------
+AGGREGATION_RULES = ("mean", "max", "trimmed_mean")
+THRESHOLD_GRID = np.round(np.linspace(0.0, 1.0, 101), 2)
+
+
+def aggregate_windows(windows: pd.DataFrame, rule: str = "mean", trim: float = 0.1) -> pd.Series:
+    """
+    Document-level P(ACCEPT) from per-window probabilities, indexed by doc_id.
+
+    ``mean`` is the service's rule; ``max`` takes the most ACCEPT-leaning
+    window; ``trimmed_mean`` drops the lowest and highest ``trim`` fraction
+    of each document's windows before averaging (documents too short to
+    trim fall back to the plain mean).
+    """
+    grouped = windows.groupby("doc_id")["prob_accept"]
+    if rule == "mean":
+        return grouped.mean()
+    if rule == "max":
+        return grouped.max()
+    if rule != "trimmed_mean":
+        raise ValueError(f"Unknown aggregation rule '{rule}'. Choose one of: {', '.join(AGGREGATION_RULES)}")
+
+    ordered = windows.sort_values(["doc_id", "prob_accept"], kind="stable")
+    by_doc = ordered.groupby("doc_id")["prob_accept"]
+    rank = by_doc.cumcount().to_numpy()
+    size = by_doc.transform("size").to_numpy()
+    cut = np.floor(size * trim).astype(int)
+    keep = (rank >= cut) & (rank < size - cut)
+    return ordered[keep].groupby("doc_id")["prob_accept"].mean()
+
+
+def threshold_metrics(
+    y_true: np.ndarray, scores: np.ndarray, thresholds: Sequence[float] = THRESHOLD_GRID
+) -> pd.DataFrame:
+    """
+    Confusion counts and accuracy/precision/recall/F1 of "ACCEPT iff
+    score >= threshold" for every threshold at once.
+
+    One sort of the scores plus a binary search per threshold, so the cost
+    does not grow with documents x thresholds. Precision/F1 are 0 where
+    nothing is predicted ACCEPT (like scikit-learn's zero_division=0).
+
+    The API's ``threshold`` forces REJECT below a confidence, on top of the
+    argmax, so an API threshold ``t`` matches the grid point ``max(t, 0.5)``.
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+
+    order = np.argsort(scores, kind="stable")
+    positives_below = np.concatenate([[0], np.cumsum(y_true[order])])
+    below = np.searchsorted(scores[order], thresholds, side="left")  # predicted REJECT
+
+    total = len(scores)
+    fn = positives_below[below]
+    tp = positives_below[-1] - fn
+    fp = (total - below) - tp
+    tn = below - fn
+
+    def ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+        return np.divide(num, den, out=np.zeros(len(num)), where=den > 0)
+
+    precision = ratio(tp, tp + fp)
+    recall = ratio(tp, tp + fn)
+    return pd.DataFrame(
+        {
+            "threshold": thresholds,
+            "accuracy": ratio(tp + tn, np.full(len(thresholds), total)),
+            "precision": precision,
+            "recall": recall,
+            "f1": ratio(2 * precision * recall, precision + recall),
+            "tp": tp,
+            "fp": fp,
+            "tn": tn,
+            "fn": fn,
+        }
+    )
+
+
+def sweep_thresholds(
+    documents: pd.DataFrame,
+    windows: pd.DataFrame,
+    rules: Iterable[str] = AGGREGATION_RULES,
+    thresholds: Sequence[float] = THRESHOLD_GRID,
+    trim: float = 0.1,
+) -> pd.DataFrame:
+    """Metrics for every (aggregation rule, threshold) pair, one row each."""
+    y_true = pd.Series(_to_binary(documents["y_true"]), index=documents["doc_id"])
+    frames = []
+    for rule in rules:
+        scores = aggregate_windows(windows, rule, trim=trim)
+        labels = y_true.reindex(scores.index)
+        known = labels.notna().to_numpy()
+        frame = threshold_metrics(labels.to_numpy()[known], scores.to_numpy()[known], thresholds)
+        frame.insert(0, "rule", rule)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _load_probabilities(
+    documents_path: str = DOCUMENTS_PATH, windows_path: str = WINDOWS_PATH
+) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+    if not (os.path.exists(documents_path) and os.path.exists(windows_path)):
+        return None
+    documents = pd.read_parquet(documents_path, columns=["doc_id", "y_true"])
+    windows = pd.read_parquet(windows_path, columns=["doc_id", "prob_accept"])
+    return documents, windows
+
+
+def plot_threshold_sweep(sweep: pd.DataFrame) -> None:
+    plt.figure(figsize=(6, 4))
+    for rule, group in sweep.groupby("rule", sort=False):
+        plt.plot(group["threshold"], group["f1"], label=f"F1 ({rule})")
+    mean = sweep[sweep["rule"] == "mean"]
+    plt.plot(mean["threshold"], mean["accuracy"], linestyle="--", color="gray", label="Accuracy (mean)")
+    plt.xlabel("ACCEPT threshold")
+    plt.ylabel("Score")
+    plt.title("Metrics vs Threshold by Aggregation Rule")
+    plt.legend()
+    plt.grid(True, linestyle="--", alpha=0.4)
+    plt.tight_layout()
+    out_path = os.path.join(RESULTS_DIR, "threshold_sweep.png")
+    plt.savefig(out_path, dpi=300)
+    plt.close()
+
+
 def plot_accuracy_vs_epoch(df: pd.DataFrame) -> None:
     grouped = df.groupby("epoch")
     epochs = []
@@ -145,9 +288,9 @@ def plot_confidence_distribution(df: pd.DataFrame) -> None:
 
     plt.figure(figsize=(6, 4))
     sns.histplot(
-        df["y_prob"],
+        x=df["y_prob"].to_numpy(),
         bins=20,
-        hue=pd.Series(correct, name="correct"),
+        hue=pd.Series(correct, name="correct").to_numpy(),
         multiple="stack",
         palette={True: "seagreen", False: "indianred"},
     )
@@ -178,12 +321,47 @@ def plot_response_time_vs_doc_length(df: pd.DataFrame) -> None:
     plt.close()
 
 
+def run_threshold_sweep(
+    documents_path: str = DOCUMENTS_PATH, windows_path: str = WINDOWS_PATH
+) -> Optional[pd.DataFrame]:
+    """
+    Evaluate the threshold grid under every aggregation rule from stored raw
+    probabilities; writes threshold_metrics.csv and threshold_sweep.png.
+    """
+    _ensure_results_dir()
+    loaded = _load_probabilities(documents_path, windows_path)
+    if loaded is None:
+        print(
+            "Raw probabilities not found; run create_evaluation_data.py to write "
+            f"{os.path.basename(documents_path)} and {os.path.basename(windows_path)}."
+        )
+        return None
+    documents, windows = loaded
+
+    sweep = sweep_thresholds(documents, windows)
+    sweep.to_csv(os.path.join(RESULTS_DIR, "threshold_metrics.csv"), index=False)
+    print("Saved: threshold_metrics.csv")
+    plot_threshold_sweep(sweep)
+    print("Saved: threshold_sweep.png")
+
+    best = sweep.loc[sweep.groupby("rule", sort=False)["f1"].idxmax()]
+    for row in best.itertuples():
+        print(
+            f"Best F1 for {row.rule}: {row.f1:.4f} at threshold {row.threshold:.2f} "
+            f"(accuracy {row.accuracy:.4f}, precision {row.precision:.4f}, recall {row.recall:.4f})"
+        )
+    return sweep
+
+
 def run_all(path: str = DATA_PATH) -> None:
     """
     Load evaluation data and generate all graphs into results/.
     """
     _ensure_results_dir()
 
+    if _load_probabilities() is not None:
+        run_threshold_sweep()
+
     try:
         df = _load_data(path)
     except FileNotFoundError as exc:
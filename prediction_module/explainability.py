@@ -1,5 +1,9 @@
+import bisect
+import heapq
 import re
-from typing import List
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 
 def _split_into_sentences(text: str) -> List[str]:
@@ -10,7 +14,7 @@ def _split_into_sentences(text: str) -> List[str]:
     research/demo purposes.
     """
     # Normalize whitespace
-    normalized = re.sub(r"\s+", " ", text.strip())
+    normalized = " ".join(text.split())
     if not normalized:
         return []
 
@@ -31,57 +35,86 @@ def _split_into_sentences(text: str) -> List[str]:
     return sentences
 
 
-def _score_sentence(sentence: str) -> float:
+# Keyword classes and the weight a sentence earns for containing each keyword.
+KEYWORDS_POSITIVE = (
+    "accept",
+    "granted",
+    "allowed",
+    "upheld",
+    "in favour of",
+    "sufficient evidence",
+)
+KEYWORDS_NEGATIVE = (
+    "reject",
+    "dismissed",
+    "failed",
+    "insufficient",
+    "no merit",
+    "without merit",
+    "no evidence",
+    "lack of",
+)
+KEYWORDS_PROCEDURAL = (
+    "jurisdiction",
+    "constitutional",
+    "violation",
+    "precedent",
+    "previous judgments",
+    "binding",
+)
+KEYWORD_WEIGHTS = (
+    (KEYWORDS_POSITIVE, 2.0),
+    (KEYWORDS_NEGATIVE, 2.0),
+    (KEYWORDS_PROCEDURAL, 1.5),
+)
+
+
+class KeywordMatcher:
     """
-    Heuristic importance score for a sentence.
+    Score many sentences against a fixed, weighted keyword set, one pass per keyword.
 
-    Approximates "influence" using:
-    - presence of strong legal / outcome-related terms
-    - sentence length (very short or extremely long sentences are down-weighted)
+    The lowercased sentences are joined into a single string (separated by a
+    newline, which no keyword contains) and each keyword is searched over it
+    once with ``str.find``, jumping to the next sentence after a hit, so the
+    cost grows with the document and the number of hits rather than with
+    sentences x keywords. Hits are mapped back to their sentence by offset.
+
+    A sentence earns a keyword's weight once, however often it occurs, and
+    the weights of keywords listed in several classes add up.
     """
-    s = sentence.lower()
-
-    keywords_positive = [
-        "accept",
-        "granted",
-        "allowed",
-        "upheld",
-        "in favour of",
-        "sufficient evidence",
-    ]
-    keywords_negative = [
-        "reject",
-        "dismissed",
-        "failed",
-        "insufficient",
-        "no merit",
-        "without merit",
-        "no evidence",
-        "lack of",
-    ]
-    keywords_procedural = [
-        "jurisdiction",
-        "constitutional",
-        "violation",
-        "precedent",
-        "previous judgments",
-        "binding",
-    ]
 
-    score = 0.0
+    def __init__(self, weighted_classes: Iterable[Tuple[Iterable[str], float]]) -> None:
+        self.weights: Dict[str, float] = {}
+        for keywords, weight in weighted_classes:
+            for keyword in keywords:
+                self.weights[keyword] = self.weights.get(keyword, 0.0) + weight
+
+    def score_sentences(self, sentences: List[str]) -> List[float]:
+        """Summed keyword weight of each sentence (case-insensitive)."""
+        lowered = [sentence.lower() for sentence in sentences]
+        starts: List[int] = []
+        offset = 0
+        for sentence in lowered:
+            starts.append(offset)
+            offset += len(sentence) + 1
+        starts.append(offset)  # sentinel: one past the last sentence
+        document = "\n".join(lowered)
+
+        scores = [0.0] * len(sentences)
+        for keyword, weight in self.weights.items():
+            position = document.find(keyword)
+            while position != -1:
+                index = bisect.bisect_right(starts, position) - 1
+                scores[index] += weight
+                position = document.find(keyword, starts[index + 1])
+        return scores
 
-    for kw in keywords_positive:
-        if kw in s:
-            score += 2.0
-    for kw in keywords_negative:
-        if kw in s:
-            score += 2.0
-    for kw in keywords_procedural:
-        if kw in s:
-            score += 1.5
 
-    # Length-based adjustment
-    length = len(sentence.split())
+_KEYWORD_MATCHER = KeywordMatcher(KEYWORD_WEIGHTS)
+
+
+def _adjust_for_length(score: float, length: int) -> float:
+    """Down-weight very short or extremely long sentences (``length`` in words)."""
     if length < 5:
         score *= 0.3
     elif length < 10:
@@ -97,6 +130,18 @@ def _score_sentence(sentence: str) -> float:
     return score
 
 
+def _score_sentence(sentence: str) -> float:
+    """
+    Heuristic importance score for a sentence.
+
+    Approximates "influence" using:
+    - presence of strong legal / outcome-related terms
+    - sentence length (very short or extremely long sentences are down-weighted)
+    """
+    keyword_score = _KEYWORD_MATCHER.score_sentences([sentence])[0]
+    return _adjust_for_length(keyword_score, len(sentence.split()))
+
+
 def generate_explanation(text: str, top_k: int = 3) -> List[str]:
     """
     Extract top influential sentences from the document.
@@ -118,14 +163,22 @@ def generate_explanation(text: str, top_k: int = 3) -> List[str]:
     if not sentences:
         return []
 
-    scored = [(s, _score_sentence(s)) for s in sentences]
-    # Sort by descending score and keep top_k unique sentences
-    scored.sort(key=lambda x: x[1], reverse=True)
+    # Heap ordered by descending score, ties in document order (as a stable
+    # sort would give); only as many entries are popped as needed to find
+    # top_k unique sentences.
+    # The splitter leaves exactly one space between words, so counting spaces
+    # gives the same word count as ``len(sentence.split())``.
+    keyword_scores = _KEYWORD_MATCHER.score_sentences(sentences)
+    heap = [
+        (-_adjust_for_length(score, sentence.count(" ") + 1), i)
+        for i, (sentence, score) in enumerate(zip(sentences, keyword_scores))
+    ]
+    heapq.heapify(heap)
 
     seen = set()
     top_sentences: List[str] = []
-    for sentence, score in scored:
-        normalized = sentence.strip()
+    while heap:
+        normalized = sentences[heapq.heappop(heap)[1]].strip()
         if not normalized or normalized.lower() in seen:
             continue
         seen.add(normalized.lower())
@@ -135,3 +188,162 @@ def generate_explanation(text: str, top_k: int = 3) -> List[str]:
 
     return top_sentences
 
+
+# -------------------------------
+# Model-based attribution (occlusion)
+# -------------------------------
+_SENTENCE_BOUNDARY = re.compile(r"[.!?]\s+")
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Character spans in ``text`` of the sentences ``_split_into_sentences``
+    returns (same boundaries, same order), so tokens can be mapped to them.
+    A span's text, whitespace-normalised, is that sentence (up to whitespace
+    before a sentence-ending mark, which the splitter drops).
+    """
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    limit = len(text.rstrip())  # trailing whitespace is not a sentence boundary
+    for boundary in _SENTENCE_BOUNDARY.finditer(text, 0, limit):
+        if text[start : boundary.start()].strip():
+            spans.append((start, boundary.start() + 1))
+        start = boundary.end()
+    if text[start:limit].strip():
+        spans.append((start, limit))
+    # Trim surrounding whitespace so spans cover the sentence text only.
+    trimmed = []
+    for begin, end in spans:
+        segment = text[begin:end]
+        begin += len(segment) - len(segment.lstrip())
+        end -= len(segment) - len(segment.rstrip())
+        trimmed.append((begin, end))
+    return trimmed
+
+
+def _window_sentence_ranges(
+    offsets: Sequence[Tuple[int, int]], span_starts: List[int], span_ends: List[int]
+) -> Dict[int, Tuple[int, int]]:
+    """Map sentence index -> [first, last + 1) token positions of that sentence in one window."""
+    ranges: Dict[int, Tuple[int, int]] = {}
+    for position, (begin, end) in enumerate(offsets):
+        if end <= begin:  # special token
+            continue
+        sentence = bisect.bisect_right(span_starts, begin) - 1
+        if sentence < 0 or begin >= span_ends[sentence]:
+            continue
+        first, _ = ranges.get(sentence, (position, position))
+        ranges[sentence] = (first, position + 1)
+    return ranges
+
+
+def occlusion_variants(
+    windows: List[List[int]],
+    window_offsets: List[Sequence[Tuple[int, int]]],
+    base_probs: np.ndarray,
+    spans: List[Tuple[int, int]],
+    mask_token_id: int,
+    target: int,
+    max_variants: int = 0,
+) -> Tuple[List[List[int]], List[Tuple[int, int]]]:
+    """
+    The masked windows ``occlusion_attribution`` scores, one per (window,
+    sentence) pair, with those pairs as their owners. ``max_variants``
+    (0 = unlimited) caps them; windows are then taken in order of their
+    ``target`` probability, most decisive first.
+    """
+    span_starts = [begin for begin, _ in spans]
+    span_ends = [end for _, end in spans]
+
+    order = np.argsort(-base_probs[:, target], kind="stable")
+    variants: List[List[int]] = []
+    owners: List[Tuple[int, int]] = []  # (window, sentence) per variant
+    for window in order:
+        ranges = _window_sentence_ranges(window_offsets[window], span_starts, span_ends)
+        if max_variants and variants and len(variants) + len(ranges) > max_variants:
+            break
+        ids = windows[window]
+        for sentence, (first, last) in ranges.items():
+            variants.append(ids[:first] + [mask_token_id] * (last - first) + ids[last:])
+            owners.append((window, sentence))
+    return variants, owners
+
+
+def occlusion_impact(
+    owners: List[Tuple[int, int]],
+    masked_probs: np.ndarray,
+    base_probs: np.ndarray,
+    num_spans: int,
+    target: int,
+    total_windows: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Fold the scored ``occlusion_variants`` into ``(impact, covered)`` per span."""
+    impact = np.zeros(num_spans, dtype=np.float64)
+    covered = np.zeros(num_spans, dtype=bool)
+    if not owners:
+        return impact, covered
+    masked = masked_probs[:, target]
+    for (window, sentence), prob in zip(owners, masked):
+        impact[sentence] += base_probs[window, target] - prob
+        covered[sentence] = True
+    return impact / total_windows, covered
+
+
+def occlusion_attribution(
+    windows: List[List[int]],
+    window_offsets: List[Sequence[Tuple[int, int]]],
+    base_probs: np.ndarray,
+    spans: List[Tuple[int, int]],
+    score_fn: Callable[[List[List[int]]], np.ndarray],
+    mask_token_id: int,
+    target: int,
+    total_windows: Optional[int] = None,
+    max_variants: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score sentences by how much masking them moves the document's
+    probability for class ``target``.
+
+    The document probability is the mean over its windows, and windows are
+    scored independently, so masking a sentence everywhere shifts it by
+    ``sum(base - masked) / total_windows`` over the windows containing the
+    sentence -- exactly, with one forward pass per (window, sentence) pair.
+    ``base_probs`` are the already computed probabilities of ``windows``
+    (so no base pass is repeated); all masked variants are handed to
+    ``score_fn`` together so they are scored in as few batches as it allows.
+
+    ``max_variants`` is passed to ``occlusion_variants``. Returns
+    ``(impact, covered)`` per span: impact > 0 means the sentence supports
+    ``target``; ``covered`` is False for sentences in no occluded window.
+    Callers that score asynchronously use ``occlusion_variants`` and
+    ``occlusion_impact`` directly.
+    """
+    variants, owners = occlusion_variants(
+        windows, window_offsets, base_probs, spans, mask_token_id, target, max_variants
+    )
+    masked = score_fn(variants) if variants else np.empty((0, base_probs.shape[1]))
+    return occlusion_impact(owners, masked, base_probs, len(spans), target, total_windows or len(windows))
+
+
+def top_attributed_sentences(
+    text: str,
+    spans: List[Tuple[int, int]],
+    impact: np.ndarray,
+    covered: np.ndarray,
+    top_k: int = 3,
+) -> List[Tuple[str, float]]:
+    """The ``top_k`` unique sentences with the largest positive impact, with their impact."""
+    heap = [(-float(impact[i]), i) for i in range(len(spans)) if covered[i] and impact[i] > 0]
+    heapq.heapify(heap)
+
+    seen = set()
+    top: List[Tuple[str, float]] = []
+    while heap and len(top) < top_k:
+        negative_impact, i = heapq.heappop(heap)
+        begin, end = spans[i]
+        sentence = " ".join(text[begin:end].split())
+        if sentence.lower() in seen:
+            continue
+        seen.add(sentence.lower())
+        top.append((sentence, -negative_impact))
+    return top
@@ -0,0 +1,124 @@
+"""
+Startup lifecycle for the prediction service.
+
+The model is loaded in a background thread when the API starts, followed by
+a synthetic warm-up pass, so the process answers liveness probes right away
+and only reports ready once the first real request will not pay for loading,
+lazy initialisation or graph compilation.
+
+States: ``idle`` -> ``loading`` -> ``warming`` -> ``ready`` (or ``failed``).
+
+Code paths that need the model outside the API (CLI scripts, evaluation)
+call ``ensure_loaded``, which loads synchronously if nothing has started the
+background load yet and otherwise waits for it.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+LOGGER = logging.getLogger("prediction_service")
+
+LoadFn = Callable[[], None]
+WarmupFn = Callable[[], Dict[str, float]]
+
+
+class ServiceLifecycle:
+    """Track model load and warm-up, running them once in the background."""
+
+    def __init__(self, load_fn: LoadFn, warmup_fn: Optional[WarmupFn] = None) -> None:
+        self._load_fn = load_fn
+        self._warmup_fn = warmup_fn
+        self._load_lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._created = time.monotonic()
+
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.load_time_s: Optional[float] = None
+        self.warmup_time_s: Optional[float] = None
+        self.warmup_latency_ms: Dict[str, float] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded.is_set()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def start_background(self) -> None:
+        """Load and warm up on a daemon thread; returns immediately."""
+        if self._thread is not None or self.ready:
+            return
+        self._thread = threading.Thread(
+            target=self._startup, name="model-startup", daemon=True
+        )
+        self._thread.start()
+
+    def ensure_loaded(self) -> None:
+        """Block until the model is loaded, loading it in this thread if needed."""
+        if self._loaded.is_set():
+            return
+        self._load()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "load_time_s": self.load_time_s,
+            "warmup_time_s": self.warmup_time_s,
+            "warmup_latency_ms": dict(self.warmup_latency_ms),
+            "uptime_s": round(time.monotonic() - self._created, 3),
+            "error": self.error,
+        }
+
+    # ---------------------------
+    # Internals
+    # ---------------------------
+    def _load(self) -> None:
+        with self._load_lock:
+            if self._loaded.is_set():
+                return
+            if self.error is not None:
+                raise RuntimeError(f"Model failed to load: {self.error}")
+
+            self.state = "loading"
+            began = time.perf_counter()
+            try:
+                self._load_fn()
+            except Exception as exc:
+                self.state = "failed"
+                self.error = str(exc)
+                LOGGER.error("Model load failed: %s", exc)
+                raise
+            self.load_time_s = round(time.perf_counter() - began, 3)
+            self.state = "loaded"
+            self._loaded.set()
+            LOGGER.info("Model loaded in %.2fs", self.load_time_s)
+
+    def _startup(self) -> None:
+        try:
+            self._load()
+        except Exception:
+            return
+
+        if self._warmup_fn is not None:
+            self.state = "warming"
+            began = time.perf_counter()
+            try:
+                self.warmup_latency_ms = self._warmup_fn()
+            except Exception as exc:  # pragma: no cover - a failed warm-up still leaves a usable model
+                LOGGER.error("Model warm-up failed: %s", exc)
+            self.warmup_time_s = round(time.perf_counter() - began, 3)
+            LOGGER.info("Model warm-up finished in %.2fs: %s", self.warmup_time_s, self.warmup_latency_ms)
+
+        self.state = "ready"
+        self._ready.set()
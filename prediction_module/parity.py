@@ -0,0 +1,256 @@
+"""
+Numerical parity checks for the prediction service's inference paths.
+
+Compares the probabilities produced by an optimised inference path against
+the reference path over a set of documents and reports the largest absolute
+difference per document together with any label flips.
+
+Usage (from prediction_module/):
+    python parity.py padding sample1.txt sample2.txt
+    python parity.py padding --csv evaluation_sample.csv --limit 50
+    python parity.py backend --backend onnx --csv evaluation_sample.csv
+    python parity.py quantization --csv CJPE_test.csv --sample 200
+
+``backend`` compares an inference engine from backends.py against the eager
+``AutoModelForSequenceClassification`` reference and also reports the mean
+forward-pass latency of each, to help choose the fastest engine per machine.
+
+``quantization`` runs the float and int8 models over a labeled sample (a CSV
+with ``text`` and ``label`` columns, as used by create_evaluation_data.py)
+and reports document-level agreement, accuracy of each model and the
+accuracy delta, together with latency and weight size.
+
+Exit status is non-zero when any document exceeds the tolerance or changes
+its predicted label (``quantization``: when agreement or accuracy falls
+outside the guardrail), so the check can gate a deployment script.
+"""
+
+import argparse
+import io
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import torch
+
+import prediction
+from backends import (
+    BACKENDS,
+    InferenceBackend,
+    QuantizedTorchBackend,
+    TorchBackend,
+    load_backend,
+    load_torch_model,
+)
+
+
+DEFAULT_TOLERANCE = 1e-4
+
+
+def _load_texts(paths: List[str], csv_path: str, limit: int) -> List[str]:
+    texts: List[str] = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            texts.append(f.read())
+    if csv_path:
+        df = pd.read_csv(csv_path)
+        texts.extend(str(t) for t in df["text"].dropna().head(limit))
+    return texts
+
+
+def _compare(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    ref_doc = reference.mean(axis=0)
+    cand_doc = candidate.mean(axis=0)
+    return {
+        "num_windows": len(reference),
+        "max_window_diff": float(np.max(np.abs(reference - candidate))),
+        "doc_diff": float(np.max(np.abs(ref_doc - cand_doc))),
+        "label_flip": int(np.argmax(ref_doc) != np.argmax(cand_doc)),
+    }
+
+
+def check_padding_parity(
+    texts: List[str], stride: int = 256, tolerance: float = DEFAULT_TOLERANCE
+) -> bool:
+    """
+    Compare dynamic padding with length bucketing against fixed 512-token padding.
+    """
+    ok = True
+    for idx, text in enumerate(texts):
+        windows = prediction._encode_windows(text, stride=stride)
+        reference = prediction._predict_windows(windows, padding="max_length")
+        candidate = prediction._predict_windows(windows, padding="dynamic")
+        report = _compare(reference, candidate)
+        passed = report["max_window_diff"] <= tolerance and not report["label_flip"]
+        ok = ok and passed
+        print(
+            f"[{'OK' if passed else 'FAIL'}] doc={idx} windows={report['num_windows']} "
+            f"max_window_diff={report['max_window_diff']:.2e} "
+            f"doc_diff={report['doc_diff']:.2e} label_flip={report['label_flip']}"
+        )
+    return ok
+
+
+def _timed_probs(
+    engine: InferenceBackend, windows: List[List[int]], timings: List[float]
+) -> np.ndarray:
+    probs = []
+    for start in range(0, len(windows), prediction.INFERENCE_BATCH_SIZE):
+        batch = prediction._pad_batch(windows[start : start + prediction.INFERENCE_BATCH_SIZE])
+        began = time.perf_counter()
+        probs.append(engine.predict_probs(batch["input_ids"], batch["attention_mask"]))
+        timings.append(time.perf_counter() - began)
+    return np.concatenate(probs, axis=0)
+
+
+def check_backend_parity(
+    texts: List[str],
+    backend_name: str,
+    stride: int = 256,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> bool:
+    """
+    Compare an inference backend against eager ``AutoModelForSequenceClassification``.
+    """
+    reference = TorchBackend(load_torch_model(prediction.MODEL_PATH, "cpu"), "cpu")
+    candidate = load_backend(backend_name, prediction.MODEL_PATH, device="cpu")
+    ref_times: List[float] = []
+    cand_times: List[float] = []
+
+    # One untimed pass so lazy initialisation (compilation, graph optimisation) is excluded.
+    warmup = prediction._pad_batch(prediction._encode_windows(texts[0], stride=stride)[:1])
+    candidate.predict_probs(warmup["input_ids"], warmup["attention_mask"])
+
+    ok = True
+    for idx, text in enumerate(texts):
+        windows = prediction._encode_windows(text, stride=stride)
+        report = _compare(
+            _timed_probs(reference, windows, ref_times),
+            _timed_probs(candidate, windows, cand_times),
+        )
+        passed = report["max_window_diff"] <= tolerance and not report["label_flip"]
+        ok = ok and passed
+        print(
+            f"[{'OK' if passed else 'FAIL'}] doc={idx} windows={report['num_windows']} "
+            f"max_window_diff={report['max_window_diff']:.2e} "
+            f"doc_diff={report['doc_diff']:.2e} label_flip={report['label_flip']}"
+        )
+
+    print(
+        f"Mean batch latency: torch={np.mean(ref_times) * 1000:.1f} ms, "
+        f"{backend_name}={np.mean(cand_times) * 1000:.1f} ms"
+    )
+    return ok
+
+
+def _weights_mb(module: torch.nn.Module) -> float:
+    buffer = io.BytesIO()
+    torch.save(module.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def check_quantization_accuracy(
+    csv_path: str,
+    sample: int = 200,
+    random_state: int = 42,
+    stride: int = 256,
+    max_accuracy_drop: float = 0.01,
+    min_agreement: float = 0.98,
+) -> bool:
+    """
+    Compare float and int8 dynamically quantized models on a labeled sample.
+    """
+    df = pd.read_csv(csv_path)[["text", "label"]].dropna()
+    if sample and len(df) > sample:
+        df = df.sample(sample, random_state=random_state)
+
+    float_model = load_torch_model(prediction.MODEL_PATH, "cpu")
+    reference = TorchBackend(float_model, "cpu")
+    quantized = QuantizedTorchBackend(load_torch_model(prediction.MODEL_PATH, "cpu"))
+    ref_times: List[float] = []
+    quant_times: List[float] = []
+
+    y_true: List[int] = []
+    ref_pred: List[int] = []
+    quant_pred: List[int] = []
+    prob_diffs: List[float] = []
+    for text, label in zip(df["text"].astype(str), df["label"].astype(int)):
+        windows = prediction._encode_windows(text, stride=stride)
+        ref_doc = _timed_probs(reference, windows, ref_times).mean(axis=0)
+        quant_doc = _timed_probs(quantized, windows, quant_times).mean(axis=0)
+        y_true.append(label)
+        ref_pred.append(int(np.argmax(ref_doc)))
+        quant_pred.append(int(np.argmax(quant_doc)))
+        prob_diffs.append(float(np.max(np.abs(ref_doc - quant_doc))))
+
+    y = np.asarray(y_true)
+    ref_acc = float(np.mean(np.asarray(ref_pred) == y))
+    quant_acc = float(np.mean(np.asarray(quant_pred) == y))
+    agreement = float(np.mean(np.asarray(ref_pred) == np.asarray(quant_pred)))
+    delta = quant_acc - ref_acc
+
+    print(f"Documents evaluated : {len(y)}")
+    print(f"Agreement rate      : {agreement:.4f}")
+    print(f"Float accuracy      : {ref_acc:.4f}")
+    print(f"Int8 accuracy       : {quant_acc:.4f}")
+    print(f"Accuracy delta      : {delta:+.4f}")
+    print(f"Mean |p_doc| diff   : {np.mean(prob_diffs):.2e} (max {np.max(prob_diffs):.2e})")
+    print(
+        f"Mean batch latency  : float={np.mean(ref_times) * 1000:.1f} ms, "
+        f"int8={np.mean(quant_times) * 1000:.1f} ms"
+    )
+    print(
+        f"Weight size         : float={_weights_mb(float_model):.1f} MB, "
+        f"int8={_weights_mb(quantized.model):.1f} MB"
+    )
+
+    return agreement >= min_agreement and -delta <= max_accuracy_drop
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("check", choices=["padding", "backend", "quantization"])
+    parser.add_argument("files", nargs="*", help="Plain-text documents to compare.")
+    parser.add_argument("--csv", default="", help="CSV with a 'text' column.")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--stride", type=int, default=256)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--backend", choices=BACKENDS, default="onnx")
+    parser.add_argument("--sample", type=int, default=200, help="quantization: documents to sample.")
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    args = parser.parse_intermixed_args()
+
+    if args.check == "quantization":
+        if not args.csv:
+            parser.error("quantization requires --csv with 'text' and 'label' columns.")
+        ok = check_quantization_accuracy(
+            args.csv,
+            sample=args.sample,
+            random_state=args.random_state,
+            stride=args.stride,
+            max_accuracy_drop=args.max_accuracy_drop,
+            min_agreement=args.min_agreement,
+        )
+        print("Quantized model within guardrail." if ok else "Quantized model FAILED the guardrail.")
+        return 0 if ok else 1
+
+    texts = _load_texts(args.files, args.csv, args.limit)
+    if not texts:
+        parser.error("Provide at least one text file or --csv.")
+
+    if args.check == "padding":
+        ok = check_padding_parity(texts, stride=args.stride, tolerance=args.tolerance)
+    else:
+        ok = check_backend_parity(
+            texts, args.backend, stride=args.stride, tolerance=args.tolerance
+        )
+    print("Parity check passed." if ok else "Parity check FAILED.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Page-parallel PDF text extraction.
+
+Pages are fanned out to a process pool and reassembled in page order. Each
+page is first extracted with pypdf (fast path); pages that come back empty
+(scanned covers, unusual font encodings) are retried with pdfplumber, which
+is slower but handles more layouts. ``engine="pdfplumber"`` skips the fast
+path entirely.
+
+The pool uses the ``forkserver`` start method where available (``spawn``
+elsewhere), never a plain fork of the multi-threaded service. As with
+spawn, each worker imports the ``__main__`` module once, so entry scripts
+need the usual ``if __name__ == "__main__"`` guard.
+
+Every page runs under a timeout (``page_timeout_s``) so a single
+pathological page is skipped instead of stalling the request. Inside the
+pool the timeout interrupts the page itself (``SIGALRM``, POSIX only); the
+caller additionally gives up on pages still missing once the whole document
+is past its budget.
+
+A request ``Deadline`` (see deadline.py) passed to ``iter_pages`` is checked
+before every page: a cancelled request stops extraction with
+``RequestCancelled``, and one whose time budget runs out with
+``DeadlineExceeded``. ``reserve_s`` makes extraction stop that much earlier,
+leaving the caller time to score the pages it already has.
+
+Short documents (fewer than ``min_parallel_pages`` pages) are extracted in
+the calling thread, where the pool round-trip would cost more than it saves,
+but only where SIGALRM can enforce the page timeout there (the main thread).
+Called from any other thread -- as the service does, from its executor --
+they go through the pool as well, so every page keeps its timeout. With
+``workers=0`` everything runs inline and the timeout applies only on the
+main thread.
+"""
+
+import io
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Tuple
+
+import pdfplumber
+from pypdf import PdfReader
+
+from deadline import Deadline, DeadlineExceeded
+
+
+LOGGER = logging.getLogger("prediction_service")
+
+ENGINES = ("pypdf", "pdfplumber")
+
+# Per-page outcome reported alongside the text.
+PAGE_OK = "ok"
+PAGE_FALLBACK = "fallback"
+PAGE_TIMEOUT = "timeout"
+PAGE_ERROR = "error"
+
+
+class PdfExtractionError(Exception):
+    """The document could not be opened or its pages could not be read."""
+
+
+class PageTimeout(BaseException):
+    """
+    Raised inside a worker when a page exceeds its time budget.
+
+    Derives from ``BaseException`` so the PDF libraries' own broad
+    ``except Exception`` handlers cannot swallow it.
+    """
+
+
+# -------------------------------
+# Page extraction (runs in pool workers)
+# -------------------------------
+class _OpenDocument:
+    """Parsed handles for one PDF, opened lazily per engine."""
+
+    def __init__(self, source: Any) -> None:
+        self.source = source
+        self._reader: Optional[PdfReader] = None
+        self._plumber = None
+
+    def _stream(self) -> Any:
+        return io.BytesIO(self.source) if isinstance(self.source, bytes) else self.source
+
+    def pypdf_text(self, page_number: int) -> str:
+        if self._reader is None:
+            self._reader = PdfReader(self._stream())
+        return self._reader.pages[page_number].extract_text() or ""
+
+    def pdfplumber_text(self, page_number: int) -> str:
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(self._stream())
+        page = self._plumber.pages[page_number]
+        try:
+            return page.extract_text() or ""
+        finally:
+            page.close()  # drop the page's layout cache; workers see many pages
+
+    def close(self) -> None:
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        self._reader = None
+
+
+# Worker-local cache so consecutive pages of the same upload reuse one parse.
+_OPEN_DOCUMENTS: "OrderedDict[str, _OpenDocument]" = OrderedDict()
+_MAX_OPEN_DOCUMENTS = 2
+
+
+def _open_document(token: str, source: Any) -> _OpenDocument:
+    document = _OPEN_DOCUMENTS.get(token)
+    if document is None:
+        document = _OpenDocument(source)
+        _OPEN_DOCUMENTS[token] = document
+        while len(_OPEN_DOCUMENTS) > _MAX_OPEN_DOCUMENTS:
+            _OPEN_DOCUMENTS.popitem(last=False)[1].close()
+    _OPEN_DOCUMENTS.move_to_end(token)
+    return document
+
+
+def _alarm_available() -> bool:
+    """Whether SIGALRM can interrupt work in the calling thread."""
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+@contextmanager
+def _page_deadline(seconds: float) -> Iterator[None]:
+    """Interrupt the enclosed block after ``seconds`` where SIGALRM is usable."""
+    if seconds <= 0 or not _alarm_available():
+        yield
+        return
+
+    def _expire(signum: int, frame: Any) -> None:
+        raise PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, _expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _extract(
+    document: _OpenDocument, page_number: int, engine: str, timeout_s: float
+) -> Tuple[str, str]:
+    try:
+        with _page_deadline(timeout_s):
+            if engine == "pypdf":
+                text = document.pypdf_text(page_number)
+                if text.strip():
+                    return text, PAGE_OK
+                return document.pdfplumber_text(page_number), PAGE_FALLBACK
+            return document.pdfplumber_text(page_number), PAGE_OK
+    except PageTimeout:
+        # An interrupted parse can leave the reader half-resolved; reopen it
+        # for the next page.
+        document.close()
+        return "", PAGE_TIMEOUT
+    except Exception as exc:
+        document.close()
+        return "", f"{PAGE_ERROR}: {exc}"
+
+
+def extract_page(
+    token: str, source: Any, page_number: int, engine: str, timeout_s: float
+) -> Tuple[str, str]:
+    """Pool task: return ``(text, status)`` for one page; never raises."""
+    return _extract(_open_document(token, source), page_number, engine, timeout_s)
+
+
+# -------------------------------
+# Orchestration
+# -------------------------------
+class PdfExtractor:
+    """Extract PDF pages in parallel and yield their text in page order."""
+
+    def __init__(
+        self,
+        engine: str = "pypdf",
+        workers: int = 4,
+        page_timeout_s: float = 10.0,
+        min_parallel_pages: int = 8,
+        start_method: str = "",
+    ) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown PDF extraction engine: {engine}")
+        self.engine = engine
+        self.workers = max(workers, 0)
+        self.page_timeout_s = page_timeout_s
+        self.min_parallel_pages = min_parallel_pages
+        # The pool is created lazily, inside a process already running torch,
+        # scheduler and executor threads, and forking that can deadlock the
+        # child on a lock one of them held. forkserver forks workers from a
+        # clean single-threaded server instead, which has the PDF libraries
+        # preloaded so start-up stays cheap; like fork (and unlike spawn) it
+        # does not re-import the service's __main__ and the model with it.
+        self.start_method = start_method or (
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        )
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context(self.start_method)
+                if self.start_method == "forkserver":
+                    context.set_forkserver_preload([__name__])
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def count_pages(file_bytes: bytes) -> int:
+        """Number of pages; raises ``PdfExtractionError`` if the document cannot be parsed."""
+        try:
+            return len(PdfReader(io.BytesIO(file_bytes)).pages)
+        except Exception as exc:
+            raise PdfExtractionError(str(exc)) from exc
+
+    def iter_pages(
+        self, file_bytes: bytes, deadline: Optional[Deadline] = None, reserve_s: float = 0.0
+    ) -> Iterator[str]:
+        """
+        Yield the text of each page in order (empty string for skipped pages).
+
+        Raises ``PdfExtractionError`` on documents that cannot be parsed at all,
+        ``RequestCancelled`` once ``deadline`` is cancelled, and
+        ``DeadlineExceeded`` once less than ``reserve_s`` of it is left.
+        """
+        num_pages = self.count_pages(file_bytes)
+        inline_timeout_ok = self.page_timeout_s <= 0 or _alarm_available()
+        if self.workers == 0 or (num_pages < self.min_parallel_pages and inline_timeout_ok):
+            yield from self._iter_inline(file_bytes, num_pages, deadline, reserve_s)
+        else:
+            yield from self._iter_parallel(file_bytes, num_pages, deadline, reserve_s)
+
+    def extract_text(self, file_bytes: bytes, deadline: Optional[Deadline] = None) -> str:
+        return " ".join(page for page in self.iter_pages(file_bytes, deadline) if page).strip()
+
+    # ---------------------------
+    # Internals
+    # ---------------------------
+    @staticmethod
+    def _check(deadline: Optional[Deadline], reserve_s: float = 0.0) -> None:
+        if deadline is not None:
+            deadline.check()
+            if deadline.expired(reserve_s):
+                raise DeadlineExceeded("deadline reached during PDF extraction")
+
+    def _iter_inline(
+        self, file_bytes: bytes, num_pages: int, deadline: Optional[Deadline] = None, reserve_s: float = 0.0
+    ) -> Iterator[str]:
+        document = _OpenDocument(file_bytes)
+        try:
+            for page_number in range(num_pages):
+                self._check(deadline, reserve_s)
+                text, status = _extract(document, page_number, self.engine, self.page_timeout_s)
+                self._report(page_number, status)
+                yield text
+        finally:
+            document.close()
+
+    def _iter_parallel(
+        self, file_bytes: bytes, num_pages: int, deadline: Optional[Deadline] = None, reserve_s: float = 0.0
+    ) -> Iterator[str]:
+        # Workers read the upload from a temp file instead of receiving a copy
+        # of the bytes with every page task.
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(file_bytes)
+
+        token = uuid.uuid4().hex
+        pool = self._get_pool()
+        futures: List[Future] = [
+            pool.submit(extract_page, token, path, page_number, self.engine, self.page_timeout_s)
+            for page_number in range(num_pages)
+        ]
+        # Backstop for platforms without SIGALRM: the whole document gets the
+        # time its pages would need at one timeout per page per worker.
+        budget = self.page_timeout_s * (math.ceil(num_pages / self.workers) + 1)
+        document_deadline = time.monotonic() + budget if self.page_timeout_s > 0 else None
+        try:
+            for page_number, future in enumerate(futures):
+                self._check(deadline, reserve_s)
+                remaining = None if document_deadline is None else max(document_deadline - time.monotonic(), 0.0)
+                if deadline is not None and deadline.budget_s is not None:
+                    request_remaining = max(deadline.remaining() - reserve_s, 0.0)
+                    remaining = request_remaining if remaining is None else min(remaining, request_remaining)
+                try:
+                    text, status = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    # The request's own deadline, rather than the page, may
+                    # have run out.
+                    self._check(deadline, reserve_s)
+                    future.cancel()
+                    text, status = "", PAGE_TIMEOUT
+                except BrokenProcessPool as exc:
+                    # A worker died (e.g. crashed in a native parser); start a
+                    # fresh pool for the next request.
+                    self.shutdown()
+                    raise PdfExtractionError(
+                        f"Extraction worker died on page {page_number + 1}"
+                    ) from exc
+                self._report(page_number, status)
+                yield text
+        finally:
+            for future in futures:
+                future.cancel()
+            try:
+                os.remove(path)
+            except OSError:  # pragma: no cover - a worker may still hold it open on Windows
+                pass
+
+    @staticmethod
+    def _report(page_number: int, status: str) -> None:
+        if status == PAGE_TIMEOUT:
+            LOGGER.warning("PDF page %d timed out during extraction; skipped.", page_number + 1)
+        elif status.startswith(PAGE_ERROR):
+            LOGGER.warning("PDF page %d could not be extracted (%s); skipped.", page_number + 1, status)
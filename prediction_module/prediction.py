@@ -1,34 +1,84 @@
+import asyncio
 import datetime
-import io
+import functools
+import hashlib
 import json
 import logging
-from typing import Any, Dict, List, Optional
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import CancelledError as FutureCancelledError
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Optional, Set, Tuple, TypeVar, Union
 
 import numpy as np
-import pdfplumber
 import torch
 from fastapi import (
     Body,
     FastAPI,
     File,
     HTTPException,
+    Request,
+    Response,
     UploadFile,
     status,
 )
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, constr
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
-
-from explainability import generate_explanation as generate_explanation_sentences
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from transformers import AutoConfig, AutoModel, AutoTokenizer
+
+from admission import AdmissionController, AdmissionRejected
+from audit_log import AuditLogSink
+from backends import InferenceBackend, load_backend
+from case_index import CaseIndex
+from deadline import Deadline, DeadlineExceeded, RequestCancelled
+from explainability import (
+    generate_explanation as generate_explanation_sentences,
+    occlusion_impact,
+    occlusion_variants,
+    sentence_spans,
+    top_attributed_sentences,
+)
+from lifecycle import ServiceLifecycle
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from pdf_extract import PdfExtractionError, PdfExtractor
+from result_cache import PredictionCache, WindowCache, make_cache_key
+from scheduler import MicroBatchScheduler
 
 
 # -------------------------------
 # App Initialization
 # -------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Load and warm up the model in the background so the server starts
+    answering probes at once; on shutdown stop the scheduler and the worker
+    pools and flush the audit log.
+    """
+    MODEL_LIFECYCLE.start_background()
+    yield
+    global CPU_EXECUTOR
+    if SCHEDULER is not None:
+        SCHEDULER.stop()
+    PDF_EXTRACTOR.shutdown()
+    # Threads of a new executor start lazily, so swapping one in costs
+    # nothing and keeps the module usable if the app is started again.
+    executor, CPU_EXECUTOR = CPU_EXECUTOR, _new_cpu_executor()
+    executor.shutdown(wait=False, cancel_futures=True)
+    AUDIT_LOG.close()
+
+
 app = FastAPI(
     title="InLegalBERT Legal Outcome Predictor",
     description="Service for predicting legal case outcomes (ACCEPT / REJECT) from PDFs or raw text.",
     version="1.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -44,9 +94,83 @@ app.add_middleware(
 # Global Configuration
 # -------------------------------
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-MODEL_PATH = "inlegalbert_final"
+MODEL_PATH = os.getenv("MODEL_PATH", "inlegalbert_final")
 MAX_PDF_SIZE_BYTES = 10 * 1024 * 1024  # 10 MB
 MIN_TEXT_LENGTH = 200  # Minimum characters required for a meaningful prediction
+MAX_WINDOW_TOKENS = 512  # InLegalBERT context size
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "16"))  # Windows per forward pass
+INFERENCE_MAX_BATCH_TOKENS = int(
+    os.getenv("INFERENCE_MAX_BATCH_TOKENS", "8192")
+)  # Padded tokens per forward pass (bounds activation memory)
+# "dynamic" pads each batch to its longest window; "max_length" pads every window to 512
+INFERENCE_PADDING = os.getenv("INFERENCE_PADDING", "dynamic")
+PADDING_STRATEGIES = ("dynamic", "max_length")
+# Backends that compile per input shape (compile) pad "dynamic" batches up to one of these lengths
+PADDING_BUCKETS = sorted(int(n) for n in os.getenv("PADDING_BUCKETS", "64,128,256,384,512").split(",") if n.strip())
+# Cross-request micro-batching: windows from concurrent requests share forward passes
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_MAX_BATCH_SIZE = int(os.getenv("SCHEDULER_MAX_BATCH_SIZE", "32"))
+SCHEDULER_MAX_WAIT_MS = float(os.getenv("SCHEDULER_MAX_WAIT_MS", "10"))
+# CPU-bound stages (PDF extraction, tokenization, inference, explanation) run off the event loop
+CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", "2"))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))  # 0 keeps torch's default
+TORCH_NUM_INTEROP_THREADS = int(os.getenv("TORCH_NUM_INTEROP_THREADS", "0"))
+# Prediction result cache (raw per-window probabilities, threshold applied afterwards)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))  # 0 disables the memory tier
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")  # empty disables the disk tier
+WINDOW_CACHE_SIZE = int(os.getenv("WINDOW_CACHE_SIZE", "50000"))  # per-window probabilities; 0 disables
+# Opt-in early exit: stop scoring windows once the document-level verdict is settled
+EARLY_EXIT_MIN_WINDOWS = int(os.getenv("EARLY_EXIT_MIN_WINDOWS", "8"))
+EARLY_EXIT_Z = float(os.getenv("EARLY_EXIT_Z", "3.0"))  # standard errors required between verdict and flip
+EARLY_EXIT_TOLERANCE = float(os.getenv("EARLY_EXIT_TOLERANCE", "0.0"))  # extra margin (probability units)
+# PDF extraction: pages fanned out to a process pool (pypdf first, pdfplumber for empty pages)
+PDF_EXTRACT_ENGINE = os.getenv("PDF_EXTRACT_ENGINE", "pypdf")  # pypdf | pdfplumber
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(os.cpu_count() or 1, 4))))  # 0 extracts inline
+PDF_PAGE_TIMEOUT_S = float(os.getenv("PDF_PAGE_TIMEOUT_S", "10"))  # 0 disables the per-page timeout
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))  # shorter PDFs skip the pool unless they need it for the page timeout
+# /predict-pdf tokenizes pages as they are extracted and scores windows while later pages are read
+PDF_PIPELINE_ENABLED = os.getenv("PDF_PIPELINE_ENABLED", "1") == "1"
+# Audit log (JSONL) written by a background thread in batches
+AUDIT_LOG_PATH = os.getenv("AUDIT_LOG_PATH", "prediction_logs.jsonl")
+AUDIT_LOG_FLUSH_INTERVAL_S = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL_S", "1.0"))
+AUDIT_LOG_FSYNC = os.getenv("AUDIT_LOG_FSYNC", "none")  # none | batch
+AUDIT_LOG_MAX_QUEUE = int(os.getenv("AUDIT_LOG_MAX_QUEUE", "10000"))
+AUDIT_LOG_OVERFLOW = os.getenv("AUDIT_LOG_OVERFLOW", "drop")  # drop | block
+AUDIT_LOG_BLOCK_TIMEOUT_S = float(os.getenv("AUDIT_LOG_BLOCK_TIMEOUT_S", "0.1"))  # longest "block" wait before dropping
+AUDIT_LOG_MAX_BYTES = int(os.getenv("AUDIT_LOG_MAX_BYTES", str(100 * 1024 * 1024)))  # 0 disables rotation
+AUDIT_LOG_BACKUP_COUNT = int(os.getenv("AUDIT_LOG_BACKUP_COUNT", "10"))
+# /predict-batch: documents scored concurrently (their windows share scheduler batches)
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", "8"))
+BATCH_READ_CHUNK_BYTES = 64 * 1024
+# Inference engine: torch (eager), torchscript, compile (torch.compile), onnx or int8 -- see backends.py
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "")  # defaults to <MODEL_PATH>/model.onnx
+TORCHSCRIPT_MODEL_PATH = os.getenv("TORCHSCRIPT_MODEL_PATH", "")  # defaults to <MODEL_PATH>/model.torchscript.pt
+# Startup: the model loads in the background; readiness waits for a warm-up pass at these window lengths
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+WARMUP_LENGTHS = [int(n) for n in os.getenv("WARMUP_LENGTHS", "64,256,512").split(",") if n.strip()]
+# Explanations: "keywords" (sentence heuristics) or "occlusion" (sentences scored by masking them for the model)
+EXPLANATION_MODE = os.getenv("EXPLANATION_MODE", "keywords")  # keywords | occlusion
+ATTRIBUTION_MAX_VARIANTS = int(os.getenv("ATTRIBUTION_MAX_VARIANTS", "256"))  # masked windows scored per document; 0 = all
+ATTRIBUTION_SENTENCES_PER_WINDOW = 20  # admission estimate when ATTRIBUTION_MAX_VARIANTS is 0
+# Similar-case retrieval: index directory built with case_index.py; empty disables /similar-cases
+CASE_INDEX_DIR = os.getenv("CASE_INDEX_DIR", "")
+SIMILAR_CASES_NPROBE = int(os.getenv("SIMILAR_CASES_NPROBE", "16"))  # IVF lists scanned per query; 0 = exact
+# Admission control: request cost is estimated in model windows and admitted against this budget
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_BUDGET = float(os.getenv("ADMISSION_BUDGET", "512"))  # windows admitted at once
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))  # waiting requests before 503
+ADMISSION_MAX_QUEUE_WAIT_S = float(os.getenv("ADMISSION_MAX_QUEUE_WAIT_S", "10"))  # 0 waits indefinitely
+ADMISSION_CHARS_PER_TOKEN = float(os.getenv("ADMISSION_CHARS_PER_TOKEN", "4.0"))
+ADMISSION_PDF_WINDOWS_PER_PAGE = float(os.getenv("ADMISSION_PDF_WINDOWS_PER_PAGE", "2.0"))
+ADMISSION_PDF_PAGE_COST = float(os.getenv("ADMISSION_PDF_PAGE_COST", "0.5"))  # extraction, in windows
+ADMISSION_PDF_BYTES_PER_PAGE = int(os.getenv("ADMISSION_PDF_BYTES_PER_PAGE", "50000"))  # when pages can't be counted
+# Request deadlines: callers send their remaining time budget; scoring stops before it runs out
+DEADLINE_HEADER = os.getenv("DEADLINE_HEADER", "X-Request-Deadline-Ms")  # budget in milliseconds
+DEADLINE_ON_EXPIRY = os.getenv("DEADLINE_ON_EXPIRY", "partial")  # partial | cancel
+DEADLINE_SAFETY_MS = float(os.getenv("DEADLINE_SAFETY_MS", "100"))  # kept back for aggregation and the response
+DEADLINE_PDF_EXTRACT_SHARE = float(os.getenv("DEADLINE_PDF_EXTRACT_SHARE", "0.5"))  # partial mode: rest is kept for scoring
+DISCONNECT_POLL_S = float(os.getenv("DISCONNECT_POLL_S", "0.1"))  # 0 disables client-disconnect detection
 
 
 # -------------------------------
@@ -63,8 +187,25 @@ _file_handler.setFormatter(_formatter)
 LOGGER.addHandler(_file_handler)
 
 
+AUDIT_LOG = AuditLogSink(
+    AUDIT_LOG_PATH,
+    flush_interval_s=AUDIT_LOG_FLUSH_INTERVAL_S,
+    max_queue=AUDIT_LOG_MAX_QUEUE,
+    fsync=AUDIT_LOG_FSYNC,
+    overflow=AUDIT_LOG_OVERFLOW,
+    block_timeout_s=AUDIT_LOG_BLOCK_TIMEOUT_S,
+    max_bytes=AUDIT_LOG_MAX_BYTES,
+    backup_count=AUDIT_LOG_BACKUP_COUNT,
+)
+
+
 def log_prediction_to_file(filename: str, result: Dict[str, Any]) -> None:
-    """Append prediction information to JSONL audit log."""
+    """
+    Queue prediction information for the JSONL audit log.
+
+    The record is serialised and written by ``AUDIT_LOG``'s background
+    thread, so auditing adds no file I/O to the request path.
+    """
     log_entry = {
         "timestamp": datetime.datetime.utcnow().isoformat(),
         "filename": filename,
@@ -73,18 +214,16 @@ def log_prediction_to_file(filename: str, result: Dict[str, Any]) -> None:
         "result": result,
     }
 
-    try:
-        with open("prediction_logs.jsonl", "a", encoding="utf-8") as f:
-            f.write(json.dumps(log_entry) + "\n")
-    except Exception as exc:  # pragma: no cover - logging must not break API
-        LOGGER.error("Failed to write prediction log: %s", exc)
-
-    LOGGER.info(
-        "Prediction logged | filename=%s | prediction=%s | confidence=%s",
-        filename,
-        log_entry["prediction"],
-        log_entry["confidence"],
-    )
+    with STAGE_SECONDS.time(stage="audit_log"):
+        if not AUDIT_LOG.submit(log_entry):
+            LOGGER.warning("Prediction log queue full; dropped record for %s", filename)
+
+        LOGGER.info(
+            "Prediction logged | filename=%s | prediction=%s | confidence=%s",
+            filename,
+            log_entry["prediction"],
+            log_entry["confidence"],
+        )
 
 
 # -------------------------------
@@ -98,6 +237,13 @@ class ChunkPrediction(BaseModel):
     confidence: float
 
 
+class SentenceAttribution(BaseModel):
+    """A sentence and how much masking it lowers the probability of the predicted outcome."""
+
+    sentence: str
+    impact: float
+
+
 class PredictionResponse(BaseModel):
     """Unified prediction response for both PDF and text endpoints."""
 
@@ -111,6 +257,10 @@ class PredictionResponse(BaseModel):
     chunk_predictions: List[ChunkPrediction]
     explanation: str
     note: Optional[str] = None
+    num_chunks_evaluated: Optional[int] = None
+    early_exit: bool = False
+    partial: bool = False
+    attributions: Optional[List[SentenceAttribution]] = None
 
 
 class TextPredictionRequest(BaseModel):
@@ -129,6 +279,102 @@ class TextPredictionRequest(BaseModel):
         le=1.0,
         description="Optional confidence threshold. Below this, prediction will be forced to REJECT.",
     )
+    early_exit: bool = Field(
+        False,
+        description=(
+            "Stop scoring windows once the overall verdict is statistically settled. "
+            "Faster on very long documents; num_chunks_evaluated reports the windows scored."
+        ),
+    )
+    explanation_mode: Optional[Literal["keywords", "occlusion"]] = Field(
+        None,
+        description=(
+            "keywords: sentences ranked by legal-term heuristics. occlusion: sentences ranked "
+            "by how much masking them shifts the model's probability (also returns attributions). "
+            "Defaults to the server's EXPLANATION_MODE."
+        ),
+    )
+    deadline_ms: Optional[float] = Field(
+        None,
+        gt=0,
+        description=(
+            f"Time budget in milliseconds (also accepted as the {DEADLINE_HEADER} header; the "
+            "smaller wins). Scoring stops before the budget runs out and the response is the "
+            "aggregate of the windows scored so far, flagged with partial=true."
+        ),
+    )
+
+
+class BatchDocument(BaseModel):
+    """A single document inside a /predict-batch request."""
+
+    id: Optional[str] = Field(None, description="Caller-supplied identifier echoed in the result line.")
+    text: str
+
+
+class BatchPredictionRequest(BaseModel):
+    """Request body for JSON /predict-batch calls."""
+
+    documents: List[Union[BatchDocument, str]] = Field(
+        ..., description="Documents to score; plain strings or {id, text} objects."
+    )
+    threshold: float = Field(0.5, ge=0.0, le=1.0)
+    early_exit: bool = False
+    explain: bool = Field(True, description="Generate sentence explanations for each document.")
+
+
+class AuditLogStatsResponse(BaseModel):
+    """Audit log writer counters."""
+
+    path: str
+    queued: int
+    written: int
+    dropped: int
+    failed: int
+    rotations: int
+
+
+class AdmissionStatsResponse(BaseModel):
+    """Admission control budget (in windows) and counters."""
+
+    enabled: bool
+    budget: float
+    in_use: float
+    queue_length: int
+    queued_cost: float
+    admitted: int
+    queued: int
+    rejected: int
+    timed_out: int
+
+
+class SimilarCasesRequest(BaseModel):
+    """Request body for /similar-cases."""
+
+    text: constr(min_length=MIN_TEXT_LENGTH) = Field(..., description="Judgment or case text to match.")
+    top_k: int = Field(5, ge=1, le=100, description="Number of similar cases to return.")
+    nprobe: Optional[int] = Field(
+        None,
+        ge=0,
+        description="IVF lists to scan (more is slower but more exact; 0 scans every case). "
+        "Defaults to the server's SIMILAR_CASES_NPROBE.",
+    )
+
+
+class SimilarCase(BaseModel):
+    """One retrieved case: its identifier, cosine similarity and stored metadata."""
+
+    id: str
+    score: float
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+
+class SimilarCasesResponse(BaseModel):
+    """Most similar cases, best first."""
+
+    results: List[SimilarCase]
+    num_cases: int
+    elapsed_ms: float = Field(..., description="Embedding plus search time.")
 
 
 class HealthResponse(BaseModel):
@@ -136,22 +382,376 @@ class HealthResponse(BaseModel):
 
     model_name: str
     device: str
+    backend: str
+
+
+class LifecycleResponse(BaseModel):
+    """Startup state for liveness/readiness probes."""
+
+    state: str
+    ready: bool
+    load_time_s: Optional[float] = None
+    warmup_time_s: Optional[float] = None
+    warmup_latency_ms: Dict[str, float] = Field(default_factory=dict)
+    queue_depth: int = Field(0, description="Windows waiting in the inference scheduler.")
+    uptime_s: float
+    error: Optional[str] = None
+
+
+class CacheStatsResponse(BaseModel):
+    """Prediction result cache counters."""
+
+    enabled: bool
+    entries: int
+    max_entries: int
+    hits: int
+    disk_hits: int
+    misses: int
+    hit_rate: float
+    disk_dir: Optional[str] = None
+    window_entries: int
+    window_max_entries: int
+    window_hits: int
+    window_misses: int
+    window_hit_rate: float
 
 
 # -------------------------------
 # Model Loading
 # -------------------------------
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-model = AutoModelForSequenceClassification.from_pretrained(
-    MODEL_PATH,
-    use_safetensors=True,
-).to(DEVICE)
-model.eval()
+if TORCH_NUM_THREADS > 0:
+    torch.set_num_threads(TORCH_NUM_THREADS)
+if TORCH_NUM_INTEROP_THREADS > 0:
+    torch.set_num_interop_threads(TORCH_NUM_INTEROP_THREADS)
+
+# Populated by _load_model(), normally from a background thread at startup
+# (see MODEL_LIFECYCLE); everything that needs them calls _require_model().
+tokenizer = None
+backend: Optional[InferenceBackend] = None
+NUM_LABELS = AutoConfig.from_pretrained(MODEL_PATH).num_labels
+
+
+def _load_model() -> None:
+    global tokenizer, backend
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
+    backend = load_backend(
+        INFERENCE_BACKEND,
+        MODEL_PATH,
+        device=DEVICE,
+        onnx_path=ONNX_MODEL_PATH or None,
+        torchscript_path=TORCHSCRIPT_MODEL_PATH or None,
+        intra_op_threads=TORCH_NUM_THREADS,
+    )
+    LOGGER.info("Loaded InLegalBERT with the '%s' inference backend on %s", backend.name, backend.device)
+
+
+def _warm_up_model() -> Dict[str, float]:
+    """
+    Run synthetic forward passes at representative window lengths.
+
+    Triggers lazy initialisation (allocator pools, oneDNN kernels, graph
+    compilation for the compile/onnx backends) before real traffic arrives.
+    Returns the latency of a full micro-batch at each length, in ms.
+    """
+    tokenizer("Warm-up sentence for the tokenizer.", truncation=True, max_length=MAX_WINDOW_TOKENS)
+    filler = tokenizer.unk_token_id if tokenizer.unk_token_id is not None else 0
+    latencies: Dict[str, float] = {}
+    # Shape-compiling backends only ever see the bucket lengths; compile them all,
+    # including the single-row batch, which gets its own graph.
+    bucketed = backend.pad_to_buckets and INFERENCE_PADDING == "dynamic"
+    for length in PADDING_BUCKETS if bucketed else WARMUP_LENGTHS:
+        length = min(max(length, 2), MAX_WINDOW_TOKENS)
+        rows = max(1, min(INFERENCE_BATCH_SIZE, INFERENCE_MAX_BATCH_TOKENS // length))
+        batch = _pad_batch([[filler] * length] * rows)
+        # Called on the backend directly so warm-up stays out of the request metrics.
+        if bucketed:
+            single = _pad_batch([[filler] * length])
+            backend.predict_probs(single["input_ids"], single["attention_mask"])
+        backend.predict_probs(batch["input_ids"], batch["attention_mask"])  # pays for initialisation
+        began = time.perf_counter()
+        backend.predict_probs(batch["input_ids"], batch["attention_mask"])
+        latencies[str(length)] = round((time.perf_counter() - began) * 1000, 2)
+    return latencies
+
+
+MODEL_LIFECYCLE = ServiceLifecycle(
+    _load_model, warmup_fn=_warm_up_model if WARMUP_ENABLED else None
+)
+
+
+def _require_model() -> None:
+    """Load the model on first use when nothing has started it yet (CLI scripts, tests)."""
+    if not MODEL_LIFECYCLE.loaded:
+        MODEL_LIFECYCLE.ensure_loaded()
+
+
+def _model_identity(path: str) -> str:
+    """Fingerprint of the model weights/config so cache entries never outlive a model swap."""
+    digest = hashlib.sha256(os.path.abspath(path).encode("utf-8"))
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            stat = os.stat(os.path.join(path, name))
+            digest.update(f"{name}:{stat.st_size}:{int(stat.st_mtime)}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+# The backend (e.g. int8) and padding mode change the scores too, so they are
+# part of the identity that keys the result and window caches.
+MODEL_ID = "{}-{}-{}".format(
+    os.getenv("MODEL_VERSION") or _model_identity(MODEL_PATH), INFERENCE_BACKEND, INFERENCE_PADDING
+)
+
+RESULT_CACHE = PredictionCache(
+    max_entries=RESULT_CACHE_SIZE,
+    disk_dir=RESULT_CACHE_DIR or None,
+)
+WINDOW_CACHE = WindowCache(MODEL_ID, max_entries=WINDOW_CACHE_SIZE)
+
+def _new_cpu_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="prediction-cpu")
+
+
+CPU_EXECUTOR = _new_cpu_executor()
+
+PDF_EXTRACTOR = PdfExtractor(
+    engine=PDF_EXTRACT_ENGINE,
+    workers=PDF_EXTRACT_WORKERS,
+    page_timeout_s=PDF_PAGE_TIMEOUT_S,
+    min_parallel_pages=PDF_PARALLEL_MIN_PAGES,
+)
+
+
+def _open_case_index(path: str) -> Optional[CaseIndex]:
+    if not path:
+        return None
+    try:
+        index = CaseIndex(path)
+    except (OSError, ValueError, KeyError) as exc:
+        LOGGER.error("Could not open the similar-case index at %s: %s", path, exc)
+        return None
+    if index.model_id and index.model_id != MODEL_ID:
+        LOGGER.warning(
+            "Similar-case index %s was built with model %s, but the service runs %s; "
+            "rebuild it for meaningful similarities.",
+            path, index.model_id, MODEL_ID,
+        )
+    LOGGER.info("Opened similar-case index %s (%d cases, %s)", path, len(index), index.dtype)
+    return index
+
+
+# Memory-mapped, so opening it at import costs nothing and forked workers share it.
+CASE_INDEX = _open_case_index(CASE_INDEX_DIR)
+
+
+# -------------------------------
+# Metrics (Prometheus, served on /metrics)
+# -------------------------------
+METRICS = MetricsRegistry()
+STAGE_SECONDS = METRICS.histogram(
+    "prediction_stage_seconds",
+    "Time per request spent in each stage (upload_read, pdf_extract, tokenize, "
+    "inference, explanation, attribution, embedding, retrieval, audit_log).",
+    ["stage"],
+)
+FORWARD_PASS_SECONDS = METRICS.histogram(
+    "prediction_forward_pass_seconds", "Latency of one batched forward pass."
+)
+BATCH_SIZE_WINDOWS = METRICS.histogram(
+    "prediction_batch_size_windows",
+    "Windows per forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+CHUNKS_PER_DOCUMENT = METRICS.histogram(
+    "prediction_chunks_per_document",
+    "Token windows per scored document.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+QUEUE_WAIT_SECONDS = METRICS.histogram(
+    "prediction_scheduler_queue_wait_seconds",
+    "Time a request's first window waited in the scheduler before joining a batch.",
+)
+REQUEST_SECONDS = METRICS.histogram(
+    "prediction_request_seconds",
+    "Latency of prediction endpoints until the response starts.",
+    ["endpoint"],
+)
+REQUESTS_TOTAL = METRICS.counter(
+    "prediction_requests_total", "Prediction requests by endpoint and status code.", ["endpoint", "status"]
+)
+REQUESTS_IN_FLIGHT = METRICS.gauge(
+    "prediction_requests_in_flight", "Prediction requests currently being handled.", ["endpoint"]
+)
+DEADLINE_OUTCOMES = METRICS.counter(
+    "prediction_deadline_outcomes_total",
+    "Requests cut short: partial results, deadlines exceeded and client disconnects.",
+    ["outcome"],
+)
+
+
+# -------------------------------
+# Admission Control
+# -------------------------------
+ADMISSION = AdmissionController(
+    budget=ADMISSION_BUDGET,
+    max_queue=ADMISSION_MAX_QUEUE,
+    max_queue_wait_s=ADMISSION_MAX_QUEUE_WAIT_S,
+)
+# Page objects in an uncompressed page tree; "/Type /Pages" (tree nodes) excluded.
+_PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+def _estimate_windows(num_tokens: float, stride: int = 256) -> int:
+    """Number of windows ``_encode_windows`` produces for ``num_tokens`` tokens."""
+    span = MAX_WINDOW_TOKENS - 2  # [CLS] ... [SEP]
+    step = span - stride
+    return 1 + math.ceil(max(num_tokens - span, 0) / step)
+
+
+def _estimate_text_cost(text: str) -> float:
+    """Estimated cost of scoring ``text``, in windows, without tokenizing it."""
+    return float(_estimate_windows(len(text) / ADMISSION_CHARS_PER_TOKEN))
+
+
+def _estimate_pdf_cost(file_bytes: bytes) -> float:
+    """
+    Estimated cost of a PDF upload, in windows: extraction per page plus the
+    windows its text is expected to produce.
+
+    Pages are counted from the raw bytes; PDFs that keep their page tree in
+    compressed object streams fall back to a size-based guess.
+    """
+    pages = len(_PDF_PAGE_PATTERN.findall(file_bytes))
+    if pages == 0:
+        pages = max(math.ceil(len(file_bytes) / ADMISSION_PDF_BYTES_PER_PAGE), 1)
+    return pages * (ADMISSION_PDF_WINDOWS_PER_PAGE + ADMISSION_PDF_PAGE_COST)
+
+
+def _estimate_attribution_cost(cost: float, explanation_mode: Optional[str] = None) -> float:
+    """Extra windows scored by an occlusion explanation for a request of ``cost`` windows."""
+    if (explanation_mode or EXPLANATION_MODE) != "occlusion":
+        return 0.0
+    if ATTRIBUTION_MAX_VARIANTS:
+        return float(ATTRIBUTION_MAX_VARIANTS)
+    return cost * ATTRIBUTION_SENTENCES_PER_WINDOW
+
+
+def _service_unavailable(exc: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Server is at capacity ({exc}). Retry later.",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def _acquire_capacity(cost: float) -> float:
+    """Admit a request of ``cost`` windows or raise 503 with ``Retry-After``."""
+    if not ADMISSION_ENABLED:
+        return 0.0
+    try:
+        return await ADMISSION.acquire(cost)
+    except AdmissionRejected as exc:
+        LOGGER.warning("Request rejected by admission control (cost %.1f): %s", cost, exc)
+        raise _service_unavailable(exc) from None
+
+
+@asynccontextmanager
+async def admitted(cost: float, bounded: bool = True) -> AsyncIterator[None]:
+    """
+    Hold ``cost`` windows of the admission budget for the enclosed block.
+
+    ``bounded=False`` waits for capacity however long it takes instead of
+    rejecting (for batch documents, whose stream has already started).
+    """
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    try:
+        async with ADMISSION.admit(cost, bounded=bounded):
+            yield
+    except AdmissionRejected as exc:
+        LOGGER.warning("Request rejected by admission control (cost %.1f): %s", cost, exc)
+        raise _service_unavailable(exc) from None
+
+
+# -------------------------------
+# Request Deadlines
+# -------------------------------
+def _deadline_budget_s(request: Request, deadline_ms: Optional[float]) -> Optional[float]:
+    """Smaller of the ``DEADLINE_HEADER`` header and the body's ``deadline_ms``, in seconds."""
+    budgets = [deadline_ms] if deadline_ms is not None else []
+    header = request.headers.get(DEADLINE_HEADER)
+    if header is not None:
+        try:
+            header_ms = float(header)
+        except ValueError:
+            header_ms = 0.0
+        if not header_ms > 0:  # also rejects nan
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{DEADLINE_HEADER} must be a positive number of milliseconds.",
+            )
+        budgets.append(header_ms)
+    return min(budgets) / 1000 if budgets else None
+
+
+def _new_deadline(request: Request, deadline_ms: Optional[float] = None) -> Deadline:
+    return Deadline(
+        _deadline_budget_s(request, deadline_ms),
+        safety_s=DEADLINE_SAFETY_MS / 1000,
+        on_expiry=DEADLINE_ON_EXPIRY,
+    )
+
+
+async def _watch_disconnect(request: Request, deadline: Deadline) -> None:
+    while not deadline.cancelled:
+        if await request.is_disconnected():
+            deadline.cancel("client disconnected")
+            return
+        await asyncio.sleep(DISCONNECT_POLL_S)
+
+
+@asynccontextmanager
+async def request_deadline(request: Request, deadline_ms: Optional[float] = None) -> AsyncIterator[Deadline]:
+    """
+    Deadline for handling ``request``, cancelled if the client disconnects.
+
+    Scoring that outlives the deadline (``DEADLINE_ON_EXPIRY=cancel``, or
+    before any window was scored) becomes 504; abandoned requests end with
+    499 (client closed request), which nobody is left to read.
+    """
+    deadline = _new_deadline(request, deadline_ms)
+    watcher = asyncio.create_task(_watch_disconnect(request, deadline)) if DISCONNECT_POLL_S > 0 else None
+    try:
+        yield deadline
+    except DeadlineExceeded as exc:
+        DEADLINE_OUTCOMES.inc(outcome="exceeded")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Request deadline exceeded ({exc}).",
+        ) from None
+    except RequestCancelled as exc:
+        DEADLINE_OUTCOMES.inc(outcome="disconnected")
+        LOGGER.info("Stopped scoring %s: %s", request.url.path, exc)
+        raise HTTPException(status_code=499, detail="Client closed request.") from None
+    finally:
+        if watcher is not None:
+            watcher.cancel()
 
 
 # -------------------------------
 # Utility Functions
 # -------------------------------
+_T = TypeVar("_T")
+
+
+async def run_cpu_bound(func: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+    """Run a blocking, CPU-heavy call on the bounded ``CPU_EXECUTOR``."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        CPU_EXECUTOR, functools.partial(func, *args, **kwargs)
+    )
+
+
 def confidence_level(score: float) -> str:
     """Map a confidence score in [0, 1] to a qualitative level."""
     if score >= 0.80:
@@ -163,83 +763,787 @@ def confidence_level(score: float) -> str:
     return "Low"
 
 
-def extract_pdf_text(file_bytes: bytes) -> str:
-    """Extract text from a PDF file represented as raw bytes."""
-    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-        pages_text: List[str] = []
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                pages_text.append(page_text)
-    return " ".join(pages_text).strip()
+def extract_pdf_text(file_bytes: bytes, deadline: Optional[Deadline] = None) -> str:
+    """
+    Extract text from a PDF file represented as raw bytes.
 
+    Pages are extracted in parallel by ``PDF_EXTRACTOR`` (see pdf_extract.py);
+    pages that time out or fail are skipped. Extraction stops early once
+    ``deadline`` is cancelled or spent.
+    """
+    with STAGE_SECONDS.time(stage="pdf_extract"):
+        return PDF_EXTRACTOR.extract_text(file_bytes, deadline)
 
-@torch.no_grad()
-def chunk_predict(text: str, stride: int = 256) -> Dict[str, Any]:
-    """Run the model over long text using sliding-window chunking."""
-    encodings = tokenizer(
-        text,
-        truncation=True,
-        padding="max_length",
-        max_length=512,
-        stride=stride,
-        return_overflowing_tokens=True,
-        return_tensors="pt",
-    )
 
-    probs_list: List[np.ndarray] = []
-    chunk_predictions: List[Dict[str, Any]] = []
-
-    for i in range(encodings["input_ids"].shape[0]):
-        inputs = {
-            "input_ids": encodings["input_ids"][i : i + 1].to(DEVICE),
-            "attention_mask": encodings["attention_mask"][i : i + 1].to(DEVICE),
-        }
-
-        outputs = model(**inputs)
-        probs = torch.softmax(outputs.logits, dim=1).cpu().numpy()[0]
-
-        label_id = int(np.argmax(probs))
-        label = "ACCEPT" if label_id == 1 else "REJECT"
-        confidence = float(np.max(probs))
-
-        probs_list.append(probs)
-        chunk_predictions.append(
-            {
-                "chunk_id": i + 1,
-                "prediction": label,
-                "confidence": round(confidence, 4),
-            }
+def extract_pdf_text_within(
+    file_bytes: bytes, deadline: Deadline
+) -> Tuple[str, Optional[Tuple[int, int]]]:
+    """
+    ``extract_pdf_text`` for a request that may have a time budget.
+
+    In "partial" mode extraction gets ``DEADLINE_PDF_EXTRACT_SHARE`` of the
+    remaining budget; if that runs out, the text of the pages extracted so
+    far is returned with ``(pages_extracted, num_pages)``, and the time kept
+    back is left for scoring it. ``DeadlineExceeded`` is raised in "cancel"
+    mode, or when too little text was extracted to score.
+    """
+    if deadline.budget_s is None or deadline.on_expiry == "cancel":
+        return extract_pdf_text(file_bytes, deadline), None
+
+    reserve_s = max(deadline.remaining(), 0.0) * (1 - DEADLINE_PDF_EXTRACT_SHARE)
+    pages: List[str] = []
+    with STAGE_SECONDS.time(stage="pdf_extract"):
+        try:
+            for page in PDF_EXTRACTOR.iter_pages(file_bytes, deadline, reserve_s):
+                pages.append(page)
+        except DeadlineExceeded:
+            text = " ".join(page for page in pages if page).strip()
+            if len(text) < MIN_TEXT_LENGTH:
+                raise
+            return text, (len(pages), PDF_EXTRACTOR.count_pages(file_bytes))
+    return " ".join(page for page in pages if page).strip(), None
+
+
+def _flag_partial_extraction(result: Dict[str, Any], pages_extracted: int, num_pages: int) -> Dict[str, Any]:
+    """Flag a result scored from only the first ``pages_extracted`` pages of a PDF as ``partial``."""
+    if not result.get("partial"):
+        DEADLINE_OUTCOMES.inc(outcome="partial")
+    result["partial"] = True
+    result["note"] = " ".join(
+        filter(
+            None,
+            [
+                f"Partial result: the request deadline was reached after extracting "
+                f"{pages_extracted} of {num_pages} PDF pages.",
+                result.get("note"),
+            ],
         )
+    )
+    return result
+
+
+def _window_batches(
+    lengths: List[int],
+    batch_size: int = INFERENCE_BATCH_SIZE,
+    max_batch_tokens: int = INFERENCE_MAX_BATCH_TOKENS,
+) -> Iterator[List[int]]:
+    """
+    Group window indices into micro-batches.
+
+    A batch is closed once it holds ``batch_size`` windows or once adding the
+    next window would push the padded size (windows x longest window) above
+    ``max_batch_tokens``. A single window is always allowed through so that
+    an undersized budget never stalls inference.
+    """
+    batch: List[int] = []
+    longest = 0
+    for idx, length in enumerate(lengths):
+        candidate_longest = max(longest, length)
+        if batch and (
+            len(batch) >= batch_size
+            or (len(batch) + 1) * candidate_longest > max_batch_tokens
+        ):
+            yield batch
+            batch = []
+            candidate_longest = length
+        batch.append(idx)
+        longest = candidate_longest
+    if batch:
+        yield batch
+
+
+def _forward_windows(input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Run one forward pass over a batch of windows and return class probabilities."""
+    _require_model()
+    BATCH_SIZE_WINDOWS.observe(len(input_ids))
+    with FORWARD_PASS_SECONDS.time():
+        return backend.predict_probs(input_ids, attention_mask)
+
+
+def _chunk_prediction(index: int, window_probs: np.ndarray) -> Dict[str, Any]:
+    """Per-chunk prediction entry for the window at ``index`` (0-based)."""
+    label_id = int(np.argmax(window_probs))
+    return {
+        "chunk_id": index + 1,
+        "prediction": "ACCEPT" if label_id == 1 else "REJECT",
+        "confidence": round(float(np.max(window_probs)), 4),
+    }
+
 
-    avg_probs = np.mean(probs_list, axis=0)
+def _aggregate_chunk_probs(
+    probs: np.ndarray,
+    window_indices: Optional[List[int]] = None,
+    total_windows: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Average per-window probabilities into the document-level result.
+
+    ``window_indices``/``total_windows`` describe an early-exit result in which
+    only a subset of the document's windows was scored.
+
+    The raw probabilities are kept under ``window_probs`` (rows aligned with
+    ``chunk_predictions``) for attribution; they are not part of the API
+    response.
+    """
+    if window_indices is None:
+        window_indices = list(range(len(probs)))
+    if total_windows is None:
+        total_windows = len(probs)
+    CHUNKS_PER_DOCUMENT.observe(total_windows)
+
+    chunk_predictions = [
+        _chunk_prediction(i, window_probs) for i, window_probs in zip(window_indices, probs)
+    ]
+
+    avg_probs = np.mean(probs, axis=0)
     final_label_id = int(np.argmax(avg_probs))
     final_confidence = float(np.max(avg_probs))
     final_label = "ACCEPT" if final_label_id == 1 else "REJECT"
+    chunk_confidences = [c["confidence"] for c in chunk_predictions]
 
     result: Dict[str, Any] = {
         "prediction": final_label,
         "confidence": round(final_confidence, 4),
         "confidence_level": confidence_level(final_confidence),
-        "num_chunks": len(probs_list),
-        "avg_chunk_confidence": round(
-            float(np.mean([c["confidence"] for c in chunk_predictions])),
-            4,
-        ),
-        "min_chunk_confidence": round(
-            float(np.min([c["confidence"] for c in chunk_predictions])),
-            4,
-        ),
-        "max_chunk_confidence": round(
-            float(np.max([c["confidence"] for c in chunk_predictions])),
-            4,
-        ),
+        "num_chunks": total_windows,
+        "num_chunks_evaluated": len(chunk_predictions),
+        "early_exit": len(chunk_predictions) < total_windows,
+        "avg_chunk_confidence": round(float(np.mean(chunk_confidences)), 4),
+        "min_chunk_confidence": round(float(np.min(chunk_confidences)), 4),
+        "max_chunk_confidence": round(float(np.max(chunk_confidences)), 4),
         "chunk_predictions": chunk_predictions,
+        "window_probs": probs,
     }
 
     return result
 
 
+def _encode_windows(text: str, stride: int = 256) -> List[List[int]]:
+    """Tokenize text into overlapping, unpadded windows of at most 512 tokens."""
+    _require_model()
+    with STAGE_SECONDS.time(stage="tokenize"):
+        encodings = tokenizer(
+            text,
+            truncation=True,
+            padding=False,
+            max_length=MAX_WINDOW_TOKENS,
+            stride=stride,
+            return_overflowing_tokens=True,
+        )
+        return [list(ids) for ids in encodings["input_ids"]]
+
+
+def _pad_batch(
+    windows: List[List[int]], pad_to: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """Right-pad a batch of windows to ``pad_to`` (default: longest window in the batch)."""
+    _require_model()
+    width = pad_to or max(len(ids) for ids in windows)
+    pad_id = tokenizer.pad_token_id or 0
+    input_ids = np.full((len(windows), width), pad_id, dtype=np.int64)
+    attention_mask = np.zeros((len(windows), width), dtype=np.int64)
+    for row, ids in enumerate(windows):
+        input_ids[row, : len(ids)] = ids
+        attention_mask[row, : len(ids)] = 1
+    return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+
+def _bucket_length(length: int) -> int:
+    """Smallest of ``PADDING_BUCKETS`` that holds ``length`` tokens."""
+    return next((bucket for bucket in PADDING_BUCKETS if bucket >= length), max(length, MAX_WINDOW_TOKENS))
+
+
+def _predict_windows(
+    windows: List[List[int]],
+    batch_size: int = INFERENCE_BATCH_SIZE,
+    max_batch_tokens: int = INFERENCE_MAX_BATCH_TOKENS,
+    padding: str = INFERENCE_PADDING,
+) -> np.ndarray:
+    """
+    Score token windows and return their class probabilities in input order.
+
+    With ``padding="dynamic"`` windows are sorted by length so that each
+    micro-batch holds windows of similar size and is padded only to its own
+    longest member -- rounded up to one of ``PADDING_BUCKETS`` for backends
+    that compile per input shape; ``"max_length"`` reproduces the original
+    fixed 512-token padding.
+    """
+    if padding not in PADDING_STRATEGIES:
+        raise ValueError(f"Unknown padding strategy: {padding}")
+
+    probs = np.empty((len(windows), NUM_LABELS), dtype=np.float32)
+    if not windows:
+        return probs
+
+    if padding == "dynamic":
+        order = sorted(range(len(windows)), key=lambda i: len(windows[i]), reverse=True)
+        pad_to = None
+    else:
+        order = list(range(len(windows)))
+        pad_to = MAX_WINDOW_TOKENS
+
+    bucketed = pad_to is None and backend is not None and backend.pad_to_buckets
+    if bucketed:
+        lengths = [_bucket_length(len(windows[i])) for i in order]
+    else:
+        lengths = [pad_to or len(windows[i]) for i in order]
+    for batch in _window_batches(lengths, batch_size, max_batch_tokens):
+        indices = [order[j] for j in batch]
+        # Sorted longest first, so the batch's first window sets its width.
+        encoded = _pad_batch([windows[i] for i in indices], pad_to=lengths[batch[0]] if bucketed else pad_to)
+        probs[indices] = _forward_windows(
+            encoded["input_ids"], encoded["attention_mask"]
+        )
+
+    return probs
+
+
+def _lookup_cached_windows(
+    windows: List[List[int]],
+) -> Tuple[np.ndarray, List[int], List[bytes]]:
+    """Fill probabilities for windows already in ``WINDOW_CACHE``; report the rest."""
+    if not WINDOW_CACHE.enabled:
+        probs = np.empty((len(windows), NUM_LABELS), dtype=np.float32)
+        return probs, list(range(len(windows))), []
+    return WINDOW_CACHE.lookup(windows, NUM_LABELS)
+
+
+def _store_cached_windows(keys: List[bytes], missing: List[int], probs: np.ndarray) -> None:
+    if keys:
+        WINDOW_CACHE.store([keys[i] for i in missing], probs[missing])
+
+
+def _spread_order(num_windows: int) -> List[int]:
+    """
+    Window indices ordered so that every prefix is spread across the document:
+    first every 2^k-th window, then the midpoints between them, and so on.
+    """
+    step = 1
+    while step * 2 < num_windows:
+        step *= 2
+    order: List[int] = []
+    seen = set()
+    while step >= 1:
+        for idx in range(0, num_windows, step):
+            if idx not in seen:
+                seen.add(idx)
+                order.append(idx)
+        step //= 2
+    return order
+
+
+def _verdict_settled(
+    probs: np.ndarray,
+    total_windows: int,
+    z: float = EARLY_EXIT_Z,
+    tolerance: float = EARLY_EXIT_TOLERANCE,
+) -> bool:
+    """
+    Whether the verdict from the windows scored so far can no longer flip.
+
+    Works on each window's margin between the currently winning class and
+    its strongest rival. The verdict is settled when either
+      - it holds even if every remaining window voted fully against it, or
+      - the mean margin exceeds ``tolerance`` by ``z`` standard errors
+        (with a finite-population correction, since the document's
+        window count is known).
+    """
+    scored = len(probs)
+    if scored >= total_windows:
+        return True
+
+    top = int(np.argmax(probs.mean(axis=0)))
+    rivals = np.delete(probs, top, axis=1).max(axis=1)
+    margins = probs[:, top] - rivals
+
+    if (margins.sum() - (total_windows - scored)) / total_windows > tolerance:
+        return True
+    if scored < 2:
+        return False
+
+    fpc = math.sqrt((total_windows - scored) / (total_windows - 1))
+    std_err = float(margins.std(ddof=1)) / math.sqrt(scored) * fpc
+    return float(margins.mean()) - z * std_err > tolerance
+
+
+class _ProgressiveScoring:
+    """
+    Round planning for progressive scoring, shared by the blocking
+    (``_predict_windows_progressive``) and event-loop
+    (``_predict_windows_progressive_async``) drivers: ``next_round`` returns
+    the window indices to score next, or None once scoring should stop, and
+    ``record`` stores their probabilities.
+    """
+
+    def __init__(
+        self,
+        windows: List[List[int]],
+        round_size: int = INFERENCE_BATCH_SIZE,
+        min_windows: int = EARLY_EXIT_MIN_WINDOWS,
+        early_exit: bool = True,
+        deadline: Optional[Deadline] = None,
+        use_window_cache: bool = True,
+    ) -> None:
+        self.windows = windows
+        self.round_size = round_size
+        self.min_windows = min_windows
+        self.early_exit = early_exit
+        self.deadline = deadline
+        if use_window_cache:
+            self.probs, missing, self.keys = _lookup_cached_windows(windows)
+        else:
+            self.probs = np.empty((len(windows), NUM_LABELS), dtype=np.float32)
+            missing, self.keys = list(range(len(windows))), []
+        missing_set = set(missing)
+        self.evaluated = [i for i in range(len(windows)) if i not in missing_set]
+        self.pending = [i for i in _spread_order(len(windows)) if i in missing_set]
+        self.cut_short = False
+        self._seconds_per_window = 0.0
+        self._round_began = 0.0
+
+    def next_round(self) -> Optional[List[int]]:
+        if not self.pending:
+            return None
+        evaluated = self.evaluated
+        if self.early_exit and len(evaluated) >= self.min_windows and _verdict_settled(
+            self.probs[sorted(evaluated)], len(self.windows)
+        ):
+            return None
+        take = self.round_size if len(evaluated) >= self.min_windows else self.min_windows - len(evaluated)
+        batch, self.pending = self.pending[:take], self.pending[take:]
+        if self.deadline is not None:
+            self.deadline.check()
+            if self.deadline.expired(self._seconds_per_window * len(batch)):
+                if self.deadline.on_expiry == "cancel" or not evaluated:
+                    raise DeadlineExceeded(
+                        f"deadline reached after {len(evaluated)} of {len(self.windows)} windows"
+                    )
+                self.cut_short = True
+                return None
+        self._round_began = time.perf_counter()
+        return batch
+
+    def record(self, batch: List[int], probs: np.ndarray) -> None:
+        self.probs[batch] = probs
+        self._seconds_per_window = (time.perf_counter() - self._round_began) / len(batch)
+        _store_cached_windows(self.keys, batch, self.probs)
+        self.evaluated.extend(batch)
+
+    def result(self) -> Tuple[np.ndarray, List[int], bool]:
+        self.evaluated.sort()
+        return self.probs[self.evaluated], self.evaluated, self.cut_short
+
+
+def _predict_windows_progressive(
+    windows: List[List[int]],
+    score_fn: Callable[[List[List[int]]], np.ndarray],
+    round_size: int = INFERENCE_BATCH_SIZE,
+    min_windows: int = EARLY_EXIT_MIN_WINDOWS,
+    early_exit: bool = True,
+    deadline: Optional[Deadline] = None,
+    use_window_cache: bool = True,
+) -> Tuple[np.ndarray, List[int], bool]:
+    """
+    Score windows in spread order -- ``min_windows`` first, then rounds of
+    ``round_size`` -- until all are scored, the verdict is settled
+    (``early_exit``, see ``_verdict_settled``) or the next round would
+    overrun ``deadline``, judged by the per-window time of the last round.
+
+    Returns the probabilities of the scored windows, their indices
+    (ascending) and whether the deadline cut scoring short. Raises
+    ``RequestCancelled`` once the deadline is cancelled, and
+    ``DeadlineExceeded`` when it expires in "cancel" mode or before any
+    window was scored.
+    """
+    scoring = _ProgressiveScoring(windows, round_size, min_windows, early_exit, deadline, use_window_cache)
+    while True:
+        batch = scoring.next_round()
+        if batch is None:
+            return scoring.result()
+        scoring.record(batch, score_fn([windows[i] for i in batch]))
+
+
+def _progressive_result(
+    probs: np.ndarray, evaluated: List[int], total_windows: int, cut_short: bool
+) -> Dict[str, Any]:
+    """Aggregate progressively scored windows, flagging a deadline cut-off as ``partial``."""
+    result = _aggregate_chunk_probs(probs, evaluated, total_windows)
+    if cut_short:
+        DEADLINE_OUTCOMES.inc(outcome="partial")
+        result["early_exit"] = False
+        result["partial"] = True
+        result["note"] = (
+            f"Partial result: the request deadline was reached after scoring "
+            f"{len(evaluated)} of {total_windows} text segments."
+        )
+    return result
+
+
+def chunk_predict(
+    text: str,
+    stride: int = 256,
+    batch_size: int = INFERENCE_BATCH_SIZE,
+    max_batch_tokens: int = INFERENCE_MAX_BATCH_TOKENS,
+    padding: str = INFERENCE_PADDING,
+    use_window_cache: bool = True,
+    early_exit: bool = False,
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
+    """
+    Run the model over long text using sliding-window chunking.
+
+    Windows are scored in micro-batches (see ``_predict_windows``) instead of
+    one forward pass per window; the aggregated result is unchanged. Windows
+    already scored for an earlier version of the same document are served
+    from ``WINDOW_CACHE`` unless ``use_window_cache`` is False.
+
+    With ``early_exit=True`` windows are scored in spread order and scoring
+    stops once the verdict is settled (see ``_verdict_settled``); the result
+    then reports ``num_chunks_evaluated`` < ``num_chunks``.
+
+    When the ``deadline`` has a time budget windows are scored the same way,
+    round by round, and scoring stops before a round that would overrun it;
+    the result is then flagged ``partial`` (see
+    ``_predict_windows_progressive``).
+    """
+    if deadline is not None:
+        deadline.check_time_left()
+    windows = _encode_windows(text, stride=stride)
+    with STAGE_SECONDS.time(stage="inference"):
+        if early_exit or (deadline is not None and deadline.budget_s is not None):
+            probs, evaluated, cut_short = _predict_windows_progressive(
+                windows,
+                lambda batch: _predict_windows(
+                    batch,
+                    batch_size=batch_size,
+                    max_batch_tokens=max_batch_tokens,
+                    padding=padding,
+                ),
+                round_size=batch_size,
+                early_exit=early_exit,
+                deadline=deadline,
+                use_window_cache=use_window_cache,
+            )
+            return _progressive_result(probs, evaluated, len(windows), cut_short)
+
+        if not use_window_cache:
+            probs = _predict_windows(
+                windows,
+                batch_size=batch_size,
+                max_batch_tokens=max_batch_tokens,
+                padding=padding,
+            )
+            return _aggregate_chunk_probs(probs)
+
+        probs, missing, keys = _lookup_cached_windows(windows)
+        if missing:
+            probs[missing] = _predict_windows(
+                [windows[i] for i in missing],
+                batch_size=batch_size,
+                max_batch_tokens=max_batch_tokens,
+                padding=padding,
+            )
+            _store_cached_windows(keys, missing, probs)
+        return _aggregate_chunk_probs(probs)
+
+
+SCHEDULER: Optional[MicroBatchScheduler] = (
+    MicroBatchScheduler(
+        _predict_windows,
+        num_labels=NUM_LABELS,
+        max_batch_size=SCHEDULER_MAX_BATCH_SIZE,
+        max_wait_ms=SCHEDULER_MAX_WAIT_MS,
+        on_queue_wait=QUEUE_WAIT_SECONDS.observe,
+    )
+    if SCHEDULER_ENABLED
+    else None
+)
+
+
+async def _await_scheduled(future: Future, deadline: Optional[Deadline] = None) -> np.ndarray:
+    """
+    Await a ``SCHEDULER`` job; cancelling ``deadline`` withdraws its queued
+    windows and raises ``RequestCancelled``.
+    """
+    if deadline is None:
+        return await asyncio.wrap_future(future)
+    deadline.add_cancel_callback(future.cancel)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # Only the deadline's cancellation is turned into RequestCancelled;
+        # a cancelled task keeps propagating CancelledError.
+        if not asyncio.current_task().cancelling():
+            deadline.check()
+        raise
+
+
+async def _score_windows(windows: List[List[int]], deadline: Optional[Deadline] = None) -> np.ndarray:
+    """
+    Score windows from the event loop: through ``SCHEDULER``, so no
+    ``CPU_EXECUTOR`` thread sits waiting for it, or on ``CPU_EXECUTOR``
+    when the scheduler is disabled.
+    """
+    if SCHEDULER is None:
+        return await run_cpu_bound(_predict_windows, windows)
+    return await _await_scheduled(SCHEDULER.submit(windows), deadline)
+
+
+async def _predict_windows_progressive_async(
+    windows: List[List[int]], early_exit: bool = True, deadline: Optional[Deadline] = None
+) -> Tuple[np.ndarray, List[int], bool]:
+    """``_predict_windows_progressive`` with each round awaited through ``_score_windows``."""
+    scoring = _ProgressiveScoring(windows, early_exit=early_exit, deadline=deadline)
+    while True:
+        batch = scoring.next_round()
+        if batch is None:
+            return scoring.result()
+        scoring.record(batch, await _score_windows([windows[i] for i in batch], deadline))
+
+
+def _result_cache_lookup(text: str, stride: int) -> Tuple[Optional[str], Optional[np.ndarray]]:
+    """Return ``(cache_key, cached_probs)``; the key is None when the cache is disabled."""
+    if not RESULT_CACHE.enabled:
+        return None, None
+    cache_key = make_cache_key(text, MODEL_ID, stride)
+    return cache_key, RESULT_CACHE.get(cache_key)
+
+
+async def chunk_predict_async(
+    text: str,
+    stride: int = 256,
+    early_exit: bool = False,
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
+    """
+    Request-path variant of ``chunk_predict``.
+
+    Raw window probabilities are looked up in ``RESULT_CACHE`` first. On a
+    miss, windows not already in ``WINDOW_CACHE`` are handed to the shared
+    ``SCHEDULER`` so that concurrent requests are batched together (or scored
+    locally when the scheduler is disabled) and the probabilities are cached
+    before aggregation. Early-exit and partial (deadline) results cover only
+    part of the document and are not stored in ``RESULT_CACHE``.
+
+    When the ``deadline`` has a time budget windows go to the scheduler
+    round by round, so scoring stops at the deadline. Otherwise the document
+    is one scheduler job, withdrawn as soon as the deadline is cancelled.
+    """
+    cache_key, cached = _result_cache_lookup(text, stride)
+    if cached is not None:
+        return _aggregate_chunk_probs(cached)
+
+    if deadline is not None:
+        deadline.check_time_left()
+    windows = await run_cpu_bound(_encode_windows, text, stride=stride)
+    if deadline is not None:
+        deadline.check()
+    if early_exit or (deadline is not None and deadline.budget_s is not None):
+        with STAGE_SECONDS.time(stage="inference"):
+            probs, evaluated, cut_short = await _predict_windows_progressive_async(
+                windows, early_exit=early_exit, deadline=deadline
+            )
+        if cache_key is not None and len(evaluated) == len(windows):
+            RESULT_CACHE.put(cache_key, probs)
+        return _progressive_result(probs, evaluated, len(windows), cut_short)
+
+    probs, missing, keys = _lookup_cached_windows(windows)
+    if missing:
+        pending = [windows[i] for i in missing]
+        with STAGE_SECONDS.time(stage="inference"):
+            probs[missing] = await _score_windows(pending, deadline)
+        _store_cached_windows(keys, missing, probs)
+
+    if cache_key is not None:
+        RESULT_CACHE.put(cache_key, probs)
+    return _aggregate_chunk_probs(probs)
+
+
+class _WindowBuilder:
+    """
+    Cut a stream of text pieces into the windows ``_encode_windows`` would
+    produce for their space-joined concatenation.
+
+    WordPiece pre-tokenization splits on whitespace, so tokenizing pages one
+    at a time yields the same token sequence as tokenizing the whole text. A
+    window is emitted as soon as tokens beyond its end are known (i.e. once
+    it is certain not to be the last one); ``finish`` emits the final window.
+    """
+
+    def __init__(self, stride: int = 256) -> None:
+        _require_model()
+        # Special tokens around a single sequence ([CLS] ... [SEP] for BERT).
+        probe = tokenizer("a", add_special_tokens=False)["input_ids"]
+        wrapped = tokenizer("a")["input_ids"]
+        at = next(i for i in range(len(wrapped)) if wrapped[i : i + len(probe)] == probe)
+        self._prefix = wrapped[:at]
+        self._suffix = wrapped[at + len(probe) :]
+        self.span = MAX_WINDOW_TOKENS - len(self._prefix) - len(self._suffix)
+        self.step = self.span - stride
+        self._tokens: List[int] = []
+        self.num_windows = 0
+
+    def _window(self, ids: List[int]) -> List[int]:
+        self.num_windows += 1
+        return self._prefix + ids + self._suffix
+
+    def feed(self, text: str) -> List[List[int]]:
+        self._tokens.extend(
+            tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"]
+        )
+        windows: List[List[int]] = []
+        start = 0
+        while len(self._tokens) - start > self.span:
+            windows.append(self._window(self._tokens[start : start + self.span]))
+            start += self.step
+        # Only the overlap with the next window has to be kept.
+        del self._tokens[:start]
+        return windows
+
+    def finish(self) -> List[List[int]]:
+        if self._tokens or self.num_windows == 0:
+            return [self._window(self._tokens)]
+        return []
+
+
+class _PipelinedScorer:
+    """
+    Score windows of one document as they arrive.
+
+    Each submission is checked against ``WINDOW_CACHE`` and the misses are
+    handed to ``SCHEDULER``. Windows arriving while a submission is still in
+    flight are held back and sent as one job once it completes, so a long
+    document occupies a single round-robin slot in the scheduler rather than
+    one per page. Without the scheduler, windows are scored inline in
+    ``INFERENCE_BATCH_SIZE`` groups.
+
+    A cancelled ``deadline`` withdraws the submitted jobs and makes the next
+    submission or ``result`` raise ``RequestCancelled``.
+    """
+
+    def __init__(self, deadline: Optional[Deadline] = None) -> None:
+        self._deadline = deadline
+        self._held: List[List[int]] = []
+        self._parts: List[Tuple[np.ndarray, List[int], List[bytes], Optional[Future]]] = []
+
+    def add(self, windows: List[List[int]]) -> None:
+        self._held.extend(windows)
+        if SCHEDULER is None:
+            if len(self._held) >= INFERENCE_BATCH_SIZE:
+                self._submit()
+            return
+        in_flight = self._parts[-1][3] if self._parts else None
+        if self._held and (in_flight is None or in_flight.done()):
+            self._submit()
+
+    def _submit(self) -> None:
+        if self._deadline is not None:
+            self._deadline.check()
+        windows, self._held = self._held, []
+        probs, missing, keys = _lookup_cached_windows(windows)
+        future: Optional[Future] = None
+        if missing:
+            pending = [windows[i] for i in missing]
+            if SCHEDULER is None:
+                probs[missing] = _predict_windows(pending)
+                _store_cached_windows(keys, missing, probs)
+                missing = []
+            else:
+                future = SCHEDULER.submit(pending)
+                if self._deadline is not None:
+                    self._deadline.add_cancel_callback(future.cancel)
+        self._parts.append((probs, missing, keys, future))
+
+    def result(self) -> np.ndarray:
+        """Submit any held windows, wait for all of them and return their probabilities in order."""
+        if self._held:
+            self._submit()
+        for probs, missing, keys, future in self._parts:
+            if future is not None:
+                try:
+                    probs[missing] = future.result()
+                except FutureCancelledError:
+                    if self._deadline is not None:
+                        self._deadline.check()
+                    raise
+                _store_cached_windows(keys, missing, probs)
+        if not self._parts:
+            return np.empty((0, NUM_LABELS), dtype=np.float32)
+        return np.concatenate([part[0] for part in self._parts], axis=0)
+
+    def cancel(self) -> None:
+        """Withdraw every submitted job that is still queued."""
+        for part in self._parts:
+            if part[3] is not None:
+                part[3].cancel()
+
+
+def _pipelined_pdf_probs(
+    file_bytes: bytes, stride: int = 256, deadline: Optional[Deadline] = None
+) -> Tuple[str, np.ndarray]:
+    """
+    Extract, tokenize and score a PDF as one streaming pipeline.
+
+    Pages flow from ``PDF_EXTRACTOR`` into incremental tokenization, and each
+    completed window is handed to the model while later pages are still being
+    extracted. Returns the document text (needed for caching and the
+    explanation) and the per-window probabilities; the full encoding and
+    padded tensors for the whole document are never materialised at once.
+
+    ``deadline`` is checked per page and per scheduler submission; once it
+    is cancelled or spent, queued windows are withdrawn and
+    ``RequestCancelled`` / ``DeadlineExceeded`` is raised.
+    """
+    builder = _WindowBuilder(stride)
+    scorer = _PipelinedScorer(deadline)
+    pages: List[str] = []
+    extract_s = tokenize_s = 0.0
+    page_iter = PDF_EXTRACTOR.iter_pages(file_bytes, deadline)
+    try:
+        while True:
+            began = time.perf_counter()
+            page_text = next(page_iter, None)
+            extract_s += time.perf_counter() - began
+            if page_text is None:
+                break
+            if not page_text:
+                continue
+            pages.append(page_text)
+            began = time.perf_counter()
+            windows = builder.feed(page_text)
+            tokenize_s += time.perf_counter() - began
+            scorer.add(windows)
+        scorer.add(builder.finish())
+        STAGE_SECONDS.observe(extract_s, stage="pdf_extract")
+        STAGE_SECONDS.observe(tokenize_s, stage="tokenize")
+
+        # Only the scoring not already overlapped with extraction is left here.
+        with STAGE_SECONDS.time(stage="inference"):
+            probs = scorer.result()
+    except Exception:
+        scorer.cancel()
+        page_iter.close()
+        raise
+    return " ".join(pages).strip(), probs
+
+
+async def predict_pdf_pipelined(
+    file_bytes: bytes, stride: int = 256, deadline: Optional[Deadline] = None
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Pipelined counterpart of ``extract_pdf_text`` followed by ``chunk_predict_async``.
+
+    Returns ``(text, result)``; ``result`` is None when the extracted text is
+    shorter than ``MIN_TEXT_LENGTH``.
+    """
+    text, probs = await run_cpu_bound(_pipelined_pdf_probs, file_bytes, stride, deadline)
+    if len(text) < MIN_TEXT_LENGTH:
+        return text, None
+    if RESULT_CACHE.enabled:
+        RESULT_CACHE.put(make_cache_key(text, MODEL_ID, stride), probs)
+    return text, _aggregate_chunk_probs(probs)
+
+
 def _fallback_explanation(result: Dict[str, Any]) -> str:
     """
     Fallback, global explanation if sentence-level extraction is unavailable.
@@ -265,29 +1569,398 @@ def _fallback_explanation(result: Dict[str, Any]) -> str:
     )
 
 
+def build_explanation(text: str, result: Dict[str, Any]) -> str:
+    """Sentence-level explanation for a prediction, falling back to a global summary."""
+    try:
+        with STAGE_SECONDS.time(stage="explanation"):
+            top_sentences = generate_explanation_sentences(text)
+        if top_sentences:
+            return "\n".join(f"- {sentence}" for sentence in top_sentences)
+    except Exception as exc:  # pragma: no cover - explanation must not break API
+        LOGGER.error("Failed to generate explanation sentences: %s", exc)
+    return _fallback_explanation(result)
+
+
+def _encode_windows_with_offsets(
+    text: str, stride: int = 256
+) -> Tuple[List[List[int]], List[List[Tuple[int, int]]]]:
+    """``_encode_windows`` plus each token's character span in ``text`` ((0, 0) for special tokens)."""
+    _require_model()
+    encodings = tokenizer(
+        text,
+        truncation=True,
+        padding=False,
+        max_length=MAX_WINDOW_TOKENS,
+        stride=stride,
+        return_overflowing_tokens=True,
+        return_offsets_mapping=True,
+    )
+    windows = [list(ids) for ids in encodings["input_ids"]]
+    offsets = [[tuple(span) for span in spans] for spans in encodings["offset_mapping"]]
+    return windows, offsets
+
+
+def _occlusion_variants(
+    text: str, result: Dict[str, Any], window_probs: np.ndarray, target: int
+) -> Tuple[List[Tuple[int, int]], List[List[int]], List[Tuple[int, int]]]:
+    """Sentence spans and masked variants of the evaluated windows (CPU-only)."""
+    _require_model()
+    windows, offsets = _encode_windows_with_offsets(text)
+    evaluated = [chunk["chunk_id"] - 1 for chunk in result["chunk_predictions"]]
+    spans = sentence_spans(text)
+    variants, owners = occlusion_variants(
+        [windows[i] for i in evaluated],
+        [offsets[i] for i in evaluated],
+        window_probs,
+        spans,
+        mask_token_id=tokenizer.mask_token_id or tokenizer.unk_token_id,
+        target=target,
+        max_variants=ATTRIBUTION_MAX_VARIANTS,
+    )
+    return spans, variants, owners
+
+
+async def build_attribution(
+    text: str, result: Dict[str, Any], window_probs: np.ndarray, top_k: int = 3
+) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+    """
+    Occlusion explanation: the sentences whose masking most lowers the
+    probability of the model's predicted class (see ``occlusion_attribution``).
+
+    Reuses the window probabilities the prediction already computed, so only
+    the masked variants are scored, through ``_score_windows``; tokenising
+    and masking run on ``CPU_EXECUTOR``. Falls back to the keyword
+    explanation when no sentence supports the prediction.
+    """
+    try:
+        with STAGE_SECONDS.time(stage="attribution"):
+            target = int(np.argmax(window_probs.mean(axis=0)))
+            spans, variants, owners = await run_cpu_bound(_occlusion_variants, text, result, window_probs, target)
+            masked = await _score_windows(variants) if variants else np.empty((0, NUM_LABELS))
+            impact, covered = occlusion_impact(
+                owners, masked, window_probs, len(spans), target, result["num_chunks"]
+            )
+            top = top_attributed_sentences(text, spans, impact, covered, top_k=top_k)
+        if top:
+            explanation = "\n".join(f"- {sentence}" for sentence, _ in top)
+            return explanation, [{"sentence": s, "impact": round(v, 6)} for s, v in top]
+    except Exception as exc:  # pragma: no cover - explanation must not break API
+        LOGGER.error("Failed to compute occlusion attribution: %s", exc)
+    return await run_cpu_bound(build_explanation, text, result), None
+
+
+# -------------------------------
+# Document Embeddings (similar-case retrieval)
+# -------------------------------
+_ENCODER: Optional[torch.nn.Module] = None
+_ENCODER_LOCK = threading.Lock()
+
+
+def _encoder() -> torch.nn.Module:
+    """
+    The transformer encoder without the classification head.
+
+    The torch-based backends already hold it, so their weights are shared;
+    the onnx/torchscript backends load it separately on first use.
+    """
+    global _ENCODER
+    _require_model()
+    with _ENCODER_LOCK:
+        if _ENCODER is None:
+            model = getattr(backend, "model", None)
+            model = getattr(model, "_orig_mod", model)  # unwrap torch.compile
+            if isinstance(model, torch.nn.Module) and hasattr(model, "base_model"):
+                _ENCODER = model.base_model
+            else:
+                _ENCODER = AutoModel.from_pretrained(MODEL_PATH, use_safetensors=True).to(DEVICE)
+                _ENCODER.eval()
+        return _ENCODER
+
+
+def embedding_dim() -> int:
+    return AutoConfig.from_pretrained(MODEL_PATH).hidden_size
+
+
+@torch.no_grad()
+def _embed_windows(windows: List[List[int]]) -> np.ndarray:
+    """Mean-pooled last hidden state of each window, batched like ``_predict_windows``."""
+    encoder = _encoder()
+    embeddings = np.empty((len(windows), embedding_dim()), dtype=np.float32)
+    order = sorted(range(len(windows)), key=lambda i: len(windows[i]), reverse=True)
+    for batch in _window_batches([len(windows[i]) for i in order]):
+        indices = [order[j] for j in batch]
+        encoded = _pad_batch([windows[i] for i in indices])
+        mask = torch.from_numpy(encoded["attention_mask"]).to(DEVICE)
+        hidden = encoder(
+            input_ids=torch.from_numpy(encoded["input_ids"]).to(DEVICE), attention_mask=mask
+        ).last_hidden_state
+        weights = mask.unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * weights).sum(dim=1) / weights.sum(dim=1)
+        embeddings[indices] = pooled.float().cpu().numpy()
+    return embeddings
+
+
+def embed_documents(texts: List[str]) -> np.ndarray:
+    """
+    Unit-length embedding of each whole document: the token-weighted mean of
+    its window embeddings, so text beyond the first 512 tokens counts too.
+    Windows of all documents are batched together.
+    """
+    windows: List[List[int]] = []
+    owners: List[int] = []
+    for doc, text in enumerate(texts):
+        doc_windows = _encode_windows(text)
+        windows.extend(doc_windows)
+        owners.extend([doc] * len(doc_windows))
+
+    with STAGE_SECONDS.time(stage="embedding"):
+        window_embeddings = _embed_windows(windows)
+    weights = np.array([len(ids) for ids in windows], dtype=np.float32)
+    documents = np.zeros((len(texts), window_embeddings.shape[1]), dtype=np.float32)
+    np.add.at(documents, owners, window_embeddings * weights[:, None])
+    documents /= np.maximum(np.linalg.norm(documents, axis=1, keepdims=True), 1e-12)
+    return documents
+
+
+def find_similar_cases(text: str, top_k: int = 5, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Embed ``text`` and return the ``top_k`` most similar indexed cases."""
+    query = embed_documents([text])[0]
+    with STAGE_SECONDS.time(stage="retrieval"):
+        hits = CASE_INDEX.search(query, k=top_k, nprobe=SIMILAR_CASES_NPROBE if nprobe is None else nprobe)
+        results = []
+        for row, score in hits:
+            metadata = CASE_INDEX.case(row)
+            results.append({"id": str(metadata.pop("id", row)), "score": round(score, 4), "metadata": metadata})
+    return results
+
+
 # -------------------------------
 # API Endpoints
 # -------------------------------
+PREDICTION_ENDPOINTS = (
+    "/predict-pdf",
+    "/predict-text",
+    "/predict-batch",
+    "/predict-batch-ndjson",
+    "/predict-text-stream",
+    "/predict-pdf-stream",
+    "/similar-cases",
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Count prediction requests, track those in flight and time them.
+
+    A plain ASGI middleware rather than ``@app.middleware("http")``: the
+    latter wraps ``receive`` in a way that hides client disconnects from
+    ``Request.is_disconnected`` (see ``request_deadline``).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        endpoint = scope.get("path", "")
+        if scope["type"] != "http" or endpoint not in PREDICTION_ENDPOINTS:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        began = time.perf_counter()
+        recorded = False
+
+        def record() -> None:
+            nonlocal recorded
+            if not recorded:
+                recorded = True
+                REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+                REQUEST_SECONDS.observe(time.perf_counter() - began, endpoint=endpoint)
+                REQUESTS_TOTAL.inc(endpoint=endpoint, status=str(status_code))
+
+        async def send_recording(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                record()
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send_recording)
+        finally:
+            record()
+
+
+app.add_middleware(RequestMetricsMiddleware)
+
+
+def _cache_samples() -> List[Tuple[Dict[str, str], float]]:
+    result, window = RESULT_CACHE.stats(), WINDOW_CACHE.stats()
+    return [
+        ({"cache": "result", "outcome": "hit"}, result["hits"]),
+        ({"cache": "result", "outcome": "disk_hit"}, result["disk_hits"]),
+        ({"cache": "result", "outcome": "miss"}, result["misses"]),
+        ({"cache": "window", "outcome": "hit"}, window["window_hits"]),
+        ({"cache": "window", "outcome": "miss"}, window["window_misses"]),
+    ]
+
+
+METRICS.callback(
+    "prediction_cache_lookups_total",
+    "Result and window cache lookups by outcome.",
+    "counter",
+    _cache_samples,
+)
+METRICS.callback(
+    "prediction_cache_hit_ratio",
+    "Fraction of cache lookups served from the cache since start-up.",
+    "gauge",
+    lambda: [
+        ({"cache": "result"}, RESULT_CACHE.stats()["hit_rate"]),
+        ({"cache": "window"}, WINDOW_CACHE.stats()["window_hit_rate"]),
+    ],
+)
+METRICS.callback(
+    "prediction_scheduler_queue_depth",
+    "Windows waiting in the inference scheduler.",
+    "gauge",
+    lambda: [({}, SCHEDULER.queue_depth() if SCHEDULER is not None else 0)],
+)
+METRICS.callback(
+    "prediction_audit_log_records_total",
+    "Audit log records by outcome.",
+    "counter",
+    lambda: [
+        ({"outcome": outcome}, AUDIT_LOG.stats()[outcome])
+        for outcome in ("written", "dropped", "failed")
+    ],
+)
+METRICS.callback(
+    "prediction_admission_cost",
+    "Admission budget in windows: admitted (in use), waiting (queued) and the configured total.",
+    "gauge",
+    lambda: [
+        ({"state": "in_use"}, ADMISSION.stats()["in_use"]),
+        ({"state": "queued"}, ADMISSION.stats()["queued_cost"]),
+        ({"state": "budget"}, ADMISSION.budget),
+    ],
+)
+METRICS.callback(
+    "prediction_admission_requests_total",
+    "Admission outcomes: admitted (incl. after waiting), queued (had to wait), rejected (queue full), timed_out.",
+    "counter",
+    lambda: [
+        ({"outcome": outcome}, ADMISSION.stats()[outcome])
+        for outcome in ("admitted", "queued", "rejected", "timed_out")
+    ],
+)
+METRICS.callback(
+    "prediction_model_ready",
+    "1 once the model is loaded and warmed up.",
+    "gauge",
+    lambda: [({}, 1.0 if MODEL_LIFECYCLE.ready else 0.0)],
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Prometheus scrape endpoint."""
+    return Response(content=METRICS.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/health", response_model=HealthResponse)
 def health_check() -> HealthResponse:
     """Return basic health and model/device information."""
-    return HealthResponse(model_name="InLegalBERT", device=DEVICE)
+    if backend is None:
+        return HealthResponse(model_name="InLegalBERT", device=DEVICE, backend=INFERENCE_BACKEND)
+    return HealthResponse(model_name="InLegalBERT", device=backend.device, backend=backend.name)
+
+
+def _lifecycle_response() -> LifecycleResponse:
+    queue_depth = SCHEDULER.queue_depth() if SCHEDULER is not None else 0
+    return LifecycleResponse(**MODEL_LIFECYCLE.status(), queue_depth=queue_depth)
+
+
+@app.get("/health/live", response_model=LifecycleResponse)
+def liveness(response: Response) -> LifecycleResponse:
+    """Liveness probe: 200 while the process is serving, 503 if the model failed to load."""
+    body = _lifecycle_response()
+    if body.state == "failed":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return body
+
+
+@app.get("/health/ready", response_model=LifecycleResponse)
+def readiness(response: Response) -> LifecycleResponse:
+    """Readiness probe: 200 only once the model is loaded and warmed up."""
+    body = _lifecycle_response()
+    if not body.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return body
+
+
+@app.get("/cache/stats", response_model=CacheStatsResponse)
+def cache_stats() -> CacheStatsResponse:
+    """Return hit/miss counters for the prediction result cache."""
+    return CacheStatsResponse(**RESULT_CACHE.stats(), **WINDOW_CACHE.stats())
+
+
+def _too_short_response(subject: str = "Provided text") -> PredictionResponse:
+    """Structured response (rather than an error) for text below ``MIN_TEXT_LENGTH``."""
+    base_result: Dict[str, Any] = {
+        "prediction": "TEXT_TOO_SHORT",
+        "confidence": 0.0,
+        "confidence_level": "Low",
+        "num_chunks": 0,
+        "avg_chunk_confidence": 0.0,
+        "min_chunk_confidence": 0.0,
+        "max_chunk_confidence": 0.0,
+        "chunk_predictions": [],
+    }
+    base_result["explanation"] = (
+        f"{subject} is too short for reliable prediction. "
+        f"Please supply at least {MIN_TEXT_LENGTH} characters of text."
+    )
+    return PredictionResponse(**base_result)
 
 
-@app.post("/predict-pdf", response_model=PredictionResponse)
-async def predict_pdf(
-    file: UploadFile = File(..., description="PDF file containing the legal document."),
-    threshold: float = Body(
-        0.5,
-        embed=True,
-        ge=0.0,
-        le=1.0,
-        description=(
-            "Optional confidence threshold. Below this, prediction will be forced to REJECT."
-        ),
-    ),
+async def _finalize_response(
+    text: str,
+    result: Dict[str, Any],
+    threshold: float,
+    explain: bool = True,
+    explanation_mode: Optional[str] = None,
 ) -> PredictionResponse:
-    """Predict outcome from an uploaded PDF file."""
+    """Apply the user threshold and attach the explanation to an aggregated result."""
+    window_probs = result.pop("window_probs", None)
+
+    # Apply user-defined threshold
+    if result["confidence"] < threshold:
+        result["prediction"] = "REJECT"
+        result["note"] = " ".join(
+            filter(None, [result.get("note"), "Prediction forced to REJECT due to confidence below threshold."])
+        )
+
+    # Sentence-level explainability: select top influential sentences.
+    # Occlusion rescores the whole document, which a partial result had no time for.
+    if (
+        explain
+        and (explanation_mode or EXPLANATION_MODE) == "occlusion"
+        and window_probs is not None
+        and not result.get("partial")
+    ):
+        result["explanation"], result["attributions"] = await build_attribution(text, result, window_probs)
+    elif explain:
+        result["explanation"] = await run_cpu_bound(build_explanation, text, result)
+    else:
+        result["explanation"] = _fallback_explanation(result)
+
+    return PredictionResponse(**result)
+
+
+async def _read_pdf_upload(file: UploadFile) -> bytes:
+    """Validate an uploaded PDF and return its bytes."""
     if file.content_type != "application/pdf" and not (
         file.filename and file.filename.lower().endswith(".pdf")
     ):
@@ -296,7 +1969,8 @@ async def predict_pdf(
             detail="Only PDF files are supported.",
         )
 
-    file_bytes = await file.read()
+    with STAGE_SECONDS.time(stage="upload_read"):
+        file_bytes = await file.read()
     if len(file_bytes) == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -308,108 +1982,568 @@ async def predict_pdf(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail="PDF file size exceeds 10 MB limit.",
         )
+    return file_bytes
 
-    try:
-        text = extract_pdf_text(file_bytes)
-    except Exception as exc:
-        LOGGER.error("Failed to extract text from PDF: %s", exc)
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Unable to read PDF content. Ensure the file is a valid, non-corrupted PDF.",
-        ) from exc
 
-    if len(text) < MIN_TEXT_LENGTH:
-        # Return a structured response rather than raising an error for short text
-        base_result: Dict[str, Any] = {
-            "prediction": "TEXT_TOO_SHORT",
-            "confidence": 0.0,
-            "confidence_level": "Low",
-            "num_chunks": 0,
-            "avg_chunk_confidence": 0.0,
-            "min_chunk_confidence": 0.0,
-            "max_chunk_confidence": 0.0,
-            "chunk_predictions": [],
-        }
-        base_result["explanation"] = (
-            f"Provided document text is too short for reliable prediction. "
-            f"Please supply at least {MIN_TEXT_LENGTH} characters of text."
+@app.get("/admission/stats", response_model=AdmissionStatsResponse)
+def admission_stats() -> AdmissionStatsResponse:
+    """Return the admission budget, its current use and the admit/reject counters."""
+    return AdmissionStatsResponse(enabled=ADMISSION_ENABLED, **ADMISSION.stats())
+
+
+@app.post("/similar-cases", response_model=SimilarCasesResponse)
+async def similar_cases(payload: SimilarCasesRequest) -> SimilarCasesResponse:
+    """
+    Retrieve the indexed cases most similar to the given text (cosine
+    similarity of whole-document InLegalBERT embeddings).
+    """
+    if CASE_INDEX is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Similar-case retrieval is not configured (set CASE_INDEX_DIR).",
         )
+    began = time.perf_counter()
+    async with admitted(_estimate_text_cost(payload.text)):
+        results = await run_cpu_bound(find_similar_cases, payload.text, payload.top_k, payload.nprobe)
+    return SimilarCasesResponse(
+        results=[SimilarCase(**result) for result in results],
+        num_cases=len(CASE_INDEX),
+        elapsed_ms=round((time.perf_counter() - began) * 1000, 2),
+    )
 
-        response = PredictionResponse(**base_result)
-        log_prediction_to_file(file.filename or "uploaded.pdf", response.dict())
-        return response
 
-    result = chunk_predict(text)
+@app.get("/audit-log/stats", response_model=AuditLogStatsResponse)
+def audit_log_stats() -> AuditLogStatsResponse:
+    """Return queue depth and write/drop counters for the audit log writer."""
+    return AuditLogStatsResponse(**AUDIT_LOG.stats())
 
-    # Apply user-defined threshold
-    if result["confidence"] < threshold:
-        result["prediction"] = "REJECT"
-        result["note"] = "Prediction forced to REJECT due to confidence below threshold."
 
-    # Sentence-level explainability: select top influential sentences.
-    try:
-        top_sentences = generate_explanation_sentences(text)
-        if top_sentences:
-            result["explanation"] = "\n".join(
-                f"- {sentence}" for sentence in top_sentences
-            )
-        else:
-            result["explanation"] = _fallback_explanation(result)
-    except Exception as exc:  # pragma: no cover - explanation must not break API
-        LOGGER.error("Failed to generate explanation sentences: %s", exc)
-        result["explanation"] = _fallback_explanation(result)
+@app.post("/predict-pdf", response_model=PredictionResponse)
+async def predict_pdf(
+    request: Request,
+    file: UploadFile = File(..., description="PDF file containing the legal document."),
+    threshold: float = Body(
+        0.5,
+        embed=True,
+        ge=0.0,
+        le=1.0,
+        description=(
+            "Optional confidence threshold. Below this, prediction will be forced to REJECT."
+        ),
+    ),
+    early_exit: bool = Body(
+        False,
+        embed=True,
+        description=(
+            "Stop scoring windows once the overall verdict is statistically settled."
+        ),
+    ),
+    explanation_mode: Optional[Literal["keywords", "occlusion"]] = Body(
+        None,
+        embed=True,
+        description="keywords or occlusion (model-based); defaults to the server's EXPLANATION_MODE.",
+    ),
+    deadline_ms: Optional[float] = Body(
+        None,
+        embed=True,
+        gt=0,
+        description=f"Time budget in milliseconds (or the {DEADLINE_HEADER} header); see /predict-text.",
+    ),
+) -> PredictionResponse:
+    """Predict outcome from an uploaded PDF file."""
+    file_bytes = await _read_pdf_upload(file)
 
-    response = PredictionResponse(**result)
+    cost = _estimate_pdf_cost(file_bytes)
+    async with request_deadline(request, deadline_ms) as deadline, admitted(
+        cost + _estimate_attribution_cost(cost, explanation_mode)
+    ):
+        # Early exit and deadlines need the total window count up front, so
+        # they keep the sequential extract -> tokenize -> infer path.
+        pipelined = PDF_PIPELINE_ENABLED and not early_exit and deadline.budget_s is None
+        extracted = None
+        try:
+            if pipelined:
+                text, result = await predict_pdf_pipelined(file_bytes, deadline=deadline)
+            else:
+                text, extracted = await run_cpu_bound(extract_pdf_text_within, file_bytes, deadline)
+        except PdfExtractionError as exc:
+            LOGGER.error("Failed to extract text from PDF: %s", exc)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unable to read PDF content. Ensure the file is a valid, non-corrupted PDF.",
+            ) from exc
+
+        if len(text) < MIN_TEXT_LENGTH:
+            response = _too_short_response("Provided document text")
+            log_prediction_to_file(file.filename or "uploaded.pdf", response.dict())
+            return response
+
+        if not pipelined:
+            result = await chunk_predict_async(text, early_exit=early_exit, deadline=deadline)
+        if extracted is not None:
+            result = _flag_partial_extraction(result, *extracted)
+        response = await _finalize_response(
+            text, result, threshold, explanation_mode=explanation_mode
+        )
     log_prediction_to_file(file.filename or "uploaded.pdf", response.dict())
     return response
 
 
-@app.post("/predict-text", response_model=PredictionResponse)
-async def predict_text(payload: TextPredictionRequest) -> PredictionResponse:
-    """Predict outcome from raw legal text provided in the request body."""
-    text = payload.text.strip()
+async def _predict_text_response(
+    text: str,
+    threshold: float = 0.5,
+    early_exit: bool = False,
+    explain: bool = True,
+    explanation_mode: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+) -> PredictionResponse:
+    """Shared text pipeline for /predict-text and /predict-batch."""
+    text = text.strip()
 
     if len(text) < MIN_TEXT_LENGTH:
-        base_result: Dict[str, Any] = {
-            "prediction": "TEXT_TOO_SHORT",
-            "confidence": 0.0,
-            "confidence_level": "Low",
-            "num_chunks": 0,
-            "avg_chunk_confidence": 0.0,
-            "min_chunk_confidence": 0.0,
-            "max_chunk_confidence": 0.0,
-            "chunk_predictions": [],
-        }
-        base_result["explanation"] = (
-            f"Provided text is too short for reliable prediction. "
-            f"Please supply at least {MIN_TEXT_LENGTH} characters of text."
+        return _too_short_response()
+
+    result = await chunk_predict_async(text, early_exit=early_exit, deadline=deadline)
+    return await _finalize_response(
+        text, result, threshold, explain=explain, explanation_mode=explanation_mode
+    )
+
+
+@app.post("/predict-text", response_model=PredictionResponse)
+async def predict_text(payload: TextPredictionRequest, request: Request) -> PredictionResponse:
+    """Predict outcome from raw legal text provided in the request body."""
+    cost = _estimate_text_cost(payload.text)
+    async with request_deadline(request, payload.deadline_ms) as deadline, admitted(
+        cost + _estimate_attribution_cost(cost, payload.explanation_mode)
+    ):
+        response = await _predict_text_response(
+            payload.text,
+            threshold=payload.threshold,
+            early_exit=payload.early_exit,
+            explanation_mode=payload.explanation_mode,
+            deadline=deadline,
         )
+    log_prediction_to_file("raw_text", response.dict())
+    return response
 
-        response = PredictionResponse(**base_result)
-        log_prediction_to_file("raw_text", response.dict())
-        return response
 
-    result = chunk_predict(text)
+async def _predict_batch_line(
+    index: int,
+    document: Any,
+    threshold: float,
+    early_exit: bool,
+    explain: bool,
+) -> Dict[str, Any]:
+    """Score one batch document; failures become an ``error`` line instead of aborting the batch."""
+    doc_id: Optional[str] = None
+    try:
+        if isinstance(document, bytes):
+            document = json.loads(document)
+        if isinstance(document, str):
+            document = BatchDocument(text=document)
+        elif isinstance(document, dict):
+            document = BatchDocument(**document)
+        doc_id = document.id
+        # The batch stream has already started, so documents wait for
+        # capacity rather than being rejected mid-batch.
+        cost = _estimate_text_cost(document.text)
+        if explain:
+            cost += _estimate_attribution_cost(cost)
+        async with admitted(cost, bounded=False):
+            response = await _predict_text_response(
+                document.text, threshold=threshold, early_exit=early_exit, explain=explain
+            )
+    except Exception as exc:
+        LOGGER.error("Batch document %s failed: %s", index, exc)
+        return {"index": index, "id": doc_id, "error": str(exc)}
 
-    if result["confidence"] < payload.threshold:
-        result["prediction"] = "REJECT"
-        result["note"] = "Prediction forced to REJECT due to confidence below threshold."
+    log_prediction_to_file(f"batch:{doc_id if doc_id is not None else index}", response.dict())
+    return {"index": index, "id": doc_id, **response.dict()}
+
+
+async def _stream_batch(
+    documents: AsyncIterator[Any],
+    threshold: float,
+    early_exit: bool,
+    explain: bool,
+) -> AsyncIterator[str]:
+    """
+    Score documents with at most ``BATCH_MAX_IN_FLIGHT`` in progress and emit
+    one NDJSON line per document in completion order.
 
+    Only in-flight documents are held in memory, and because they run
+    concurrently their windows are packed into shared ``SCHEDULER`` batches.
+    """
+    pending: Set[asyncio.Task] = set()
+    index = 0
     try:
-        top_sentences = generate_explanation_sentences(text)
-        if top_sentences:
-            result["explanation"] = "\n".join(
-                f"- {sentence}" for sentence in top_sentences
+        async for document in documents:
+            if len(pending) >= BATCH_MAX_IN_FLIGHT:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield json.dumps(task.result()) + "\n"
+            pending.add(
+                asyncio.create_task(
+                    _predict_batch_line(index, document, threshold, early_exit, explain)
+                )
             )
+            index += 1
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield json.dumps(task.result()) + "\n"
+    finally:
+        # The client disconnected or the stream was closed early: stop the
+        # documents still in flight instead of scoring them for nobody.
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _iter_json_documents(documents: List[Any]) -> AsyncIterator[Any]:
+    for document in documents:
+        yield document.dict() if isinstance(document, BaseModel) else document
+
+
+async def _iter_ndjson_lines(upload: UploadFile) -> AsyncIterator[bytes]:
+    """Read an uploaded NDJSON file incrementally, one non-empty line at a time."""
+    buffer = b""
+    while True:
+        chunk = await upload.read(BATCH_READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+@app.post("/predict-batch")
+async def predict_batch(payload: BatchPredictionRequest) -> StreamingResponse:
+    """
+    Score many documents in one call.
+
+    Streams ``application/x-ndjson``: one line per document, as soon as that
+    document is done, with ``index`` (position in the request), ``id`` and
+    either the usual prediction fields or an ``error`` message.
+    """
+    return StreamingResponse(
+        _stream_batch(
+            _iter_json_documents(payload.documents),
+            payload.threshold,
+            payload.early_exit,
+            payload.explain,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.post("/predict-batch-ndjson")
+async def predict_batch_ndjson(
+    file: UploadFile = File(
+        ...,
+        description='NDJSON file: one {"id": ..., "text": ...} object (or JSON string) per line.',
+    ),
+    threshold: float = Body(0.5, embed=True, ge=0.0, le=1.0),
+    early_exit: bool = Body(False, embed=True),
+    explain: bool = Body(True, embed=True),
+) -> StreamingResponse:
+    """
+    NDJSON-upload variant of ``/predict-batch`` for very large batches.
+
+    The upload is read line by line, so memory stays bounded regardless of
+    the number of documents.
+    """
+    return StreamingResponse(
+        _stream_batch(_iter_ndjson_lines(file), threshold, early_exit, explain),
+        media_type="application/x-ndjson",
+    )
+
+
+# -------------------------------
+# Streaming (server-sent events)
+# -------------------------------
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _iter_window_probs(
+    windows: List[List[int]], deadline: Optional[Deadline] = None
+) -> AsyncIterator[Tuple[int, np.ndarray]]:
+    """
+    Yield ``(window_index, probabilities)`` as each window is scored.
+
+    Windows found in ``WINDOW_CACHE`` are yielded first. The rest go through
+    the ``SCHEDULER``, whose per-window callback is bridged onto the event
+    loop, or are scored locally batch by batch when the scheduler is disabled.
+
+    Stops early, without raising, once ``deadline``'s time budget runs out
+    (the caller compares what it received with ``len(windows)``); raises
+    ``RequestCancelled`` once it is cancelled.
+    """
+    probs, missing, keys = _lookup_cached_windows(windows)
+    missing_set = set(missing)
+    for idx in range(len(windows)):
+        if idx not in missing_set:
+            yield idx, probs[idx]
+    if not missing:
+        return
+
+    loop = asyncio.get_running_loop()
+    if SCHEDULER is None:
+        scoring: Optional[asyncio.Future] = None
+        seconds_per_batch = 0.0
+        try:
+            for start in range(0, len(missing), INFERENCE_BATCH_SIZE):
+                if deadline is not None:
+                    deadline.check()
+                    if deadline.expired(seconds_per_batch):
+                        return
+                batch = missing[start : start + INFERENCE_BATCH_SIZE]
+                began = time.perf_counter()
+                scoring = loop.run_in_executor(
+                    CPU_EXECUTOR, functools.partial(_predict_windows, [windows[i] for i in batch])
+                )
+                probs[batch] = await scoring
+                seconds_per_batch = time.perf_counter() - began
+                _store_cached_windows(keys, batch, probs)
+                for idx in batch:
+                    yield idx, probs[idx]
+        finally:
+            # The stream was closed early: drop a batch still waiting for a thread.
+            if scoring is not None:
+                scoring.cancel()
+        return
+
+    queue: "asyncio.Queue[Optional[Tuple[int, np.ndarray]]]" = asyncio.Queue()
+    future = SCHEDULER.submit(
+        [windows[i] for i in missing],
+        on_window=lambda pos, row: loop.call_soon_threadsafe(queue.put_nowait, (pos, row)),
+    )
+    # Resolves after the last window callback, so the sentinel always arrives last.
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, None))
+    if deadline is not None:
+        deadline.add_cancel_callback(future.cancel)
+    budgeted = deadline is not None and deadline.budget_s is not None
+
+    try:
+        while True:
+            timeout = max(deadline.remaining(), 0.0) if budgeted else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return
+            if item is None:
+                break
+            pos, row = item
+            yield missing[pos], row
+    finally:
+        # The client disconnected, the deadline passed or the stream was
+        # closed early: withdraw the windows the scheduler has not batched
+        # yet (no-op once done).
+        future.cancel()
+
+    if deadline is not None:
+        deadline.check()
+    probs[missing] = future.result()
+    _store_cached_windows(keys, missing, probs)
+
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """
+    ``StreamingResponse`` holding ``charged`` of the admission budget until
+    the response is over, however it ends -- including a client that
+    disconnects before the body is ever iterated.
+    """
+
+    def __init__(self, content: AsyncIterator[str], charged: float, **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self.charged = charged
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        began = time.monotonic()
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Close the body first so its cleanup cancels any scheduled work
+            # before the budget is handed to other requests.
+            await self.body_iterator.aclose()
+            if ADMISSION_ENABLED:
+                ADMISSION.release(self.charged, time.monotonic() - began)
+
+
+async def _stream_prediction(
+    label: str,
+    threshold: float,
+    text: Optional[str] = None,
+    file_bytes: Optional[bytes] = None,
+    deadline: Optional[Deadline] = None,
+    request: Optional[Request] = None,
+) -> AsyncIterator[str]:
+    """
+    Event stream for one prediction: ``progress`` events per stage, one
+    ``chunk`` event per scored window, then a final ``result`` event carrying
+    the full ``PredictionResponse`` (or an ``error`` event).
+
+    ``deadline`` applies as in ``/predict-text``: once its budget runs out
+    the result aggregates the windows streamed so far (``partial``), or is
+    an ``error`` event in "cancel" mode. Scoring stops when ``request``'s
+    client disconnects.
+    """
+    deadline = deadline or Deadline()
+    watcher = (
+        asyncio.create_task(_watch_disconnect(request, deadline))
+        if request is not None and DISCONNECT_POLL_S > 0
+        else None
+    )
+    try:
+        extracted = None
+        if file_bytes is not None:
+            yield _sse_event("progress", {"stage": "extracting"})
+            try:
+                text, extracted = await run_cpu_bound(extract_pdf_text_within, file_bytes, deadline)
+            except (DeadlineExceeded, RequestCancelled):
+                raise
+            except Exception as exc:
+                LOGGER.error("Failed to extract text from PDF: %s", exc)
+                yield _sse_event(
+                    "error",
+                    {
+                        "detail": "Unable to read PDF content. "
+                        "Ensure the file is a valid, non-corrupted PDF."
+                    },
+                )
+                return
+            subject = "Provided document text"
         else:
-            result["explanation"] = _fallback_explanation(result)
-    except Exception as exc:  # pragma: no cover
-        LOGGER.error("Failed to generate explanation sentences: %s", exc)
-        result["explanation"] = _fallback_explanation(result)
+            subject = "Provided text"
+
+        text = (text or "").strip()
+        yield _sse_event("progress", {"stage": "extracted", "characters": len(text)})
+
+        if len(text) < MIN_TEXT_LENGTH:
+            response = _too_short_response(subject)
+            log_prediction_to_file(label, response.dict())
+            yield _sse_event("result", response.dict())
+            return
+
+        cache_key, probs = _result_cache_lookup(text, 256)
+        if probs is not None:
+            yield _sse_event("progress", {"stage": "tokenized", "num_chunks": len(probs)})
+            for idx, row in enumerate(probs):
+                yield _sse_event("chunk", _chunk_prediction(idx, row))
+            result = _aggregate_chunk_probs(probs)
+        else:
+            deadline.check_time_left()
+            windows = await run_cpu_bound(_encode_windows, text)
+            yield _sse_event("progress", {"stage": "tokenized", "num_chunks": len(windows)})
+            probs = np.empty((len(windows), NUM_LABELS), dtype=np.float32)
+            evaluated: List[int] = []
+            # aclosing: a stream closed mid-way closes this one too, which
+            # cancels its scheduled windows.
+            async with aclosing(_iter_window_probs(windows, deadline)) as window_probs:
+                async for idx, row in window_probs:
+                    probs[idx] = row
+                    evaluated.append(idx)
+                    yield _sse_event("chunk", _chunk_prediction(idx, row))
+            if len(evaluated) < len(windows):
+                if deadline.on_expiry == "cancel" or not evaluated:
+                    raise DeadlineExceeded(
+                        f"deadline reached after {len(evaluated)} of {len(windows)} windows"
+                    )
+                evaluated.sort()
+                result = _progressive_result(probs[evaluated], evaluated, len(windows), cut_short=True)
+            else:
+                if cache_key is not None:
+                    RESULT_CACHE.put(cache_key, probs)
+                result = _aggregate_chunk_probs(probs)
+        if extracted is not None:
+            result = _flag_partial_extraction(result, *extracted)
+
+        yield _sse_event("progress", {"stage": "explaining"})
+        response = await _finalize_response(text, result, threshold)
+        log_prediction_to_file(label, response.dict())
+        yield _sse_event("result", response.dict())
+    except DeadlineExceeded as exc:
+        DEADLINE_OUTCOMES.inc(outcome="exceeded")
+        yield _sse_event("error", {"detail": f"Request deadline exceeded ({exc})."})
+    except RequestCancelled as exc:
+        # Nobody is left to read an error event.
+        DEADLINE_OUTCOMES.inc(outcome="disconnected")
+        LOGGER.info("Stopped streaming %s: %s", label, exc)
+    except Exception as exc:
+        LOGGER.error("Streaming prediction failed: %s", exc)
+        yield _sse_event("error", {"detail": "Prediction failed."})
+    finally:
+        # However the stream ended (the server may cancel it outright on a
+        # disconnect), stop work still running for it on other threads.
+        deadline.cancel("stream closed")
+        if watcher is not None:
+            watcher.cancel()
+
+
+@app.post("/predict-text-stream")
+async def predict_text_stream(payload: TextPredictionRequest, request: Request) -> StreamingResponse:
+    """
+    Server-sent-events variant of ``/predict-text``.
 
-    response = PredictionResponse(**result)
-    log_prediction_to_file("raw_text", response.dict())
-    return response
+    Emits ``progress``, one ``chunk`` per window as it is scored and a final
+    ``result`` event. Every window is scored (``early_exit`` is not applied)
+    unless the deadline runs out first.
+    """
+    deadline = _new_deadline(request, payload.deadline_ms)
+    # Admitted before the stream starts so a rejection is a real 503, not an event.
+    cost = _estimate_text_cost(payload.text)
+    charged = await _acquire_capacity(cost + _estimate_attribution_cost(cost))
+    return _AdmittedStreamingResponse(
+        _stream_prediction(
+            "raw_text", payload.threshold, text=payload.text, deadline=deadline, request=request
+        ),
+        charged,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@app.post("/predict-pdf-stream")
+async def predict_pdf_stream(
+    request: Request,
+    file: UploadFile = File(..., description="PDF file containing the legal document."),
+    threshold: float = Body(0.5, embed=True, ge=0.0, le=1.0),
+    deadline_ms: Optional[float] = Body(
+        None,
+        embed=True,
+        gt=0,
+        description=f"Time budget in milliseconds (or the {DEADLINE_HEADER} header); see /predict-text.",
+    ),
+) -> StreamingResponse:
+    """
+    Server-sent-events variant of ``/predict-pdf``, reporting extraction
+    progress and per-chunk predictions before the final ``result`` event.
+    """
+    deadline = _new_deadline(request, deadline_ms)
+    file_bytes = await _read_pdf_upload(file)
+    cost = _estimate_pdf_cost(file_bytes)
+    charged = await _acquire_capacity(cost + _estimate_attribution_cost(cost))
+    return _AdmittedStreamingResponse(
+        _stream_prediction(
+            file.filename or "uploaded.pdf",
+            threshold,
+            file_bytes=file_bytes,
+            deadline=deadline,
+            request=request,
+        ),
+        charged,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+"""
+Content-addressed cache of raw prediction probabilities.
+
+Entries are keyed by a SHA-256 of the whitespace-normalised document text,
+the model identity and the chunking stride, and store the per-window class
+probabilities *before* any threshold is applied. A request with a different
+``threshold`` therefore reuses the same entry.
+
+Two tiers:
+    - a bounded in-memory LRU (``max_entries``)
+    - an optional on-disk tier (``disk_dir``) of ``.npy`` files that survives
+      restarts and is shared by every worker pointing at the same directory
+
+``WindowCache`` sits underneath it and caches probabilities per token
+window, so incrementally edited or growing documents only re-score the
+windows that actually changed.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+LOGGER = logging.getLogger("prediction_service")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace; BERT tokenization is insensitive to it."""
+    return " ".join(text.split())
+
+
+def make_cache_key(text: str, model_id: str, stride: int) -> str:
+    digest = hashlib.sha256()
+    digest.update(model_id.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(str(stride).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Thread-safe LRU of per-window probabilities with an optional disk tier."""
+
+    def __init__(self, max_entries: int = 1024, disk_dir: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir or None
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.disk_dir is not None
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            probs = self._entries.get(key)
+            if probs is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return probs
+
+        probs = self._read_disk(key)
+        with self._lock:
+            if probs is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store_memory(key, probs)
+        return probs
+
+    def put(self, key: str, probs: np.ndarray) -> None:
+        probs = np.asarray(probs, dtype=np.float32)
+        probs.setflags(write=False)
+        with self._lock:
+            self._store_memory(key, probs)
+        self._write_disk(key, probs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_dir": self.disk_dir,
+            }
+
+    # ---------------------------
+    # Internals
+    # ---------------------------
+    def _store_memory(self, key: str, probs: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = probs
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npy")
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            probs = np.load(path, allow_pickle=False)
+        except Exception as exc:  # pragma: no cover - corrupt entries are treated as misses
+            LOGGER.warning("Discarding unreadable cache entry %s: %s", path, exc)
+            return None
+        probs.setflags(write=False)
+        return probs
+
+    def _write_disk(self, key: str, probs: np.ndarray) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so concurrent readers never see a partial file.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, probs, allow_pickle=False)
+            os.replace(tmp_path, path)
+        except Exception as exc:  # pragma: no cover - caching must not break API
+            LOGGER.error("Failed to write cache entry %s: %s", path, exc)
+
+
+class WindowCache:
+    """
+    Thread-safe LRU of class probabilities for individual token windows.
+
+    Keys are a digest of the window's token ids, so when a case file is
+    re-submitted with new orders appended (or a local edit that does not
+    shift later token positions), every unchanged window is served from the
+    cache and only new or changed windows are sent to the model.
+    """
+
+    def __init__(self, model_id: str, max_entries: int = 50_000) -> None:
+        self.max_entries = max_entries
+        self._salt = model_id.encode("utf-8")
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def window_key(self, window: List[int]) -> bytes:
+        digest = hashlib.blake2b(self._salt, digest_size=16)
+        digest.update(np.asarray(window, dtype=np.int64).tobytes())
+        return digest.digest()
+
+    def lookup(
+        self, windows: List[List[int]], num_labels: int
+    ) -> Tuple[np.ndarray, List[int], List[bytes]]:
+        """
+        Return ``(probs, missing, keys)``: ``probs`` is filled for cached
+        windows and ``missing`` lists the indices that still need inference.
+        """
+        probs = np.empty((len(windows), num_labels), dtype=np.float32)
+        keys = [self.window_key(window) for window in windows]
+        missing: List[int] = []
+        with self._lock:
+            for idx, key in enumerate(keys):
+                row = self._entries.get(key)
+                if row is None:
+                    missing.append(idx)
+                    continue
+                self._entries.move_to_end(key)
+                probs[idx] = row
+            self.hits += len(windows) - len(missing)
+            self.misses += len(missing)
+        return probs, missing, keys
+
+    def store(self, keys: List[bytes], probs: np.ndarray) -> None:
+        with self._lock:
+            for key, row in zip(keys, probs):
+                self._entries[key] = np.array(row, dtype=np.float32)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "window_entries": len(self._entries),
+                "window_max_entries": self.max_entries,
+                "window_hits": self.hits,
+                "window_misses": self.misses,
+                "window_hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
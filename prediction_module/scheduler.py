@@ -0,0 +1,200 @@
+"""
+Cross-request dynamic micro-batching for the prediction service.
+
+Concurrent requests submit their token windows to a single
+``MicroBatchScheduler``. A background worker thread collects windows from all
+pending requests into shared batches, closing a batch once it reaches
+``max_batch_size`` windows or once the oldest pending request has waited
+``max_wait_ms``. Each request receives its probabilities through a
+``concurrent.futures.Future`` (awaitable via ``asyncio.wrap_future``).
+
+Windows are taken round-robin across requests, so a short ``/predict-text``
+call is not queued behind every window of a 300-page PDF. Cancelling a
+job's future (e.g. because its client disconnected) withdraws the windows
+that have not been batched yet.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, List, Optional, Tuple
+
+import numpy as np
+
+
+LOGGER = logging.getLogger("prediction_service")
+
+PredictFn = Callable[[List[List[int]]], np.ndarray]
+WindowCallback = Callable[[int, np.ndarray], None]
+
+
+class _Job:
+    """Windows submitted by a single caller and the future awaiting them."""
+
+    __slots__ = ("windows", "probs", "next_index", "remaining", "future", "on_window", "submitted_at")
+
+    def __init__(
+        self,
+        windows: List[List[int]],
+        num_labels: int,
+        on_window: Optional[WindowCallback] = None,
+    ) -> None:
+        self.windows = windows
+        self.on_window = on_window
+        self.probs = np.empty((len(windows), num_labels), dtype=np.float32)
+        self.next_index = 0
+        self.remaining = len(windows)
+        self.future: Future = Future()
+        self.submitted_at = time.monotonic()
+
+
+class MicroBatchScheduler:
+    """Collect windows from concurrent requests into shared forward passes."""
+
+    def __init__(
+        self,
+        predict_fn: PredictFn,
+        num_labels: int,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        on_queue_wait: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        """
+        ``on_queue_wait(seconds)`` is called once per submitted job with the
+        time its first window spent waiting for a batch.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._predict_fn = predict_fn
+        self._num_labels = num_labels
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max(max_wait_ms, 0.0) / 1000.0
+        self._on_queue_wait = on_queue_wait
+
+        self._jobs: Deque[_Job] = deque()
+        self._pending_windows = 0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(
+                target=self._run, name="inference-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(
+        self, windows: List[List[int]], on_window: Optional[WindowCallback] = None
+    ) -> Future:
+        """
+        Queue a request's windows; the returned future yields their probabilities.
+
+        ``on_window(index, probs)`` is called from the worker thread as each
+        window is scored, before the future resolves, so callers can stream
+        partial results. Cancelling the future drops the windows still queued.
+        """
+        job = _Job(windows, self._num_labels, on_window)
+        if not windows:
+            job.future.set_result(job.probs)
+            return job.future
+
+        self.start()
+        with self._cond:
+            self._jobs.append(job)
+            self._pending_windows += len(windows)
+            self._cond.notify()
+        job.future.add_done_callback(lambda future: self._withdraw(job) if future.cancelled() else None)
+        return job.future
+
+    def queue_depth(self) -> int:
+        """Number of windows waiting to be scheduled."""
+        with self._cond:
+            return self._pending_windows
+
+    # ---------------------------
+    # Worker
+    # ---------------------------
+    def _next_batch(self) -> List[Tuple[_Job, int]]:
+        """Block until a batch is ready, then take windows round-robin across jobs."""
+        with self._cond:
+            while not self._jobs and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return []
+
+            deadline = time.monotonic() + self.max_wait_s
+            while self._pending_windows < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch: List[Tuple[_Job, int]] = []
+            now = time.monotonic()
+            while self._jobs and len(batch) < self.max_batch_size:
+                job = self._jobs.popleft()
+                if job.next_index == 0 and self._on_queue_wait is not None:
+                    self._on_queue_wait(now - job.submitted_at)
+                batch.append((job, job.next_index))
+                job.next_index += 1
+                if job.next_index < len(job.windows):
+                    self._jobs.append(job)
+            self._pending_windows -= len(batch)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._stopped:
+                    return
+                continue
+
+            try:
+                probs = self._predict_fn([job.windows[idx] for job, idx in batch])
+            except Exception as exc:
+                LOGGER.error("Batched inference failed: %s", exc)
+                self._fail_jobs(list({id(job): job for job, _ in batch}.values()), exc)
+                continue
+
+            for (job, idx), row in zip(batch, probs):
+                job.probs[idx] = row
+                job.remaining -= 1
+                if job.on_window is not None:
+                    try:
+                        job.on_window(idx, row)
+                    except Exception as exc:  # pragma: no cover - a caller's callback must not stop the worker
+                        LOGGER.error("Window callback failed: %s", exc)
+                if job.remaining == 0 and not job.future.done():
+                    job.future.set_result(job.probs)
+
+    def _withdraw(self, job: _Job) -> None:
+        """Remove a job's unscheduled windows from the queue."""
+        with self._cond:
+            if job in self._jobs:
+                self._jobs.remove(job)
+                self._pending_windows -= len(job.windows) - job.next_index
+
+    def _fail_jobs(self, jobs: List[_Job], exc: Exception) -> None:
+        for job in jobs:
+            self._withdraw(job)
+        for job in jobs:
+            if not job.future.done():
+                job.future.set_exception(exc)
@@ -0,0 +1,171 @@
+"""
+Pre-fork multi-worker server for the prediction service.
+
+The parent process imports prediction.py and loads InLegalBERT once, then
+forks ``--workers`` uvicorn workers that accept connections on one shared
+listening socket. The weights are never written after loading, so the
+workers share the parent's weight pages copy-on-write and total memory
+stays close to a single model copy while throughput scales with cores.
+
+Each worker is pinned to its own subset of CPU cores and sizes torch's
+intra-op thread pool to match, so workers do not oversubscribe cores with
+competing thread pools. Workers that exit unexpectedly are re-forked from
+the parent, which still holds the loaded model.
+
+The parent never runs inference itself (OpenMP thread pools are not
+fork-safe); each worker runs its own warm-up and reports readiness on
+``/health/ready`` as usual.
+
+Usage (from prediction_module/, POSIX only):
+    python serve.py --workers 4 --port 8001
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Dict, List
+
+import torch
+import uvicorn
+
+
+LOGGER = logging.getLogger("prediction_service")
+
+RESTART_DELAY_S = 1.0
+
+
+def available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))  # pragma: no cover - macOS has no affinity API
+
+
+def core_groups(workers: int) -> List[List[int]]:
+    """Split the cores this process may use into ``workers`` contiguous groups."""
+    cores = available_cores()
+    if workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    return [
+        cores[i * len(cores) // workers : (i + 1) * len(cores) // workers]
+        for i in range(workers)
+    ]
+
+
+def _listen(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(
+    app: Any, index: int, cores: List[int], sock: socket.socket, args: argparse.Namespace
+) -> None:
+    # Drop the parent's supervisor handlers; uvicorn installs its own.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    if args.pin_cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(max(len(cores), 1))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:  # already fixed for this process
+        pass
+    LOGGER.info(
+        "Worker %d (pid %d) serving on cores %s with %d torch threads",
+        index, os.getpid(), cores, torch.get_num_threads(),
+    )
+
+    config = uvicorn.Config(app, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the prediction service as pre-forked workers.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", "0")),
+                        help="Worker processes (default: one per available core).")
+    parser.add_argument("--host", default=os.getenv("SERVE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVE_PORT", "8001")))
+    parser.add_argument("--no-pin-cores", dest="pin_cores", action="store_false",
+                        help="Do not restrict each worker to its own cores.")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        parser.error("Pre-fork mode needs os.fork(); run 'python prediction.py' instead.")
+
+    groups = core_groups(args.workers or len(available_cores()))
+
+    import prediction
+
+    began = time.perf_counter()
+    prediction.MODEL_LIFECYCLE.ensure_loaded()
+    LOGGER.info("Parent loaded the model in %.2fs; forking %d workers", time.perf_counter() - began, len(groups))
+    # Move everything allocated so far out of the collector's reach, so
+    # garbage collection in the workers does not write to (and un-share) it.
+    gc.collect()
+    gc.freeze()
+
+    sock = _listen(args.host, args.port)
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            prediction.METRICS.const_labels["worker"] = str(index)
+            try:
+                _run_worker(prediction.app, index, groups[index], sock, args)
+            except BaseException as exc:  # pragma: no cover - reported by the parent
+                LOGGER.error("Worker %d crashed: %s", index, exc)
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def stop(signum: int, frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for index in range(len(groups)):
+        spawn(index)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"\nInLegalBERT Prediction Server: {len(groups)} workers on http://{args.host}:{args.port}")
+
+    while children:
+        try:
+            pid, wait_status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        LOGGER.warning(
+            "Worker %d (pid %d) exited with status %d; restarting",
+            index, pid, os.waitstatus_to_exitcode(wait_status),
+        )
+        time.sleep(RESTART_DELAY_S)
+        spawn(index)
+
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Parity tests for the batched inference path.
+
+A tiny random BERT (see bench_prediction.build_tiny_model) stands in for
+InLegalBERT, so the checks run on any CPU box without the real weights.
+They guard the invariants parity.py checks by hand: dynamic padding and
+micro-batching must not change any window's probabilities.
+
+Usage (from prediction_module/):
+    python -m pytest test_parity.py
+"""
+
+import importlib
+import sys
+
+import numpy as np
+import pytest
+
+from bench_explainability import synthetic_judgment
+from bench_prediction import build_tiny_model
+
+
+TOLERANCE = 1e-5
+
+
+@pytest.fixture(scope="module")
+def prediction(tmp_path_factory):
+    """prediction.py imported against the tiny model, with caches and the scheduler off."""
+    model_path = str(tmp_path_factory.mktemp("tiny-bert"))
+    build_tiny_model(model_path)
+    settings = {
+        "MODEL_PATH": model_path,
+        "INFERENCE_BACKEND": "torch",
+        "RESULT_CACHE_SIZE": "0",
+        "WINDOW_CACHE_SIZE": "0",
+        "SCHEDULER_ENABLED": "0",
+        "WARMUP_ENABLED": "0",
+        "CASE_INDEX_DIR": "",
+    }
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in settings.items():
+            patch.setenv(name, value)
+        # The service log is opened relative to the working directory.
+        patch.chdir(model_path)
+        # Settings are read at import time.
+        sys.modules.pop("prediction", None)
+        module = importlib.import_module("prediction")
+        module.MODEL_LIFECYCLE.ensure_loaded()
+        yield module
+    sys.modules.pop("prediction", None)
+
+
+@pytest.fixture(scope="module")
+def texts():
+    # Lengths from a single short window up to several windows, so batches
+    # mix windows of very different sizes.
+    return [synthetic_judgment(num_sentences, seed=seed) for seed, num_sentences in enumerate((3, 40, 150))]
+
+
+@pytest.fixture(scope="module")
+def windows(prediction, texts):
+    return [ids for text in texts for ids in prediction._encode_windows(text)]
+
+
+def test_windows_have_mixed_lengths(windows):
+    lengths = {len(ids) for ids in windows}
+    assert len(lengths) > 1
+    assert max(lengths) == 512
+
+
+def test_dynamic_padding_matches_max_length(prediction, windows):
+    dynamic = prediction._predict_windows(windows, padding="dynamic")
+    fixed = prediction._predict_windows(windows, padding="max_length")
+    assert np.abs(dynamic - fixed).max(axis=1).max() <= TOLERANCE
+
+
+def test_batched_windows_match_single_window(prediction, windows):
+    single = prediction._predict_windows(windows, batch_size=1)
+    batched = prediction._predict_windows(windows, batch_size=16)
+    assert np.abs(single - batched).max() <= TOLERANCE
+
+
+@pytest.mark.parametrize("index", range(3))
+def test_batched_chunk_predict_matches_single_window(prediction, texts, index):
+    single = prediction.chunk_predict(texts[index], batch_size=1, use_window_cache=False)
+    batched = prediction.chunk_predict(texts[index], batch_size=16, use_window_cache=False)
+    assert batched["num_chunks"] == single["num_chunks"]
+    assert batched["prediction"] == single["prediction"]
+    assert np.abs(np.asarray(batched["window_probs"]) - np.asarray(single["window_probs"])).max() <= TOLERANCE